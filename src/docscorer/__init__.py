@@ -1,22 +1,48 @@
 #!/usr/bin/env python
 
-try:
-	from importlib.metadata import version, PackageNotFoundError
-except Exception:
-	# fallback for very old Python versions or environments
-	version = None
-	PackageNotFoundError = Exception
+# The public names are imported on first access (PEP 562), so that `import docscorer`
+# does not load numpy, the scorers or importlib.metadata until they are used.
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
 
-from docscorer.docscorer import DocumentScorer
-from docscorer.configuration import ScorerConfiguration
+if TYPE_CHECKING:
+    from docscorer.configuration import ScorerConfiguration
+    from docscorer.docscorer import DocumentScorer
+    from docscorer.streaming import StreamingDocumentScorer
 
 name = "docscorer"
-if version is not None:
-	try:
-		__version__ = version(name)
-	except PackageNotFoundError:
-		__version__ = "0.0"
-else:
-	__version__ = "0.0"
-
-__all__ = ["DocumentScorer", "ScorerConfiguration"]
+
+_LAZY_ATTRIBUTES = {
+    "DocumentScorer": "docscorer.docscorer",
+    "ScorerConfiguration": "docscorer.configuration",
+    "StreamingDocumentScorer": "docscorer.streaming",
+}
+
+__all__ = ["DocumentScorer", "ScorerConfiguration", "StreamingDocumentScorer"]
+
+
+def _get_version() -> str:
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except Exception:
+        # fallback for very old Python versions or environments
+        return "0.0"
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "0.0"
+
+
+def __getattr__(attribute: str) -> Any:
+    if attribute == "__version__":
+        value = _get_version()
+    elif attribute in _LAZY_ATTRIBUTES:
+        value = getattr(import_module(_LAZY_ATTRIBUTES[attribute]), attribute)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
+    globals()[attribute] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *_LAZY_ATTRIBUTES, "__version__"})
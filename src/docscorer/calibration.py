@@ -0,0 +1,109 @@
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from docscorer.docscorer import Document, DocumentScorer
+
+DEFAULT_BANDS = (0.0, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3)
+
+T = TypeVar("T")
+
+
+@dataclass
+class BandCalibration:
+    """How tiered scoring with a band around the cutoff does on a sample, as fractions
+    of its documents."""
+
+    band: float
+    fully_scored: float  # documents within the band, which are fully scored
+    disagreements: (
+        float  # kept by one of tiered and full scoring and discarded by the other
+    )
+    false_accepts: float  # kept by tiered scoring only
+    false_rejects: float  # kept by full scoring only
+
+
+def reservoir_sample(items: Iterable[T], n: int, seed: int = 0) -> List[Tuple[int, T]]:
+    """A uniform random sample of n items (all of them if there are fewer), in a single
+    pass and keeping only n items in memory. Returns (position, item) pairs, in input
+    order."""
+    rng = random.Random(seed)
+    sample: List[Tuple[int, T]] = []
+    for i, item in enumerate(items):
+        if i < n:
+            sample.append((i, item))
+        else:
+            j = rng.randrange(i + 1)
+            if j < n:
+                sample[j] = (i, item)
+    return sorted(sample, key=lambda pair: pair[0])
+
+
+def sample_scores(
+    scorer: "DocumentScorer", documents: Sequence["Document"]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Approximate and full overall scores of the documents, scored in chunks of
+    CHUNK_SIZE."""
+    approximate_scores = []
+    full_scores = []
+    for start in range(0, len(documents), scorer.CHUNK_SIZE):
+        chunk = documents[start : start + scorer.CHUNK_SIZE]
+        approximate_scores.append(scorer._approximate_batch_scores(chunk))
+        full_scores.append(scorer._score_batch_arrays(chunk)[0])
+    return np.concatenate(approximate_scores), np.concatenate(full_scores)
+
+
+def calibrate(
+    approximate_scores: np.ndarray,
+    full_scores: np.ndarray,
+    cutoff: float,
+    bands: Sequence[float] = DEFAULT_BANDS,
+) -> List[BandCalibration]:
+    """Compare the keep/discard decisions of tiered scoring (see
+    DocumentScorer._filter_lines()) with those of full scoring, for every band around
+    `cutoff`."""
+    n_documents = max(len(full_scores), 1)
+    full_keeps = full_scores >= cutoff
+    approximate_keeps = approximate_scores >= cutoff
+    results = []
+    for band in sorted(bands):
+        fully_scored = np.abs(approximate_scores - cutoff) <= band
+        tiered_keeps = np.where(fully_scored, full_keeps, approximate_keeps)
+        results.append(
+            BandCalibration(
+                band=band,
+                fully_scored=fully_scored.sum() / n_documents,
+                disagreements=(tiered_keeps != full_keeps).sum() / n_documents,
+                false_accepts=(tiered_keeps & ~full_keeps).sum() / n_documents,
+                false_rejects=(~tiered_keeps & full_keeps).sum() / n_documents,
+            )
+        )
+    return results
+
+
+def format_report(
+    approximate_scores: np.ndarray,
+    full_scores: np.ndarray,
+    cutoff: float,
+    results: List[BandCalibration],
+) -> str:
+    """Calibration report of calibrate(), as text."""
+    lines = [
+        f"Documents: {len(full_scores)}, cutoff: {cutoff}",
+        f"Kept by full scoring: {np.mean(full_scores >= cutoff):.2%}",
+        "Approximate score mean absolute error: "
+        f"{np.mean(np.abs(approximate_scores - full_scores)):.4f}",
+        "",
+        f"{'band':>6} {'fully scored':>13} {'disagreements':>14} {'false accepts':>14} "
+        f"{'false rejects':>14}",
+    ]
+    for result in results:
+        lines.append(
+            f"{result.band:>6.2f} {result.fully_scored:>13.2%} "
+            f"{result.disagreements:>14.2%} "
+            f"{result.false_accepts:>14.2%} {result.false_rejects:>14.2%}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class RunManifest:
+    """Progress of a score_directory() run, saved as JSON in the output directory. For
+    every input file it records whether it is done or, while it is being scored, the
+    number of input lines whose rows are committed to the output file and the size of
+    the output file at that point. Resuming truncates the output file to that size and
+    skips those lines, so the rows of a chunk are either all in the output or not at
+    all."""
+
+    FILE_NAME = "docscorer_manifest.json"
+    FILE_PATTERN = (
+        "docscorer_manifest*.json"  # also the manifests of the shards of a run
+    )
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: Path,
+        settings: Dict[str, Any],
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.path = Path(path)
+        self.settings = settings
+        self.files = files if files is not None else {}
+
+    @classmethod
+    def file_name(cls, shard: Tuple[int, int] = (0, 1)) -> str:
+        """Manifest file name of a run, or of a shard (index, count) of a run."""
+        index, count = shard
+        if count == 1:
+            return cls.FILE_NAME
+        return f"docscorer_manifest.shard-{index}-of-{count}.json"
+
+    @classmethod
+    def create(
+        cls,
+        output_path: Path,
+        settings: Dict[str, Any],
+        shard: Tuple[int, int] = (0, 1),
+    ) -> "RunManifest":
+        """New (empty) manifest of a run (or of a shard of it) writing to
+        `output_path`."""
+        manifest = cls(Path(output_path) / cls.file_name(shard), settings)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def read(cls, path: Path) -> "RunManifest":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(
+                f"{path}: unsupported manifest version {data.get('version')}"
+            )
+        return cls(path, data["settings"], data["files"])
+
+    @classmethod
+    def load(
+        cls,
+        output_path: Path,
+        settings: Dict[str, Any],
+        shard: Tuple[int, int] = (0, 1),
+    ) -> "RunManifest":
+        """Manifest of a previous run (or shard) writing to `output_path`, to resume it.
+        Raises ValueError if it was run with other settings, and starts a new one if
+        there is no manifest.
+        """
+        path = Path(output_path) / cls.file_name(shard)
+        if not path.exists():
+            return cls.create(output_path, settings, shard)
+        manifest = cls.read(path)
+        if manifest.settings != settings:
+            raise ValueError(
+                f"{path} was written by a run with other settings, it cannot be "
+                "resumed: "
+                f"{manifest.settings} != {settings}"
+            )
+        return manifest
+
+    def is_done(self, name: str) -> bool:
+        return self.files.get(name, {}).get("done", False)
+
+    def committed(self, name: str) -> Optional[Dict[str, Any]]:
+        """Last checkpoint of a file in progress ("lines", "output_size", "documents"),
+        if any."""
+        state = self.files.get(name)
+        if state is None or state.get("done"):
+            return None
+        return state
+
+    def commit(
+        self,
+        name: str,
+        lines: int,
+        output_size: int,
+        documents: int,
+        done: bool = False,
+    ) -> None:
+        """Record the progress of a file. The output must be on disk up to `output_size`
+        bytes."""
+        self.files[name] = {
+            "lines": lines,
+            "output_size": output_size,
+            "documents": documents,
+            "done": done,
+        }
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file and renamed, so a crash never leaves half a
+        # manifest
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.VERSION,
+                    "settings": self.settings,
+                    "files": self.files,
+                },
+                f,
+                indent=1,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
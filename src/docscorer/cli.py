@@ -1,63 +1,417 @@
+import json
 import logging
+import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, TextIO, Tuple
 
 from docopt import docopt
 
-from docscorer.configuration import ScorerConfiguration
-from docscorer.docscorer import DocumentScorer
+if TYPE_CHECKING:
+    from docscorer.docscorer import DocumentScorer
 
 usage = (
     "Web Document Scoring Tool\n\n"
     "Usage:\n"
     "  cli.py --input=<input_path> [--output=<output_path>] "
     "[--benchmark_config=<path>] [--info_score_config=<path>] "
-    "[--lang_families_config=<path>] "
-    "[--text_in_output] [--only_final_score]\n"
+    "[--lang_families_config=<path>] [--config_cache=<dir>] [--text_in_output] "
+    "[--only_final_score] [--early_exit] [--workers=<n>] [--zstd_output] "
+    "[--json_decoder=<name>] [--output_format=<format>] [--resume] [--shard=<i/N>] "
+    "[--split_size=<bytes>] [--score_cache=<path>] [--score_cache_size=<MB>] "
+    "[--segment_cache=<n>] [--sketch=<file>] [--min_repeated_docs=<n>]\n"
+    "  cli.py merge --input=<input_path> --output=<output_path> [--check_only]\n"
+    "  cli.py filter --min_score=<score> [--benchmark_config=<path>] "
+    "[--info_score_config=<path>] [--lang_families_config=<path>] "
+    "[--config_cache=<dir>] [--only_final_score] [--early_exit] [--workers=<n>] "
+    "[--json_decoder=<name>] [--band=<width>] [--score_cache=<path>] "
+    "[--score_cache_size=<MB>] [--segment_cache=<n>] [--sketch=<file>] "
+    "[--min_repeated_docs=<n>]\n"
+    "  cli.py calibrate --input=<input_file> --min_score=<score> [--band=<width>] "
+    "[--sample=<n>] [--seed=<n>] [--benchmark_config=<path>] "
+    "[--info_score_config=<path>] [--lang_families_config=<path>] "
+    "[--config_cache=<dir>] [--json_decoder=<name>]\n"
+    "  cli.py show --input=<input_file> --line=<n> [--benchmark_config=<path>] "
+    "[--info_score_config=<path>] [--lang_families_config=<path>] "
+    "[--config_cache=<dir>] [--text_in_output] [--early_exit] [--json_decoder=<name>] "
+    "[--sketch=<file>] [--min_repeated_docs=<n>]\n"
+    "  cli.py serve [--host=<host>] [--port=<port>] [--max_batch=<n>] "
+    "[--max_wait_ms=<ms>] [--timeout=<s>] [--benchmark_config=<path>] "
+    "[--info_score_config=<path>] [--lang_families_config=<path>] "
+    "[--config_cache=<dir>] [--only_final_score] [--early_exit] [--score_cache=<path>] "
+    "[--score_cache_size=<MB>] [--segment_cache=<n>] [--sketch=<file>] "
+    "[--min_repeated_docs=<n>]\n"
+    "  cli.py sketch --input=<input_path> --output=<sketch_file> [--sketch_size=<MB>] "
+    "[--workers=<n>] [--shard=<i/N>] [--split_size=<bytes>] [--config_cache=<dir>] "
+    "[--json_decoder=<name>]\n"
+    "  cli.py merge_sketches --output=<sketch_file> <sketch_file>...\n"
     "  cli.py (-h | --help)\n"
     "  cli.py --version\n\n"
     "Options:\n"
-    "  --input=<input_path>               Path to input directory with .jsonl files\n"
+    "  --input=<input_path>               Path to input directory with .jsonl (or .jsonl.zst/.gz/.xz) files\n"  # noqa: E501
     "  --output=<output_path>             Path to save output .csv files [default: <input_path>/document_scores]\n"  # noqa: E501
     "  --benchmark_config=<path>          Path to benchmark CSV\n"
     "  --info_score_config=<path>         Path to informativeness config dir\n"
     "  --lang_families_config=<path>      Path to lang families CSV\n"
     "  --char_patterns_config=<path>      Path to char patterns config JSON\n"
+    "  --config_cache=<dir>               Directory for the configuration snapshots and line indexes (default: $DOCSCORER_CACHE_DIR or ~/.cache/docscorer)\n"  # noqa: E501
     "  --text_in_output                   Include original text in output\n"
     "  --only_final_score                 Only include final score in output\n"
+    "  --early_exit                       Stop scoring a document once its wds_score is known to be 0 (skipped subscores are NaN)\n"  # noqa: E501
+    "  --workers=<n>                      Number of scoring processes [default: 1]\n"
+    "  --zstd_output                      Write zstd-compressed .csv.zst files\n"
+    "  --output_format=<format>           csv, parquet or arrow (Arrow IPC file) [default: csv]\n"  # noqa: E501
+    "  --resume                           Continue an interrupted run from the manifest in the output directory\n"  # noqa: E501
+    "  --json_decoder=<name>              Input decoder: auto, json, orjson, msgspec or simdjson [default: auto]\n"  # noqa: E501
+    "  --shard=<i/N>                      Only score shard i (0 <= i < N) of the input files [default: 0/1]\n"  # noqa: E501
+    "  --split_size=<bytes>               With N > 1 shards, split plain files larger than this [default: 1073741824]\n"  # noqa: E501
+    "  --score_cache=<path>               SQLite file caching the subscores of scored documents, reused by later runs\n"  # noqa: E501
+    "  --score_cache_size=<MB>            Size of the score cache, over which the least recently used entries are evicted (default: 1024)\n"  # noqa: E501
+    "  --segment_cache=<n>                Keep the features of up to n repeated segments in memory, per process (default: 0, disabled)\n"  # noqa: E501
+    "  --sketch=<file>                    Add a corpus_repeated_score column: the share of segments found in many documents of the corpus, counted by `sketch`\n"  # noqa: E501
+    "  --min_repeated_docs=<n>            Documents a segment must be found in to be repeated across the corpus (default: 10)\n"  # noqa: E501
+    "  --sketch_size=<MB>                 sketch: size of the count-min sketch of the corpus segments (default: 64)\n"  # noqa: E501
+    "  --check_only                       merge: only check that every input line was scored once\n"  # noqa: E501
+    "  --min_score=<score>                filter: write the stdin records with at least this wds_score to stdout\n"  # noqa: E501
+    "  --band=<width>                     filter: only fully score the records whose approximate score is within this of --min_score\n"  # noqa: E501
+    "  --sample=<n>                       calibrate: documents of --input to compare both tiers on [default: 10000]\n"  # noqa: E501
+    "  --seed=<n>                         calibrate: seed of the random sample of --input [default: 0]\n"  # noqa: E501
+    "  --line=<n>                         show: score and print line n (from 1) of a plain .jsonl file\n"  # noqa: E501
+    "  --host=<host>                      serve: address to listen on [default: 127.0.0.1]\n"  # noqa: E501
+    "  --port=<port>                      serve: port to listen on [default: 8000]\n"
+    "  --max_batch=<n>                    serve: maximum documents scored together [default: 256]\n"  # noqa: E501
+    "  --max_wait_ms=<ms>                 serve: maximum wait for a batch to fill, in milliseconds [default: 5]\n"  # noqa: E501
+    "  --timeout=<s>                      serve: seconds a request waits for its scores before a 503 [default: 30]\n"  # noqa: E501
     "  -h --help                         Show this screen\n"
     "  --version                         Show version\n"
 )
 
 
-def setup_logging() -> None:
+def setup_logging(stream: TextIO = sys.stdout) -> None:
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s",
-        stream=sys.stdout,
+        stream=stream,
     )
 
 
+def get_workers(args: Dict[str, Any]) -> int:
+    try:
+        workers = int(args["--workers"])
+        if workers < 1:
+            raise ValueError
+    except ValueError:
+        logging.error(f"--workers must be a positive integer, got {args['--workers']}")
+        sys.exit(1)
+    return workers
+
+
+def load_scorer(args: Dict[str, Any]) -> "DocumentScorer":
+    # Imported after the arguments are checked: --help, --version and usage errors
+    # return without loading numpy and the scorers
+    from docscorer.configuration import ScorerConfiguration
+    from docscorer.docscorer import DocumentScorer
+
+    try:
+        config = ScorerConfiguration(args)
+    except FileNotFoundError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    try:
+        return DocumentScorer(config)
+    except (ValueError, ImportError, OSError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+
+
+def merge(args: Dict[str, Any]) -> None:
+    from docscorer.sharding import merge_shards
+
+    problems = merge_shards(
+        Path(args["--input"]), Path(args["--output"]), args["--check_only"]
+    )
+    for problem in problems:
+        logging.error(problem)
+    if problems:
+        sys.exit(1)
+    logging.info("All the input lines were scored exactly once.")
+
+
+def get_sharding(args: Dict[str, Any]) -> Tuple[Tuple[int, int], int]:
+    """--shard and --split_size."""
+    from docscorer.sharding import parse_shard
+
+    try:
+        shard = parse_shard(args["--shard"])
+        split_size = int(args["--split_size"])
+        if split_size < 1:
+            raise ValueError(
+                f"--split_size must be a positive integer, got {split_size}"
+            )
+    except ValueError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    return shard, split_size
+
+
+def sketch(args: Dict[str, Any]) -> None:
+    """Count the segments of the documents of --input in a CountMinSketch saved to
+    --output."""
+    input_path = Path(args["--input"])
+    if not input_path.exists():
+        logging.error(f"Input path does not exist: {input_path}")
+        sys.exit(1)
+    try:
+        size = int(args["--sketch_size"] or 64) << 20
+        if size < 1:
+            raise ValueError
+    except ValueError:
+        logging.error(
+            f"--sketch_size must be a positive integer, got {args['--sketch_size']}"
+        )
+        sys.exit(1)
+    shard, split_size = get_sharding(args)
+    workers = get_workers(args)
+    scorer = load_scorer(args)
+    scorer.sketch_directory(
+        input_path, Path(args["--output"]), workers, shard, split_size, size
+    )
+
+
+def merge_sketches(args: Dict[str, Any]) -> None:
+    """Add up the sketches of the shards of a corpus."""
+    from docscorer.sketch import CountMinSketch
+
+    try:
+        sketches = [CountMinSketch.load(Path(path)) for path in args["<sketch_file>"]]
+        merged = sketches[0]
+        for other in sketches[1:]:
+            merged.merge(other)
+    except (OSError, ValueError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+    merged.save(Path(args["--output"]))
+    logging.info(f"{len(sketches)} sketches merged into {args['--output']}")
+
+
+def get_cutoff(args: Dict[str, Any]) -> Tuple[float, Optional[float]]:
+    """--min_score and --band (None if not given)."""
+    try:
+        min_score = float(args["--min_score"])
+        band = float(args["--band"]) if args["--band"] is not None else None
+        if band is not None and band < 0:
+            raise ValueError
+    except ValueError:
+        logging.error(
+            "--min_score must be a number and --band a positive number, got "
+            f"{args['--min_score']} and {args['--band']}"
+        )  # noqa: E501
+        sys.exit(1)
+    return min_score, band
+
+
+def calibrate(args: Dict[str, Any]) -> None:
+    """Compare tiered and full scoring on a random sample of --sample documents of
+    --input."""
+    min_score, band = get_cutoff(args)
+    try:
+        n_sample = int(args["--sample"])
+        seed = int(args["--seed"])
+    except ValueError:
+        logging.error(
+            f"--sample and --seed must be integers, got {args['--sample']} and "
+            f"{args['--seed']}"
+        )
+        sys.exit(1)
+    input_file = Path(args["--input"])
+    if not input_file.is_file():
+        logging.error(f"Input file does not exist: {input_file}")
+        sys.exit(1)
+    scorer = load_scorer(args)
+    from docscorer.calibration import (
+        DEFAULT_BANDS,
+        format_report,
+        reservoir_sample,
+        sample_scores,
+    )
+    from docscorer.calibration import (
+        calibrate as calibrate_bands,
+    )
+    from docscorer.streams import open_input
+
+    # Sampled from the whole file, the first records of a crawl are seldom
+    # representative of it
+    with open_input(input_file) as fin:
+        records = (
+            (line_number, line)
+            for line_number, line in enumerate(fin, start=1)
+            if line.strip()
+        )
+        sample = reservoir_sample(records, n_sample, seed)
+    documents = []
+    for _, (line_number, line) in sample:
+        documents.extend(scorer._parse_lines([line], str(input_file), line_number)[0])
+    approximate_scores, full_scores = sample_scores(scorer, documents)
+    bands = sorted({*DEFAULT_BANDS, band}) if band is not None else DEFAULT_BANDS
+    results = calibrate_bands(approximate_scores, full_scores, min_score, bands)
+    print(format_report(approximate_scores, full_scores, min_score, results))
+
+
+def filter_records(args: Dict[str, Any]) -> None:
+    """Read jsonl records from stdin and write the ones with wds_score >= --min_score to
+    stdout."""
+    min_score, band = get_cutoff(args)
+    workers = get_workers(args)
+    scorer = load_scorer(args)
+
+    sys.stdin.reconfigure(encoding="utf-8")  # type: ignore[attr-defined]
+    sys.stdout.reconfigure(encoding="utf-8")  # type: ignore[attr-defined]
+    if workers > 1:
+        from docscorer.parallel import ScoringPool
+    try:
+        with ScoringPool(scorer, workers) if workers > 1 else nullcontext() as pool:
+            n_scored, n_passed = scorer.filter_stream(
+                sys.stdin, sys.stdout, min_score, pool, band=band
+            )
+    except BrokenPipeError:
+        # The reader of stdout exited (| head...), as other Unix filters we stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    logging.info(f"{n_passed} of {n_scored} documents with wds_score >= {min_score}")
+
+
+def show(args: Dict[str, Any]) -> None:
+    """Print a line of a plain .jsonl file, read with its line index, and its scores as
+    JSON."""
+    from docscorer.line_index import LineIndex
+
+    input_file = Path(args["--input"])
+    try:
+        line_number = int(args["--line"])
+    except ValueError:
+        logging.error(f"--line must be an integer, got {args['--line']}")
+        sys.exit(1)
+    if not input_file.is_file() or input_file.suffix in (".zst", ".gz", ".xz"):
+        logging.error(f"--input must be a plain .jsonl file: {input_file}")
+        sys.exit(1)
+    index = LineIndex.load(input_file, args["--config_cache"])
+    if not 1 <= line_number <= len(index):
+        logging.error(
+            f"{input_file} has {len(index)} lines, there is no line {line_number}"
+        )
+        sys.exit(1)
+    try:
+        line = index[line_number - 1]
+    except UnicodeDecodeError as e:
+        logging.error(f"{input_file}:{line_number} is not valid UTF-8: {e}")
+        sys.exit(1)
+    scorer = load_scorer(args)
+    try:
+        document = scorer._parse_record(scorer.decode_record(line))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.error(f"{input_file}:{line_number} malformed record: {e!r}")
+        sys.exit(1)
+    scores = scorer.score_batch([document])[0]
+    output = {
+        "line": line_number,
+        "doc_id": document[4],
+        "lang": document[0],
+        "script": document[1],
+    }
+    output.update(scorer._score_fields(scores))
+    if scorer.config.text_in_output:
+        output["text"] = document[3]
+    print(json.dumps(output, ensure_ascii=False, indent=1))
+
+
+def serve(args: Dict[str, Any]) -> None:
+    """Score the records POSTed to an HTTP server, in micro-batches (see
+    ScoringServer)."""
+    try:
+        port = int(args["--port"])
+        max_batch = int(args["--max_batch"])
+        max_wait = float(args["--max_wait_ms"]) / 1000
+        timeout = float(args["--timeout"])
+        if max_batch < 1 or max_wait < 0 or timeout <= 0:
+            raise ValueError
+    except ValueError:
+        logging.error(
+            "--port and --max_batch must be positive integers and --max_wait_ms and "
+            "--timeout positive numbers"
+        )
+        sys.exit(1)
+    scorer = load_scorer(args)
+    from docscorer.server import serve as run_server
+
+    run_server(scorer, args["--host"], port, max_batch, max_wait, timeout)
+
+
 def main() -> None:
-    setup_logging()
     args = docopt(usage, version="DocumentScorer v1.0")
+    # In filter mode stdout is the output, so the log goes to stderr
+    setup_logging(sys.stderr if args["filter"] else sys.stdout)
+    if args["merge"]:
+        merge(args)
+        return
+    if args["filter"]:
+        filter_records(args)
+        return
+    if args["show"]:
+        show(args)
+        return
+    if args["serve"]:
+        serve(args)
+        return
+    if args["calibrate"]:
+        calibrate(args)
+        return
+    if args["sketch"]:
+        sketch(args)
+        return
+    if args["merge_sketches"]:
+        merge_sketches(args)
+        return
 
     input_path = Path(args["--input"])
     if not input_path.exists():
         logging.error(f"Input path does not exist: {input_path}")
         sys.exit(1)
 
+    output_format = args["--output_format"]
+    if output_format not in ("csv", "parquet", "arrow"):
+        logging.error(
+            f"--output_format must be csv, parquet or arrow, got {output_format}"
+        )
+        sys.exit(1)
+    if output_format != "csv" and args["--zstd_output"]:
+        logging.error(
+            "--zstd_output only applies to csv output (parquet files are "
+            "zstd-compressed)"
+        )
+        sys.exit(1)
+
+    shard, split_size = get_sharding(args)
+
     output_path = Path(args.get("--output") or input_path / "document_scores")
     output_path.mkdir(parents=True, exist_ok=True)
 
+    workers = get_workers(args)
+    scorer = load_scorer(args)
     try:
-        config = ScorerConfiguration(args)
-    except FileNotFoundError as e:
+        scorer.score_directory(
+            input_path,
+            output_path,
+            workers=workers,
+            compress_output=args["--zstd_output"],
+            output_format=output_format,
+            resume=args["--resume"],
+            shard=shard,
+            split_size=split_size,
+        )
+    except ValueError as e:
         logging.error(str(e))
         sys.exit(1)
-
-    scorer = DocumentScorer(config)
-    scorer.score_directory(input_path, output_path)
     logging.info("Scoring completed successfully.")
 
 
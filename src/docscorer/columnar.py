@@ -0,0 +1,140 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# output format -> file extension
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+# Columns with a few distinct values, stored as dictionary indices
+DICTIONARY_COLUMNS = ("lang", "script")
+
+
+def columnar_format(path: Path) -> Optional[str]:
+    """Columnar format of an output file, by extension, None for csv files."""
+    for output_format, extension in COLUMNAR_FORMATS.items():
+        if Path(path).name.endswith(extension):
+            return output_format
+    return None
+
+
+class ColumnarWriter:
+    """Writes DocumentScorer output columns to a Parquet or Arrow IPC file: doc_id, lang
+    and script (dictionary encoded), float32 scores and the text if `text_in_output`.
+    Columns are buffered and written in batches of BATCH_ROWS rows (Parquet row groups).
+    """
+
+    BATCH_ROWS = 1 << 16
+    BATCH_TEXT_BYTES = 1 << 27  # flush earlier when the texts are large
+
+    def __init__(
+        self,
+        path: Path,
+        output_format: str,
+        score_columns: List[str],
+        text_in_output: bool,
+    ):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(
+                f"pyarrow is required to write {output_format} output files"
+            ) from None
+        self._pa = pa
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        fields = [pa.field("doc_id", pa.string())]
+        fields += [pa.field(name, dictionary) for name in DICTIONARY_COLUMNS]
+        fields += [pa.field(name, pa.float32()) for name in score_columns]
+        if text_in_output:
+            fields.append(pa.field("text", pa.large_string()))
+        self.schema = pa.schema(fields)
+
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+        elif output_format == "arrow":
+            # Every batch extends the dictionaries of the previous ones (see _encode),
+            # so they can be written as deltas in the file format
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(str(path), self.schema, options=options)
+        else:
+            raise ValueError(
+                f"Unknown output format '{output_format}', choose one of: "
+                f"{', '.join(COLUMNAR_FORMATS)}"
+            )
+
+        self._dictionaries: Dict[str, Dict[str, int]] = {
+            name: {} for name in DICTIONARY_COLUMNS
+        }
+        self._pending: Dict[str, List[Any]] = {field.name: [] for field in self.schema}
+        self._pending_rows = 0
+        self._pending_text_bytes = 0
+
+    def _encode(self, name: str, values: List[str]) -> Any:
+        """Dictionary array of a column, with a dictionary shared by all the batches of
+        the file."""
+        dictionary = self._dictionaries[name]
+        indices = np.fromiter(
+            (dictionary.setdefault(value, len(dictionary)) for value in values),
+            dtype=np.int32,
+            count=len(values),
+        )
+        return self._pa.DictionaryArray.from_arrays(
+            indices, self._pa.array(list(dictionary), self._pa.string())
+        )
+
+    def write_columns(self, columns: Dict[str, Any]) -> None:
+        """Add the columns of a batch of documents (arrays or lists, one item per
+        document)."""
+        n_rows = len(columns["doc_id"])
+        if not n_rows:
+            return
+        for name, values in self._pending.items():
+            values.append(columns[name])
+        self._pending_rows += n_rows
+        if "text" in columns:
+            self._pending_text_bytes += sum(len(text) for text in columns["text"])
+        if (
+            self._pending_rows >= self.BATCH_ROWS
+            or self._pending_text_bytes >= self.BATCH_TEXT_BYTES
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as a record batch."""
+        if not self._pending_rows:
+            return
+        pa = self._pa
+        arrays = []
+        for field in self.schema:
+            chunks = self._pending[field.name]
+            if field.name in DICTIONARY_COLUMNS:
+                arrays.append(
+                    self._encode(
+                        field.name, [value for chunk in chunks for value in chunk]
+                    )
+                )
+            elif pa.types.is_floating(field.type):
+                arrays.append(
+                    pa.array(np.concatenate(chunks).astype(np.float32), type=field.type)
+                )
+            else:
+                arrays.append(
+                    pa.array(
+                        [value for chunk in chunks for value in chunk], type=field.type
+                    )
+                )
+            chunks.clear()
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self._pending_rows = 0
+        self._pending_text_bytes = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -1,12 +1,54 @@
+import hashlib
 import json
 import logging
+import os
+import re
+import tempfile
+from functools import cached_property
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, Union
-
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, Union
 
+from docscorer.features import CharClassifier
+from docscorer.scorers.utils import get_threshold
 from docscorer.utils import average, join_utf_blocks
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class LanguageProfile:
+    """Thresholds of a reference language ("xxx_scrp"), resolved once with
+    get_threshold() and shared by all the scorers. Get them with
+    ScorerConfiguration.get_profile()."""
+
+    # attribute -> ScorerConfiguration threshold table
+    THRESHOLD_TABLES = {
+        "punctuation_percent_bad": "PUNCTUATION_PERCENT_BAD",
+        "punctuation_percent_semibad": "PUNCTUATION_PERCENT_SEMIBAD",
+        "punctuation_percent_desired_max": "PUNCTUATION_PERCENT_DESIRED_MAX",
+        "punctuation_percent_desired_min": "PUNCTUATION_PERCENT_DESIRED_MIN",
+        "singular_chars_percent_max": "SINGULAR_CHARS_PERCENT_MAX",
+        "singular_chars_percent_bad": "SINGULAR_CHARS_PERCENT_BAD",
+        "singular_chars_percent_semibad": "SINGULAR_CHARS_PERCENT_SEMIBAD",
+        "singular_chars_percent_desired": "SINGULAR_CHARS_PERCENT_DESIRED",
+        "numbers_percent_max": "NUMBERS_PERCENT_MAX",
+        "numbers_percent_desired": "NUMBERS_PERCENT_DESIRED",
+        "menus_average_length": "MENUS_AVERAGE_LENGTH",
+        "long_text_max": "LONG_TEXT_MAX",
+        "long_text_min": "LONG_TEXT_MIN",
+    }
+    __slots__ = ("language", "no_punctuation", *THRESHOLD_TABLES)
+
+    def __init__(self, config: "ScorerConfiguration", language: str):
+        self.language = language
+        # Languages with no mandatory punctuation
+        self.no_punctuation = language in config.no_punctuation_exception_list
+        for name, table in self.THRESHOLD_TABLES.items():
+            setattr(self, name, get_threshold(getattr(config, table), language))
+
+    def __repr__(self) -> str:
+        return f"LanguageProfile({self.language!r})"
+
 
 class ScorerConfiguration:
     # Constants
@@ -31,6 +73,40 @@ class ScorerConfiguration:
     ACCUM_SINGULAR_NOT_PENALIZED = 30
     ACCUM_SINGULAR_HARD_PENALIZED = 250
 
+    # Resolved tables saved in the configuration snapshot, a JSON file
+    SNAPSHOT_VERSION = 2
+    SNAPSHOT_ATTRIBUTES = [
+        "no_punctuation_exception_list",
+        "LANGUAGES",
+        "SCRIPTS",
+        "modeled_numbers",
+        "modeled_punctuation",
+        "modeled_singular_chars",
+        "PUNCTUATION_PERCENT_BAD",
+        "PUNCTUATION_PERCENT_SEMIBAD",
+        "PUNCTUATION_PERCENT_DESIRED_MAX",
+        "PUNCTUATION_PERCENT_DESIRED_MIN",
+        "SINGULAR_CHARS_PERCENT_MAX",
+        "SINGULAR_CHARS_PERCENT_BAD",
+        "SINGULAR_CHARS_PERCENT_SEMIBAD",
+        "SINGULAR_CHARS_PERCENT_DESIRED",
+        "NUMBERS_PERCENT_MAX",
+        "NUMBERS_PERCENT_DESIRED",
+        "MENUS_AVERAGE_LENGTH",
+        "LONG_TEXT_MAX",
+        "LONG_TEXT_MIN",
+        "char_patterns",
+    ]
+    # Snapshot attributes whose values are tuples, saved as JSON lists
+    TUPLE_ATTRIBUTES = ["PUNCTUATION_PERCENT_BAD"]
+    PATTERN_ATTRIBUTES = [
+        "numbers_pattern",
+        "singular_chars_pattern",
+        "punctuation_pattern",
+        "word_pattern",
+    ]
+    CACHE_DIR_ENV = "DOCSCORER_CACHE_DIR"
+
     def __init__(self, args: Optional[Dict[str, Any]] = None):
         self.args = args or {}
         self._base_dir = Path(__file__).resolve().parent
@@ -38,11 +114,42 @@ class ScorerConfiguration:
 
         self.text_in_output = self.args.get("--text_in_output", False)
         self.only_final_score = self.args.get("--only_final_score", False)
+        # Stop scoring a document once its score is known to be 0, the subscores not
+        # computed are NaN
+        self.early_exit = self.args.get("--early_exit", False)
+        self.json_decoder = self.args.get("--json_decoder") or "auto"
+        # Optional SQLite cache of the subscores of scored documents (see ScoreCache),
+        # its size in MB
+        self.score_cache = self.args.get("--score_cache")
+        self.score_cache_size = int(self.args.get("--score_cache_size") or 1024)
+        # Segments whose features are kept (see SegmentFeatureCache), 0 to count all of
+        # them
+        self.segment_cache_size = int(self.args.get("--segment_cache") or 0)
+        # CountMinSketch of the segments of the corpus, for the corpus_repeated_score
+        # column (see CorpusRepeatedScorer)
+        self.sketch = self.args.get("--sketch")
+        self.min_repeated_documents = int(self.args.get("--min_repeated_docs") or 10)
+        # Configuration snapshots and line indexes (see LineIndex)
+        self.cache_dir = self.cache_directory(self.args.get("--config_cache"))[0]
+
+        # The resolved tables only depend on the config files, so they are built once
+        # and then loaded from a snapshot keyed by their hash, without pandas
+        self._profiles: Dict[str, LanguageProfile] = {}
+        self.snapshot_key = self._compute_snapshot_key()
+        snapshot_path, configured = self._snapshot_path()
+        if not self._load_snapshot(snapshot_path):
+            self._build()
+            if configured or self._writable(snapshot_path.parent):
+                self._save_snapshot(snapshot_path)
 
-        # Load benchmark and language family data
-        self.df_lang_adaption = pd.read_csv(self.benchmark_config)
-        self.df_families = pd.read_csv(self.lang_families_config)
+    def get_profile(self, language: str) -> LanguageProfile:
+        """LanguageProfile of a reference language ("xxx_scrp"), cached per language."""
+        profile = self._profiles.get(language)
+        if profile is None:
+            profile = self._profiles[language] = LanguageProfile(self, language)
+        return profile
 
+    def _build(self) -> None:
         # special adaptions to special languages
         with open(self.no_punctuation_config, "r", encoding="utf-8") as f:
             self.no_punctuation_exception_list = json.load(f)
@@ -53,6 +160,132 @@ class ScorerConfiguration:
         self._adapt_missing_languages()
         self._compute_scoring_metrics()
 
+    # Benchmark and language family data, only read when the snapshot is built
+    @cached_property
+    def df_lang_adaption(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_csv(self.benchmark_config)
+
+    @cached_property
+    def df_families(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_csv(self.lang_families_config)
+
+    def _compute_snapshot_key(self) -> str:
+        digest = hashlib.sha256()
+        constants = {
+            name: getattr(self, name)
+            for name in dir(type(self))
+            if name.isupper() and not name.startswith("_")
+        }
+        digest.update(repr(sorted(constants.items())).encode("utf-8"))
+        for path in (
+            self.benchmark_config,
+            self.lang_families_config,
+            self.no_punctuation_config,
+            self.char_patterns_config,
+        ):
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    @cached_property
+    def score_fingerprint(self) -> bytes:
+        """Hash of everything the subscores of a document depend on besides its content:
+        the configuration files, the options and the scoring code. Keys of the
+        ScoreCache entries."""
+        digest = hashlib.sha256(self.snapshot_key.encode("utf-8"))
+        digest.update(self.info_score_config.read_bytes())
+        digest.update(repr(self.early_exit).encode("utf-8"))
+        paths = sorted(self.interpolation_functions_dir.iterdir()) + sorted(
+            self._base_dir.rglob("*.py")
+        )
+        for path in paths:
+            if path.is_file():
+                digest.update(path.name.encode("utf-8"))
+                digest.update(path.read_bytes())
+        return digest.digest()
+
+    @classmethod
+    def cache_directory(cls, configured: Optional[str] = None) -> Tuple[Path, bool]:
+        """Directory of the configuration snapshots and line indexes (`configured`,
+        $DOCSCORER_CACHE_DIR or ~/.cache/docscorer), and whether it was configured (not
+        the default one)."""
+        cache_dir = configured or os.environ.get(cls.CACHE_DIR_ENV)
+        if cache_dir:
+            return Path(cache_dir), True
+        return (
+            Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+            / "docscorer",
+            False,
+        )
+
+    def _snapshot_path(self) -> Tuple[Path, bool]:
+        """Path of the snapshot, and whether its directory was configured (not the
+        default one)."""
+        cache_dir, configured = self.cache_directory(self.args.get("--config_cache"))
+        return (
+            cache_dir / f"configuration-{self.snapshot_key[:32]}.json",
+            configured,
+        )
+
+    @staticmethod
+    def _writable(directory: Path) -> bool:
+        """Whether `directory` can be written, or created in its closest existing
+        parent."""
+        while not directory.exists() and directory != directory.parent:
+            directory = directory.parent
+        return directory.is_dir() and os.access(directory, os.W_OK | os.X_OK)
+
+    def _load_snapshot(self, path: Path) -> bool:
+        # JSON, so a snapshot written by someone else can give wrong tables at worst,
+        # never run code
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot["key"] != self.snapshot_key:
+                return False
+            for name in self.SNAPSHOT_ATTRIBUTES:
+                setattr(self, name, snapshot["attributes"][name])
+            for name in self.TUPLE_ATTRIBUTES:
+                setattr(
+                    self,
+                    name,
+                    {key: tuple(value) for key, value in getattr(self, name).items()},
+                )
+            for name, (source, flags) in snapshot["patterns"].items():
+                setattr(self, name, re.compile(source, flags))
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.debug(f"Ignoring unreadable configuration snapshot {path}: {e!r}")
+            return False
+        self.char_classifier = CharClassifier(self.char_patterns)
+        return True
+
+    def _save_snapshot(self, path: Path) -> None:
+        snapshot = {
+            "key": self.snapshot_key,
+            "attributes": {
+                name: getattr(self, name) for name in self.SNAPSHOT_ATTRIBUTES
+            },
+            "patterns": {
+                name: (getattr(self, name).pattern, getattr(self, name).flags)
+                for name in self.PATTERN_ATTRIBUTES
+            },
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written to a temporary file and renamed, so concurrent processes never
+            # read half a snapshot
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.debug(f"Configuration snapshot not saved to {path}: {e!r}")
+
     def _load_config_files(self) -> None:
         def get_path(
             default: Union[str, Path],
@@ -95,27 +328,39 @@ class ScorerConfiguration:
             "--no_punctuation_exception_list",
         )
     def _prepare_modeled_scores(self) -> None:
+        # Values are stored as Python floats: numpy scalars would leak into the scores
+        # and round differently than the batch scorers
         self.modeled_numbers = {
-            f"{line.language_3_chars}_{line.script}": round(line.numbers_score, 2)
+            f"{line.language_3_chars}_{line.script}": float(
+                round(line.numbers_score, 2)
+            )
             for _, line in self.df_lang_adaption.iterrows()
         }
         self.modeled_punctuation = {
-            f"{line.language_3_chars}_{line.script}": round(line.punctuation_score, 2)
+            f"{line.language_3_chars}_{line.script}": float(
+                round(line.punctuation_score, 2)
+            )
             for _, line in self.df_lang_adaption.iterrows()
         }
         self.modeled_singular_chars = {
-            f"{line.language_3_chars}_{line.script}": round(
-                line.singular_chars_score, 2
+            f"{line.language_3_chars}_{line.script}": float(
+                round(line.singular_chars_score, 2)
             )
             for _, line in self.df_lang_adaption.iterrows()
         }
-        self.SCRIPTS = self.df_lang_adaption.script.unique() #covered scripts
+        self.SCRIPTS = self.df_lang_adaption.script.unique().tolist()  # covered scripts
         for script in self.df_lang_adaption.script.unique():
             df_selected = self.df_lang_adaption[self.df_lang_adaption.script == script]
-            self.modeled_numbers[script] = round(df_selected.numbers_score.mean(), 2)
-            self.modeled_punctuation[script] = round(df_selected.punctuation_score.mean(), 2)
-            self.modeled_singular_chars[script] = round(df_selected.singular_chars_score.mean(), 2)
-        
+            self.modeled_numbers[script] = float(
+                round(df_selected.numbers_score.mean(), 2)
+            )
+            self.modeled_punctuation[script] = float(
+                round(df_selected.punctuation_score.mean(), 2)
+            )
+            self.modeled_singular_chars[script] = float(
+                round(df_selected.singular_chars_score.mean(), 2)
+            )
+
 
     def _adapt_missing_languages(self) -> None:
         df_lang_no_data = self.df_families[
@@ -124,8 +369,7 @@ class ScorerConfiguration:
         df_lang_data = self.df_families[
             self.df_families.language_3_chars.isin(self.LANGUAGES)
         ]
-        df_lang_adapted = pd.merge(
-            df_lang_data,
+        df_lang_adapted = df_lang_data.merge(
             self.df_lang_adaption,
             on=["language_3_chars", "script"],
             how="inner",
@@ -263,6 +507,7 @@ class ScorerConfiguration:
     def _set_character_patterns(self) -> None:
         with open(self.char_patterns_config, "r", encoding="utf-8") as f:
             char_patterns = json.load(f)
+        self.char_patterns = char_patterns
         try:
             self.numbers_pattern = join_utf_blocks(char_patterns["NUMBERS"])
             self.singular_chars_pattern = join_utf_blocks(
@@ -278,6 +523,7 @@ class ScorerConfiguration:
                 + char_patterns["SPACES"],
                 inverse=True,
             )
+            self.char_classifier = CharClassifier(char_patterns)
         except KeyError as exception:
             logging.exception(
                 f"Key {exception} not found in {self.char_patterns_config}"
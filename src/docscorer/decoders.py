@@ -0,0 +1,138 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Union
+
+# Decoders turn a jsonl line into a dict with (at least) these fields. The selective
+# ones (msgspec, simdjson) skip the rest of the record (per segment scores, metadata...)
+# without building Python objects for it.
+RECORD_FIELDS = ("id", "lang", "seg_langs", "text")
+
+Decoder = Callable[[Union[str, bytes]], Dict[str, Any]]
+
+# A JSON escape: \uXXXX (its code point) or any other one
+_ESCAPE = re.compile(r"\\(?:u([0-9a-fA-F]{4})|.)")
+
+
+def _has_lone_surrogate(line: Union[str, bytes]) -> bool:
+    """Whether a JSON line escapes a surrogate that is not part of a pair ("\\ud800").
+    orjson and msgspec reject such lines, json and simdjson decode them into strings
+    that cannot be encoded: they are checked, so every decoder skips the same records.
+    Only lines with a surrogate escape are scanned."""
+    if isinstance(line, bytes):
+        if b"\\ud" not in line and b"\\uD" not in line:
+            return False
+        line = line.decode("utf-8", "replace")
+    elif "\\ud" not in line and "\\uD" not in line:
+        return False
+    high_end = -1  # end of the last high surrogate escape, while it is unpaired
+    for match in _ESCAPE.finditer(line):
+        code_point = int(match[1], 16) if match[1] else -1
+        if high_end >= 0:
+            if match.start() != high_end or not 0xDC00 <= code_point <= 0xDFFF:
+                return True
+            high_end = -1
+        elif 0xD800 <= code_point <= 0xDBFF:
+            high_end = match.end()
+        elif 0xDC00 <= code_point <= 0xDFFF:
+            return True
+    return high_end >= 0
+
+
+def _checked(decode: Decoder) -> Decoder:
+    """`decode`, rejecting lines with lone surrogates (see _has_lone_surrogate())."""
+
+    def checked_decode(line: Union[str, bytes]) -> Dict[str, Any]:
+        record = decode(line)
+        if _has_lone_surrogate(line):
+            raise ValueError("JSON string with a lone surrogate escape")
+        return record
+
+    return checked_decode
+
+
+def _json_decoder() -> Decoder:
+    return _checked(json.loads)
+
+
+def _orjson_decoder() -> Decoder:
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec_decoder() -> Decoder:
+    import msgspec
+
+    class Record(msgspec.Struct):
+        id: Any
+        lang: Union[str, List[str]]
+        seg_langs: List[str]
+        text: str
+
+    decoder = msgspec.json.Decoder(Record)
+
+    def decode(line: Union[str, bytes]) -> Dict[str, Any]:
+        record = decoder.decode(line)
+        return {
+            "id": record.id,
+            "lang": record.lang,
+            "seg_langs": record.seg_langs,
+            "text": record.text,
+        }
+
+    return decode
+
+
+def _simdjson_decoder() -> Decoder:
+    import simdjson
+
+    # Documents are parsed lazily: only the values that are read are converted. The
+    # parser is reused, so every value is converted before the next line is parsed.
+    parser = simdjson.Parser()
+
+    def value(element: Any) -> Any:
+        if isinstance(element, simdjson.Array):
+            return element.as_list()
+        if isinstance(element, simdjson.Object):
+            return element.as_dict()
+        return element
+
+    def decode(line: Union[str, bytes]) -> Dict[str, Any]:
+        try:
+            document = parser.parse(line)
+        except RuntimeError as e:  # invalid JSON
+            raise ValueError(str(e)) from None
+        return {field: value(document[field]) for field in RECORD_FIELDS}
+
+    return _checked(decode)
+
+
+DECODERS: Dict[str, Callable[[], Decoder]] = {
+    "json": _json_decoder,
+    "orjson": _orjson_decoder,
+    "msgspec": _msgspec_decoder,
+    "simdjson": _simdjson_decoder,
+}
+# Fastest first, "auto" takes the first one that is installed
+AUTO_ORDER = ("msgspec", "simdjson", "orjson", "json")
+
+
+def get_decoder(name: str = "auto") -> Decoder:
+    """Record decoder by name ("json", "orjson", "msgspec", "simdjson" or "auto").
+    Malformed lines and records raise ValueError, KeyError or TypeError."""
+    if name == "auto":
+        for candidate in AUTO_ORDER:
+            try:
+                return DECODERS[candidate]()
+            except ImportError:
+                continue
+    if name not in DECODERS:
+        raise ValueError(
+            f"Unknown JSON decoder '{name}', choose one of: auto, {', '.join(DECODERS)}"
+        )
+    try:
+        return DECODERS[name]()
+    except ImportError:
+        raise ImportError(
+            f"The {name} package is required by the '{name}' JSON decoder"
+        ) from None
@@ -1,23 +1,66 @@
+import csv
+import itertools
 import json
 import logging
-import re
+import math
+import os
+import time
+from contextlib import ExitStack, nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-import math
-import pandas as pd
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
 
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.singular_chars_scorer import SingularCharsScorer
+import numpy as np
+
+from docscorer.checkpoint import RunManifest
+from docscorer.columnar import COLUMNAR_FORMATS, ColumnarWriter, columnar_format
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.decoders import get_decoder
+from docscorer.features import CharClassifier, FeatureBatch, SegmentFeatureCache
+from docscorer.line_index import LineIndex, read_lines
+from docscorer.pipeline import ReaderThread, WriterThread
+from docscorer.score_cache import RESULT_VALUES, ScoreCache
+from docscorer.scorers.corpus_repeated_scorer import CorpusRepeatedScorer
 from docscorer.scorers.informativeness_scorer import InformativenessScorer
 from docscorer.scorers.lang_scorer import LangScorer
 from docscorer.scorers.long_texts_scorer import LongTextScorer
 from docscorer.scorers.numbers_scorer import NumsScorer
 from docscorer.scorers.punct_scorer import PunctScorer
 from docscorer.scorers.repeated_scorer import RepeatedScorer
-from docscorer.scorers.url_scorer import URLScorer
 from docscorer.scorers.short_segments_score import ShortSegmentsScore
-from docscorer.utils import custom_mean, remove_delimitators
+from docscorer.scorers.singular_chars_scorer import SingularCharsScorer
+from docscorer.scorers.url_scorer import URLScorer
+from docscorer.scorers.utils import round_values
+from docscorer.sharding import SPLIT_SIZE, shard_units, unit_name
+from docscorer.sketch import DEFAULT_SIZE, CountMinSketch, document_hashes
+from docscorer.streams import (
+    COMPRESSION_EXTENSIONS,
+    ZSTD_EXTENSION,
+    list_inputs,
+    open_input,
+    open_output,
+    sync_output,
+)
+from docscorer.utils import remove_delimitators
+
+if TYPE_CHECKING:
+    from docscorer.parallel import ScoringPool
+    from docscorer.streaming import StreamingDocumentScorer
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -34,8 +77,157 @@ class ScoreResult:
     long_segments: Tuple[float, float]  # [short_score, long_score]
     short_segments: float
 
+    def values(self) -> Tuple[float, ...]:
+        """The subscores as 10 floats, long_segments as two (as stored by
+        ScoreCache)."""
+        return (
+            self.language,
+            self.punctuation,
+            self.singular_chars,
+            self.numbers,
+            self.repeated,
+            self.url,
+            self.informativeness,
+            *self.long_segments,
+            self.short_segments,
+        )
+
+    @classmethod
+    def from_values(cls, values: Sequence[float]) -> "ScoreResult":
+        return cls(*values[:7], (values[7], values[8]), values[9])
+
+
+@dataclass
+class BatchScoreResult:
+    """Holds all individual scores for a batch of documents, one array item per
+    document."""
+
+    language: np.ndarray
+    punctuation: np.ndarray
+    singular_chars: np.ndarray
+    numbers: np.ndarray
+    repeated: np.ndarray
+    url: np.ndarray
+    informativeness: np.ndarray
+    long_segments: Tuple[np.ndarray, np.ndarray]  # [short_score, long_score]
+    short_segments: np.ndarray
+
+    def results(self) -> List[ScoreResult]:
+        """Per document ScoreResult with Python floats."""
+        columns = [
+            self.language.tolist(),
+            self.punctuation.tolist(),
+            self.singular_chars.tolist(),
+            self.numbers.tolist(),
+            self.repeated.tolist(),
+            self.url.tolist(),
+            self.informativeness.tolist(),
+            list(
+                zip(
+                    self.long_segments[0].tolist(),
+                    self.long_segments[1].tolist(),
+                    strict=True,
+                )
+            ),
+            self.short_segments.tolist(),
+        ]
+        return [ScoreResult(*values) for values in zip(*columns, strict=True)]
+
+    def take(self, indices: np.ndarray) -> "BatchScoreResult":
+        """Subscores of the documents at `indices`, which can repeat."""
+        return BatchScoreResult(
+            language=self.language[indices],
+            punctuation=self.punctuation[indices],
+            singular_chars=self.singular_chars[indices],
+            numbers=self.numbers[indices],
+            repeated=self.repeated[indices],
+            url=self.url[indices],
+            informativeness=self.informativeness[indices],
+            long_segments=(
+                self.long_segments[0][indices],
+                self.long_segments[1][indices],
+            ),
+            short_segments=self.short_segments[indices],
+        )
+
+    def values(self) -> np.ndarray:
+        """The subscores as a (documents, 10) array, with the columns of
+        ScoreResult.values()."""
+        return np.column_stack(
+            [
+                self.language,
+                self.punctuation,
+                self.singular_chars,
+                self.numbers,
+                self.repeated,
+                self.url,
+                self.informativeness,
+                *self.long_segments,
+                self.short_segments,
+            ]
+        ).astype(np.float64)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "BatchScoreResult":
+        columns = list(values.T)
+        return cls(*columns[:7], (columns[7], columns[8]), columns[9])
+
+
+# Builtin pow(), as the SIMD implementations of np.power() can differ from it in the
+# last bit
+_pow = np.frompyfunc(pow, 2, 1)
+
+# (ref_lang, ref_script, lang_segments, document_text, doc_id), as in score_document()
+Document = Tuple[str, str, List[str], str, str]
+
 
 class DocumentScorer:
+    OUTPUT_COLUMNS = [
+        "doc_id",
+        "wds_score",
+        "language_score",
+        "url_score",
+        "punctuation_score",
+        "singular_chars_score",
+        "numbers_score",
+        "repeated_score",
+        "n_long_segments_score",
+        "great_segment_score",
+        "informativeness_score",
+        "short_segments_score",
+    ]
+    OUTPUT_BUFFER_SIZE = 1 << 20
+    CHUNK_SIZE = 256  # documents per scoring task
+    CHECKPOINT_INTERVAL = 10.0  # seconds between the checkpoints of a file in progress
+    PIPELINE_DEPTH = 4  # chunks waiting between the reader, scoring and writer stages
+    # Subscores from the cheapest to the most expensive to compute (zstd compression for
+    # informativeness), the order in which they run with early_exit. Informativeness,
+    # the last one, is NaN if the scoring stopped early
+    EARLY_EXIT_ORDER = (
+        "language",
+        "short_segments",
+        "numbers",
+        "singular_chars",
+        "long_segments",
+        "punctuation",
+        "url",
+        "repeated",
+        "informativeness",
+    )
+    APPROXIMATE_SEGMENTS = (
+        32  # segments of a document used by the approximate score of tiered scoring
+    )
+    # Any of them below 0.1 makes the overall score 0 (see _aggregate_scores())
+    PENALTY_SUBSCORES = (
+        "url",
+        "punctuation",
+        "singular_chars",
+        "numbers",
+        "repeated",
+        "informativeness",
+        "short_segments",
+    )
+
     def __init__(self, config: Optional[ScorerConfiguration] = None):
         self.config = config if config else ScorerConfiguration()
         self.benchmark_config = self.config.benchmark_config
@@ -51,35 +243,59 @@ class DocumentScorer:
         self.long_text_scorer = LongTextScorer(self.config)
         self.repeated_scorer = RepeatedScorer(self.config)
         self.short_segments_scorer = ShortSegmentsScore(self.config)
-
-    def _extract_features(self, document_text: str) -> dict[str, list[int]]:
-        """Extract counts of words, punctuation, sing. chars, and numbers per line."""
-        features = [
-            (
-                len(self.config.word_pattern.findall(segment)),
-                len(self.config.punctuation_pattern.findall(segment)),
-                len(self.config.singular_chars_pattern.findall(segment)),
-                len(self.config.numbers_pattern.findall(segment)),
+        self.corpus_repeated_scorer = (
+            CorpusRepeatedScorer(self.config) if self.config.sketch else None
+        )
+        self.decode_record = get_decoder(self.config.json_decoder)
+        # Documents scored once as duplicates of another one of their batch, by this
+        # process and the workers of its ScoringPool (see _take_worker_counts())
+        self._duplicates = 0
+        self.char_counter: CharClassifier | SegmentFeatureCache = (
+            SegmentFeatureCache(
+                self.config.char_classifier, self.config.segment_cache_size
             )
-            for segment in document_text.split("\n")
-        ]
+            if self.config.segment_cache_size > 0
+            else self.config.char_classifier
+        )
+        self.score_cache = (
+            ScoreCache(
+                self.config.score_cache,
+                self.config.score_fingerprint,
+                self.config.score_cache_size << 20,
+            )
+            if self.config.score_cache
+            else None
+        )
+
+    def _extract_features(self, document_text: str) -> dict[str, Any]:
+        """Extract counts of words, punctuation, sing. chars, and numbers per line, and
+        the line hashes."""
+        counts, segment_hashes, segment_lengths = self.char_counter.features(
+            document_text
+        )
+        word_chars, punctuation_chars, singular_chars, numbers = counts.T.tolist()
         return {
-            "word_chars": [f[0] for f in features],
-            "punctuation_chars": [f[1] for f in features],
-            "singular_chars": [f[2] for f in features],
-            "numbers": [f[3] for f in features],
+            "word_chars": word_chars,
+            "punctuation_chars": punctuation_chars,
+            "singular_chars": singular_chars,
+            "numbers": numbers,
+            "segment_hashes": segment_hashes,
+            "segment_lengths": segment_lengths,
         }
 
     def _compute_scores(
         self,
-        ref_lang: str,
+        profile: LanguageProfile,
         lang_segments: list[str],
         document_text: str,
         ref_script: str,
         doc_id: str,
-        features: dict[str, list[int]],
+        features: dict[str, Any],
     ) -> ScoreResult:
-        """Compute all scorer outputs and return structured results."""
+        """Compute all scorer outputs and return structured results. With the early_exit
+        configuration, the scorers run in EARLY_EXIT_ORDER and stop once the overall
+        score is known to be 0: a penalty subscore below 0.1, or language and long
+        segments subscores of 0. The subscores not computed are NaN."""
         num_word_chars = sum(features["word_chars"])
         num_punctuation_chars = sum(remove_delimitators(punct_chars=features["punctuation_chars"],
                                                         word_chars=features["word_chars"],
@@ -87,37 +303,87 @@ class DocumentScorer:
         num_singular_chars = sum(features["singular_chars"])
         num_numbers = sum(features["numbers"])
 
-        return ScoreResult(
-            language=self.lang_scorer.score(
-                ref_lang, lang_segments, features["word_chars"], doc_id
+        subscores = {
+            "language": lambda: self.lang_scorer.score(
+                profile, lang_segments, features["word_chars"], doc_id
             ),
-            punctuation=self.punct_scorer.score(
-                ref_language=ref_lang, num_punctuation_chars = num_punctuation_chars, num_word_chars = num_word_chars,
-                punct_chars=features["punctuation_chars"], word_chars=features["word_chars"]
+            "punctuation": lambda: self.punct_scorer.score(
+                profile=profile,
+                num_punctuation_chars=num_punctuation_chars,
+                num_word_chars=num_word_chars,
+                punct_chars=features["punctuation_chars"],
+                word_chars=features["word_chars"],
             ),
-            singular_chars=self.singular_chars_scorer.score( ref_lang, num_singular_chars, 
-                                                            num_word_chars, features["singular_chars"], 
-                                                            features["word_chars"] 
+            "singular_chars": lambda: self.singular_chars_scorer.score(
+                profile,
+                num_singular_chars,
+                num_word_chars,
+                features["singular_chars"],
+                features["word_chars"],
             ),
-            numbers=self.numbers_scorer.score(ref_lang, num_numbers, num_word_chars, 
-                                              features["numbers"], features["word_chars"]
+            "numbers": lambda: self.numbers_scorer.score(
+                profile,
+                num_numbers,
+                num_word_chars,
+                features["numbers"],
+                features["word_chars"],
             ),
-            repeated=self.repeated_scorer.score(document_text),
-            url=self.url_scorer.score(ref_lang, document_text, features["word_chars"]),
-            long_segments=self.long_text_scorer.score(
-                ref_lang, lang_segments, features["word_chars"]
+            "repeated": lambda: self.repeated_scorer.score_hashes(
+                features["segment_hashes"], features["segment_lengths"]
             ),
-            informativeness=self.info_scorer.score(document_text, ref_script),
-            short_segments=self.short_segments_scorer.score(ref_lang, features["word_chars"]),
-        )
+            "url": lambda: self.url_scorer.score(
+                profile, document_text, features["word_chars"]
+            ),
+            "long_segments": lambda: self.long_text_scorer.score(
+                profile, lang_segments, features["word_chars"]
+            ),
+            "informativeness": lambda: self.info_scorer.score(
+                document_text, ref_script
+            ),
+            "short_segments": lambda: self.short_segments_scorer.score(
+                profile, features["word_chars"]
+            ),
+        }
+        return self._run_subscores(subscores)
+
+    def _run_subscores(self, subscores: Dict[str, Callable[[], Any]]) -> ScoreResult:
+        """ScoreResult of the `subscores` (name -> function computing it) of a document,
+        stopping early with the early_exit configuration (see _compute_scores())."""
+        if not self.config.early_exit:
+            return ScoreResult(
+                **{name: subscore() for name, subscore in subscores.items()}
+            )
+
+        # Same as the batch: stop as soon as the overall score is known to be 0
+        results: Dict[str, Any] = {name: math.nan for name in subscores}
+        results["long_segments"] = (math.nan, math.nan)
+        for name in self.EARLY_EXIT_ORDER:
+            results[name] = subscores[name]()
+            if name in self.PENALTY_SUBSCORES and results[name] < 0.1:
+                break
+            if (
+                name == "long_segments"
+                and results["language"] == 0
+                and results[name] == (0, 0)
+            ):
+                break
+        return ScoreResult(**results)
+
+    def _overall_score(self, scores: ScoreResult) -> float:
+        """wds_score of a _compute_scores() result, 0 if the scoring stopped early."""
+        if self.config.early_exit and math.isnan(scores.informativeness):
+            return 0.0
+        return self._aggregate_scores(scores)
 
     def _aggregate_scores(self, scores: ScoreResult, alpha = 2.9) -> float:
         """Aggregate individual scores into a single overall score."""
         def exponent(subscore, subscores, alpha, beta=3):
             a = subscore**-alpha    
-            b = sum([x**-alpha for x in subscores])
+            b = 0.0  # added in order, as in _aggregate_batch_scores()
+            for x in subscores:
+                b += x**-alpha
             return a/b*beta
-        
+
         penalty_scores = [
                 scores.url,
                 scores.punctuation,
@@ -131,7 +397,7 @@ class DocumentScorer:
         if any(x < 0.1 for x in penalty_scores):
             return 0.0
         P = math.prod([x**exponent(x, penalty_scores, alpha) for x in penalty_scores])
-        
+
         base_score = (
             scores.language * 0.8
             + scores.long_segments[0]/10
@@ -139,14 +405,174 @@ class DocumentScorer:
         ) * P
         return base_score
 
+    def _compute_batch_scores(
+        self,
+        profiles: List[LanguageProfile],
+        ref_scripts: List[str],
+        documents: List[str],
+        features: FeatureBatch,
+    ) -> BatchScoreResult:
+        """Compute all scorer outputs for a batch of documents, as arrays. With the
+        early_exit configuration, the scorers run in EARLY_EXIT_ORDER and stop for every
+        document as soon as its overall score is known to be 0 (see _compute_scores()):
+        the rest of its subscores are NaN.
+        """
+        totals = self._batch_totals(features)
+        if not self.config.early_exit:
+            return BatchScoreResult(
+                **{
+                    name: self._batch_subscore(
+                        name, profiles, ref_scripts, documents, features, totals
+                    )
+                    for name in BatchScoreResult.__dataclass_fields__
+                }
+            )
+
+        # Every scorer only runs on the documents whose overall score can still be above
+        # 0
+        n_documents = features.n_documents
+        results: Dict[str, Any] = {
+            name: np.full(n_documents, np.nan)
+            for name in BatchScoreResult.__dataclass_fields__
+        }
+        results["long_segments"] = (
+            np.full(n_documents, np.nan),
+            np.full(n_documents, np.nan),
+        )
+        remaining = np.arange(n_documents)
+        for name in self.EARLY_EXIT_ORDER:
+            if len(remaining) == n_documents:
+                subset = (profiles, ref_scripts, documents, features, totals)
+            else:
+                subset = (
+                    [profiles[i] for i in remaining],
+                    [ref_scripts[i] for i in remaining],
+                    [documents[i] for i in remaining],
+                    features.select(remaining),
+                    {key: values[remaining] for key, values in totals.items()},
+                )
+            values = self._batch_subscore(name, *subset)
+            if name == "long_segments":
+                results[name][0][remaining] = values[0]
+                results[name][1][remaining] = values[1]
+                keep = (
+                    (results["language"][remaining] != 0)
+                    | (values[0] != 0)
+                    | (values[1] != 0)
+                )
+            else:
+                results[name][remaining] = values
+                # Not `values >= 0.1`: a NaN subscore does not stop the scoring of a
+                # document, as in _compute_scores()
+                keep = (
+                    ~(values < 0.1)
+                    if name in self.PENALTY_SUBSCORES
+                    else np.ones(len(remaining), dtype=bool)
+                )
+            remaining = remaining[keep]
+            if not len(remaining):
+                break
+        return BatchScoreResult(**results)
+
+    @staticmethod
+    def _batch_totals(features: FeatureBatch) -> Dict[str, np.ndarray]:
+        """Per document totals of the segment features used by the scorers."""
+        # remove_delimitators(): segments made only of punctuation are not counted
+        punctuation_chars = np.where(
+            (features.numbers == 0)
+            & (features.word_chars == 0)
+            & (features.punctuation_chars > 5),
+            0,
+            features.punctuation_chars,
+        )
+        return {
+            "word_chars": features.document_sum(features.word_chars),
+            "punctuation_chars": features.document_sum(punctuation_chars),
+            "singular_chars": features.document_sum(features.singular_chars),
+            "numbers": features.document_sum(features.numbers),
+        }
+
+    def _batch_subscore(
+        self,
+        name: str,
+        profiles: List[LanguageProfile],
+        ref_scripts: List[str],
+        documents: List[str],
+        features: FeatureBatch,
+        totals: Dict[str, np.ndarray],
+    ) -> Any:
+        """One of the BatchScoreResult subscores for a batch of documents."""
+        if name == "language":
+            return self.lang_scorer.score_batch(profiles, features)
+        if name == "punctuation":
+            return self.punct_scorer.score_batch(
+                profiles, features, totals["punctuation_chars"], totals["word_chars"]
+            )
+        if name == "singular_chars":
+            return self.singular_chars_scorer.score_batch(
+                profiles, features, totals["singular_chars"], totals["word_chars"]
+            )
+        if name == "numbers":
+            return self.numbers_scorer.score_batch(
+                profiles, features, totals["numbers"], totals["word_chars"]
+            )
+        if name == "repeated":
+            return self.repeated_scorer.score_batch(features)
+        if name == "url":
+            return self.url_scorer.score_batch(
+                profiles, documents, features, totals["word_chars"]
+            )
+        if name == "long_segments":
+            return self.long_text_scorer.score_batch(profiles, features)
+        if name == "informativeness":
+            return self.info_scorer.score_batch(documents, ref_scripts)
+        if name == "short_segments":
+            return self.short_segments_scorer.score_batch(profiles, features)
+        raise ValueError(f"Unknown subscore {name}")
+
+    def _aggregate_batch_scores(
+        self,
+        scores: BatchScoreResult,
+        alpha=2.9,
+        beta=3,
+        penalties: Sequence[str] = PENALTY_SUBSCORES,
+    ) -> np.ndarray:
+        """_aggregate_scores() for a batch, with the same operations in the same order.
+        The overall score only uses the `penalties` subscores (all of them by default).
+        """
+        penalty_scores = [getattr(scores, name) for name in penalties]
+        rejected = np.zeros(len(scores.url), dtype=bool)
+        for x in penalty_scores:
+            rejected |= x < 0.1
+        kept = ~rejected
+        penalty_scores = [x[kept] for x in penalty_scores]
+
+        weights = [_pow(x, -alpha).astype(np.float64) for x in penalty_scores]
+        total_weight = weights[0]
+        for weight in weights[1:]:
+            total_weight = total_weight + weight
+        P = 1
+        for x, weight in zip(penalty_scores, weights, strict=True):
+            P = P * _pow(x, weight / total_weight * beta).astype(np.float64)
+
+        overall_scores = np.zeros(len(scores.url), dtype=np.float64)
+        overall_scores[kept] = (
+            scores.language[kept] * 0.8
+            + scores.long_segments[0][kept] / 10
+            + scores.long_segments[1][kept] / 10
+        ) * P
+        return overall_scores
+
     def _format_output(
         self,
         overall_score: float,
         scores: ScoreResult,
         document_text: str,
         raw_score: bool,
+        corpus_repeated: Optional[float] = None,
     ) -> float | List[float | str]:
-        """Format the output depending on configuration."""
+        """Format the output depending on configuration, with the corpus_repeated_score
+        if given."""
         if raw_score:
             return overall_score
 
@@ -163,6 +589,8 @@ class DocumentScorer:
             round(scores.informativeness, 2),
             round(scores.short_segments, 2),
         ]
+        if corpus_repeated is not None:
+            final_score.append(round(corpus_repeated, 2))
 
         if self.config.text_in_output:
             final_score.append(document_text.replace("\n", "\\n"))
@@ -184,14 +612,911 @@ class DocumentScorer:
         ref_lang = f"{ref_lang.lower()}_{ref_script.lower()}"
         lang_segments = [lang.lower() for lang in lang_segments]
         ref_script = ref_script.lower()
-        features = self._extract_features(document_text)
-        scores = self._compute_scores(
-            ref_lang = ref_lang,
-            lang_segments = lang_segments,
-            document_text = document_text,
-            ref_script = ref_script,
-            doc_id = doc_id,
-            features = features,
-        )
-        overall_score = self._aggregate_scores(scores)
-        return self._format_output(overall_score, scores, document_text, raw_score)
\ No newline at end of file
+        cache_key = None
+        cached = {}
+        if self.score_cache is not None:
+            cache_key = self.score_cache.key(
+                ref_lang, ref_script, lang_segments, document_text
+            )
+            cached = self.score_cache.get_many([cache_key])
+        if cache_key in cached:
+            scores = ScoreResult.from_values(cached[cache_key])
+        else:
+            features = self._extract_features(document_text)
+            scores = self._compute_scores(
+                profile=self.config.get_profile(ref_lang),
+                lang_segments=lang_segments,
+                document_text=document_text,
+                ref_script=ref_script,
+                doc_id=doc_id,
+                features=features,
+            )
+            if cache_key is not None:
+                self.score_cache.put_many([(cache_key, scores.values())])
+        overall_score = self._overall_score(scores)
+        corpus_repeated = None
+        if self.corpus_repeated_scorer is not None:
+            corpus_repeated = self.corpus_repeated_scorer.score(
+                *self.config.char_classifier.hash_segments(document_text)
+            )
+        return self._format_output(
+            overall_score, scores, document_text, raw_score, corpus_repeated
+        )
+
+    def stream_document(
+        self, ref_lang: str, ref_script: str, doc_id: str = ""
+    ) -> "StreamingDocumentScorer":
+        """Score a document given segment by segment (see StreamingDocumentScorer):
+
+        stream = scorer.stream_document("spa", "Latn", doc_id)
+        for segment, lang in segments:
+            stream.add_segment(segment, lang)
+        scores = stream.finish()
+        """
+        from docscorer.streaming import StreamingDocumentScorer
+
+        return StreamingDocumentScorer(self, ref_lang, ref_script, doc_id)
+
+    def _prepare_batch(
+        self, documents: Sequence[Document]
+    ) -> Tuple[List[LanguageProfile], List[str], List[str], FeatureBatch]:
+        """Language profiles, scripts, texts and segment features of a batch of
+        documents."""
+        ref_langs = [f"{doc[0].lower()}_{doc[1].lower()}" for doc in documents]
+        ref_scripts = [doc[1].lower() for doc in documents]
+        lang_segments = [[lang.lower() for lang in doc[2]] for doc in documents]
+        texts = [doc[3] for doc in documents]
+
+        features = FeatureBatch.from_documents(
+            self.char_counter, ref_langs, lang_segments, texts
+        )
+        profiles = [self.config.get_profile(ref_lang) for ref_lang in ref_langs]
+        return profiles, ref_scripts, texts, features
+
+    def _sample_segments(self, document: Document) -> Document:
+        """The document with only APPROXIMATE_SEGMENTS of its segments, evenly spread,
+        if it has more."""
+        ref_lang, ref_script, lang_segments, text, doc_id = document
+        segments = text.split("\n")
+        n_segments = len(segments)
+        if n_segments <= self.APPROXIMATE_SEGMENTS:
+            return document
+        kept = [
+            i * (n_segments - 1) // (self.APPROXIMATE_SEGMENTS - 1)
+            for i in range(self.APPROXIMATE_SEGMENTS)
+        ]
+        if len(lang_segments) == n_segments:
+            lang_segments = [lang_segments[i] for i in kept]
+        else:
+            lang_segments = []  # still not matching the segments (see FeatureBatch)
+        return (
+            ref_lang,
+            ref_script,
+            lang_segments,
+            "\n".join(segments[i] for i in kept),
+            doc_id,
+        )
+
+    def _approximate_batch_scores(self, documents: Sequence[Document]) -> np.ndarray:
+        """Cheap approximation of the overall scores of a non empty batch of documents,
+        for tiered scoring: the subscores of at most APPROXIMATE_SEGMENTS segments of
+        every document, without informativeness (the zstd compression of the text),
+        which is left out of the overall score."""
+        profiles, ref_scripts, texts, features = self._prepare_batch(
+            [self._sample_segments(document) for document in documents]
+        )
+        totals = self._batch_totals(features)
+        subscores = {
+            name: self._batch_subscore(
+                name, profiles, ref_scripts, texts, features, totals
+            )
+            for name in BatchScoreResult.__dataclass_fields__
+            if name != "informativeness"
+        }
+        scores = BatchScoreResult(
+            informativeness=np.full(len(documents), np.nan), **subscores
+        )
+        penalties = [
+            name for name in self.PENALTY_SUBSCORES if name != "informativeness"
+        ]
+        return self._aggregate_batch_scores(scores, penalties=penalties)
+
+    def _score_batch_arrays(
+        self, documents: Sequence[Document]
+    ) -> Tuple[np.ndarray, BatchScoreResult]:
+        """Overall scores and subscores of a non empty batch of documents, as arrays
+        (see score_batch())."""
+        # Identical documents (with different ids) are only scored once
+        distinct_documents, indices = self._collapse_duplicates(documents)
+        if self.score_cache is not None:
+            scores = self._cached_batch_scores(distinct_documents)
+        else:
+            scores = self._compute_batch_scores(
+                *self._prepare_batch(distinct_documents)
+            )
+        overall_scores = self._aggregate_batch_scores(scores)
+        if self.config.early_exit:
+            overall_scores[np.isnan(scores.informativeness)] = 0.0  # stopped early
+        n_duplicates = len(documents) - len(distinct_documents)
+        if n_duplicates:
+            self._duplicates += n_duplicates
+            return overall_scores[indices], scores.take(indices)
+        return overall_scores, scores
+
+    @staticmethod
+    def _collapse_duplicates(
+        documents: Sequence[Document],
+    ) -> Tuple[List[Document], np.ndarray]:
+        """The distinct documents of a batch (by ref_lang, ref_script, lang_segments and
+        text, whatever their id), in order of first appearance, and the index of every
+        document of the batch among them.
+        """
+        first_documents: Dict[Tuple[str, str, Tuple[str, ...], str], int] = {}
+        distinct_documents = []
+        indices = np.empty(len(documents), dtype=np.int64)
+        for i, document in enumerate(documents):
+            key = (document[0], document[1], tuple(document[2]), document[3])
+            index = first_documents.setdefault(key, len(distinct_documents))
+            if index == len(distinct_documents):
+                distinct_documents.append(document)
+            indices[i] = index
+        return distinct_documents, indices
+
+    def _cached_batch_scores(self, documents: Sequence[Document]) -> BatchScoreResult:
+        """Subscores of a batch of documents, only computed for the documents missing in
+        the score cache."""
+        cache = self.score_cache
+        keys = [
+            cache.key(
+                f"{doc[0].lower()}_{doc[1].lower()}",
+                doc[1].lower(),
+                [lang.lower() for lang in doc[2]],
+                doc[3],
+            )
+            for doc in documents
+        ]
+        found = cache.get_many(keys)
+        values = np.empty((len(documents), RESULT_VALUES))
+        missing = []
+        for i, key in enumerate(keys):
+            if key in found:
+                values[i] = found[key]
+            else:
+                missing.append(i)
+        if missing:
+            scores = self._compute_batch_scores(
+                *self._prepare_batch([documents[i] for i in missing])
+            )
+            values[missing] = scores.values()
+            cache.put_many((keys[i], values[i].tolist()) for i in missing)
+        return BatchScoreResult.from_values(values)
+
+    def score_batch(
+        self, documents: Sequence[Document], raw_score: bool = False
+    ) -> List[float | List[float | str]]:
+        """Score a batch of documents, given as (ref_lang, ref_script, lang_segments,
+        document_text, doc_id) tuples, and return the score_document() output of each
+        one, in the same order. The per segment features of the whole batch are
+        extracted at once and the scorers are evaluated as array operations over all the
+        documents."""
+        if not documents:
+            return []
+        overall_scores, scores = self._score_batch_arrays(documents)
+        corpus_repeated = self._corpus_repeated_scores(documents)
+        return [
+            self._format_output(
+                overall_score, result, document[3], raw_score, corpus_repeated_score
+            )
+            for overall_score, result, document, corpus_repeated_score in zip(
+                overall_scores.tolist(),
+                scores.results(),
+                documents,
+                corpus_repeated,
+                strict=True,
+            )
+        ]
+
+    def _segment_hashes(
+        self, texts: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Hashes and lengths of the segments of some texts (see
+        CharClassifier.hash_segments()), and the offsets of the segments of every
+        text."""
+        hashes, lengths = self.config.char_classifier.hash_segments("\n".join(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([text.count("\n") + 1 for text in texts], out=offsets[1:])
+        return hashes, lengths, offsets
+
+    def _corpus_repeated_scores(
+        self, documents: Sequence[Document]
+    ) -> List[Optional[float]]:
+        """corpus_repeated_score of every document, or None without a sketch."""
+        if self.corpus_repeated_scorer is None:
+            return [None] * len(documents)
+        hashes, lengths, offsets = self._segment_hashes(
+            [document[3] for document in documents]
+        )
+        return self.corpus_repeated_scorer.score_batch(
+            hashes, lengths, offsets
+        ).tolist()
+
+    @property
+    def output_columns(self) -> List[str]:
+        """OUTPUT_COLUMNS, and corpus_repeated_score with a sketch (see
+        CorpusRepeatedScorer)."""
+        if self.corpus_repeated_scorer is None:
+            return self.OUTPUT_COLUMNS
+        return [*self.OUTPUT_COLUMNS, "corpus_repeated_score"]
+
+    def _output_header(self) -> List[str]:
+        """Column names of the CSV files written by score_file()."""
+        if self.config.only_final_score:
+            header = self.OUTPUT_COLUMNS[:2]
+        else:
+            header = list(self.output_columns)
+        if self.config.text_in_output:
+            header.append("text")
+        return header
+
+    @staticmethod
+    def _parse_record(record: Dict[str, Any]) -> Tuple[str, str, List[str], str, str]:
+        """Extract (ref_lang, ref_script, lang_segments, text, doc_id) from a jsonl
+        record. `lang` can be a "xxx_Scrp" string or a list whose first item is the
+        document language.
+        """
+        lang = record["lang"]
+        if isinstance(lang, list) and lang:
+            lang = lang[0]
+        if not isinstance(lang, str):
+            raise TypeError("'lang' must be a string or a non empty list of strings")
+        ref_lang, ref_script = lang.split("_", 1)
+        # Checked as msgspec does (see decoders), so malformed records are skipped with
+        # every decoder
+        if (
+            not isinstance(record["text"], str)
+            or not isinstance(record["seg_langs"], list)
+            or not all(isinstance(seg_lang, str) for seg_lang in record["seg_langs"])
+        ):
+            raise TypeError("'text' must be a string and 'seg_langs' a list of strings")
+        return (
+            ref_lang,
+            ref_script,
+            record["seg_langs"],
+            record["text"],
+            "" if record["id"] is None else str(record["id"]),
+        )
+
+    def _output_row(
+        self, doc_id: str, scores: float | List[float | str], document_text: str
+    ) -> List[Any]:
+        """Output row (see _output_header) of a score_document() result."""
+        if self.config.only_final_score:
+            row = [doc_id, scores]
+            if self.config.text_in_output:
+                row.append(document_text.replace("\n", "\\n"))
+            return row
+        return [doc_id, *scores]
+
+    def _parse_lines(
+        self, lines: List[str], source: str = "", first_line: int = 1
+    ) -> Tuple[List[Document], List[str], List[int]]:
+        """Decode a chunk of jsonl lines into documents, skipping malformed records.
+        Returns the documents, the lines they come from and their line numbers."""
+        documents = []
+        records = []
+        line_numbers = []
+        for line_number, line in enumerate(lines, start=first_line):
+            if not line.strip():
+                continue
+            try:
+                documents.append(self._parse_record(self.decode_record(line)))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logging.warning(
+                    f"{source}:{line_number} skipped, malformed record: {e!r}"
+                )
+                continue
+            records.append(line)
+            line_numbers.append(line_number)
+        return documents, records, line_numbers
+
+    def _skip_failures(
+        self,
+        score: Callable[[List[Document]], T],
+        documents: List[Document],
+        records: List[str],
+        line_numbers: List[int],
+        source: str = "",
+    ) -> Tuple[T, List[Document], List[str]]:
+        """`score(documents)` of a batch of parsed documents (see _parse_lines()). If
+        it fails, the documents that cannot be scored on their own are skipped with a
+        warning, like malformed records, and the rest are scored again. Returns the
+        result and the documents and records it is for."""
+        try:
+            return score(documents), documents, records
+        except Exception:
+            kept = []
+            for i, document in enumerate(documents):
+                try:
+                    score([document])
+                except Exception as e:
+                    logging.warning(
+                        f"{source}:{line_numbers[i]} skipped, the document could not "
+                        f"be scored: {e!r}"
+                    )
+                else:
+                    kept.append(i)
+            if len(kept) == len(documents):
+                raise  # not caused by a document, but by the batch
+            documents = [documents[i] for i in kept]
+            records = [records[i] for i in kept]
+            return score(documents), documents, records
+
+    def _score_lines(
+        self, lines: List[str], source: str = "", first_line: int = 1
+    ) -> List[List[Any]]:
+        """Score a chunk of jsonl lines as a batch and return their output rows,
+        skipping malformed records and documents that cannot be scored."""
+        outputs, documents, _ = self._skip_failures(
+            lambda documents: self.score_batch(
+                documents, raw_score=self.config.only_final_score
+            ),
+            *self._parse_lines(lines, source, first_line),
+            source,
+        )
+        return [
+            self._output_row(document[4], scores, document[3])
+            for document, scores in zip(documents, outputs, strict=True)
+        ]
+
+    def _score_chunk(
+        self, lines: List[str], source: str = "", first_line: int = 1
+    ) -> Tuple[int, List[List[Any]]]:
+        """The number of lines of a chunk and their _score_lines() rows, so the
+        checkpoints of score_file() count the lines actually read."""
+        return len(lines), self._score_lines(lines, source, first_line)
+
+    def _score_columns(
+        self, lines: List[str], source: str = "", first_line: int = 1
+    ) -> Dict[str, Any]:
+        """Score a chunk of jsonl lines as a batch and return their output columns (see
+        ColumnarWriter): the _output_header() columns as arrays (scores) or lists, plus
+        the document lang and script. The scores are rounded as in the CSV files, the
+        text is not escaped."""
+        arrays, documents, _ = self._skip_failures(
+            lambda documents: (
+                self._score_batch_arrays(documents) if documents else None
+            ),
+            *self._parse_lines(lines, source, first_line),
+            source,
+        )
+        columns: Dict[str, Any] = {
+            "doc_id": [document[4] for document in documents],
+            "lang": [document[0] for document in documents],
+            "script": [document[1] for document in documents],
+        }
+        if arrays is None:
+            return columns
+        overall_scores, scores = arrays
+        if self.config.only_final_score:
+            columns["wds_score"] = overall_scores
+        else:
+            subscores = [
+                overall_scores,
+                scores.language,
+                scores.url,
+                scores.punctuation,
+                scores.singular_chars,
+                scores.numbers,
+                scores.repeated,
+                scores.long_segments[0],
+                scores.long_segments[1],
+                scores.informativeness,
+                scores.short_segments,
+            ]
+            if self.corpus_repeated_scorer is not None:
+                subscores.append(np.array(self._corpus_repeated_scores(documents)))
+            for name, values in zip(self.output_columns[1:], subscores, strict=True):
+                columns[name] = round_values(np.asarray(values, dtype=np.float64), 2)
+        if self.config.text_in_output:
+            columns["text"] = [document[3] for document in documents]
+        return columns
+
+    def _score_fields(self, scores: float | List[float | str]) -> Dict[str, Any]:
+        """wds_score and subscores of a score_batch() result, as JSON fields. Subscores
+        that were not computed (NaN, see early_exit) are null."""
+        if self.config.only_final_score:
+            return {"wds_score": scores}
+        return {
+            name: None if isinstance(value, float) and math.isnan(value) else value
+            for name, value in zip(self.output_columns[1:], scores, strict=True)
+        }
+
+    def _filter_lines(
+        self,
+        lines: List[str],
+        source: str = "",
+        first_line: int = 1,
+        min_score: float = 0.0,
+        band: Optional[float] = None,
+    ) -> Tuple[List[str], int, int]:
+        """Score a chunk of jsonl lines as a batch. Returns the records with a wds_score
+        of at least `min_score`, with their scores added as fields, the number of scored
+        documents and the number of them fully scored. With a `band`, scoring is tiered:
+        only the documents whose approximate score (see _approximate_batch_scores()) is
+        within `band` of `min_score` are fully scored, the rest are kept or discarded by
+        their approximate score. "wds_tier" tells which one was used.
+        """
+
+        def score(
+            documents: List[Document],
+        ) -> Tuple[Optional[np.ndarray], List[int], List[float | List[float | str]]]:
+            if band is None or not documents:
+                approximate_scores = None
+                full = list(range(len(documents)))
+            else:
+                approximate_scores = self._approximate_batch_scores(documents)
+                full = np.flatnonzero(
+                    np.abs(approximate_scores - min_score) <= band
+                ).tolist()
+            outputs = self.score_batch(
+                [documents[i] for i in full], raw_score=self.config.only_final_score
+            )
+            return approximate_scores, full, outputs
+
+        (approximate_scores, full, outputs), documents, records = self._skip_failures(
+            score, *self._parse_lines(lines, source, first_line), source
+        )
+        full_outputs = dict(zip(full, outputs, strict=True))
+        passing = []
+        for i, record in enumerate(records):
+            if i in full_outputs:
+                fields = self._score_fields(full_outputs[i])
+                if fields["wds_score"] < min_score:
+                    continue
+            else:
+                assert approximate_scores is not None
+                score = float(approximate_scores[i])
+                if score < min_score:
+                    continue
+                fields = {
+                    "wds_score": (
+                        score if self.config.only_final_score else round(score, 2)
+                    )
+                }
+            if approximate_scores is not None:
+                fields["wds_tier"] = "full" if i in full_outputs else "approximate"
+            # The fields are appended to the original line, the record is not encoded
+            # again
+            passing.append(f"{record.rstrip()[:-1]}, {json.dumps(fields)[1:]}\n")
+        return passing, len(documents), len(full)
+
+    def _read_chunks(
+        self, lines: Iterable[str], source: str, first_line: int = 1
+    ) -> Iterator[Tuple[List[str], str, int]]:
+        """Group lines into chunks of CHUNK_SIZE, yielded as _score_lines()
+        arguments."""
+        chunk: List[str] = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == self.CHUNK_SIZE:
+                yield chunk, source, first_line
+                first_line += len(chunk)
+                chunk = []
+        if chunk:
+            yield chunk, source, first_line
+
+    def _index_chunks(
+        self,
+        index: LineIndex,
+        task: str,
+        source: str,
+        first: int,
+        start: int,
+        last: int,
+    ) -> Iterator[Tuple[str, str, int, int, str, int]]:
+        """_score_range() arguments for the lines [start, last) of an indexed file, in
+        chunks of CHUNK_SIZE. Line numbers (in the warnings) count from line `first`."""
+        for line in range(start, last, self.CHUNK_SIZE):
+            end = min(line + self.CHUNK_SIZE, last)
+            yield (
+                task,
+                str(index.path),
+                *index.byte_range(line, end),
+                source,
+                line - first + 1,
+            )
+
+    def _score_range(
+        self, task: str, path: str, start: int, end: int, source: str, first_line: int
+    ) -> Any:
+        """Run `task` (_score_chunk(), _score_columns() or _sketch_lines()) on the lines
+        of the bytes [start, end) of a plain file."""
+        return getattr(self, task)(read_lines(path, start, end), source, first_line)
+
+    def score_file(
+        self,
+        input_file: Path,
+        output_file: Path,
+        pool: Optional["ScoringPool"] = None,
+        manifest: Optional[RunManifest] = None,
+        byte_range: Optional[Tuple[int, int]] = None,
+    ) -> int:
+        """Score a .jsonl file chunk by chunk and write one row per document, in input
+        order. Reading (and decompression), scoring and writing (and compression) run as
+        a pipeline: a reader thread, this thread (or the worker processes of `pool`, if
+        given) and a writer thread, with at most PIPELINE_DEPTH chunks waiting between
+        them. Returns the number of scored documents. .jsonl.zst, .jsonl.gz and
+        .jsonl.xz inputs are decompressed, and .csv.zst outputs compressed, as streams.
+        .parquet and .arrow outputs are written as columns (see ColumnarWriter). With a
+        `manifest`, the progress is committed to it every CHECKPOINT_INTERVAL seconds
+        and the file continues from its last checkpoint, if any. With a `byte_range`,
+        only the lines of a plain file that start in it are scored (see LineRange). With
+        a `pool`, plain files are not read by this process: they are indexed (see
+        LineIndex) and the workers read their chunks from the memory-mapped file."""
+        output_format = columnar_format(output_file)
+        task = "_score_chunk" if output_format is None else "_score_columns"
+        name = unit_name(input_file, byte_range)
+        # Columnar files are only complete once closed, so they are always written from
+        # the start
+        committed = (
+            manifest.committed(name)
+            if manifest is not None and output_format is None
+            else None
+        )
+        start_line = committed["lines"] if committed else 0
+        n_lines = start_line
+
+        source = str(Path(input_file).parent / name)
+        with ExitStack() as stack:
+            if (
+                pool is not None
+                and Path(input_file).suffix not in COMPRESSION_EXTENSIONS
+            ):
+                # The workers read their chunks from the memory-mapped file, lines are
+                # not sent to them
+                index = LineIndex.load(input_file, self.config.cache_dir)
+                first, last = index.line_range(byte_range)
+                n_lines = last - first
+                results: Iterable[Any] = pool.imap(
+                    "_score_range",
+                    self._index_chunks(
+                        index, task, source, first, first + start_line, last
+                    ),
+                )
+            else:
+                fin = stack.enter_context(open_input(input_file, byte_range))
+
+                def next_lines() -> Iterator[str]:
+                    nonlocal n_lines
+                    for line in (
+                        itertools.islice(fin, start_line, None) if start_line else fin
+                    ):
+                        n_lines += 1
+                        yield line
+
+                chunks = stack.enter_context(
+                    ReaderThread(
+                        self._read_chunks(next_lines(), source, start_line + 1),
+                        self.PIPELINE_DEPTH,
+                    )
+                )
+                if pool is None:
+                    results = (getattr(self, task)(*chunk) for chunk in chunks)
+                else:
+                    results = pool.imap(task, chunks)
+            if output_format is None:
+                n_docs = self._write_rows(
+                    results, output_file, name, manifest, committed
+                )
+            else:
+                n_docs = self._write_columns(results, output_file, output_format)
+        if manifest is not None:
+            manifest.commit(
+                name, n_lines, Path(output_file).stat().st_size, n_docs, done=True
+            )
+        return n_docs
+
+    def _write_rows(
+        self,
+        results: Iterable[Tuple[int, List[List[Any]]]],
+        output_file: Path,
+        name: str,
+        manifest: Optional[RunManifest],
+        committed: Optional[Dict[str, Any]],
+    ) -> int:
+        """Write the CSV rows of score_file() (the _score_chunk() results) from a writer
+        thread, committing the checkpoints of `name` to the `manifest` once their rows
+        are on disk. Returns the number of documents.
+        """
+        if committed:
+            # Rows written after the last checkpoint are scored again
+            os.truncate(output_file, committed["output_size"])
+        n_docs = committed["documents"] if committed else 0
+        lines_done = committed["lines"] if committed else 0
+        last_checkpoint = time.monotonic()
+        with open_output(
+            output_file, self.OUTPUT_BUFFER_SIZE, append=committed is not None
+        ) as fout:
+            writer = csv.writer(fout)
+            if not committed:
+                writer.writerow(self._output_header())
+
+            def write(result: Tuple[int, List[List[Any]]]) -> None:
+                nonlocal n_docs, lines_done, last_checkpoint
+                n_lines, rows = result
+                writer.writerows(rows)
+                n_docs += len(rows)
+                lines_done += n_lines
+                if (
+                    manifest is not None
+                    and time.monotonic() - last_checkpoint >= self.CHECKPOINT_INTERVAL
+                ):
+                    manifest.commit(name, lines_done, sync_output(fout), n_docs)
+                    last_checkpoint = time.monotonic()
+
+            with WriterThread(write, self.PIPELINE_DEPTH) as background:
+                for result in results:
+                    background.put(result)
+            if manifest is not None:
+                sync_output(fout)
+        return n_docs
+
+    def _write_columns(
+        self, results: Iterable[Dict[str, Any]], output_file: Path, output_format: str
+    ) -> int:
+        """Write the output columns of score_file() from a writer thread. Returns the
+        number of documents."""
+        score_columns = [
+            column
+            for column in self._output_header()
+            if column not in ("doc_id", "text")
+        ]
+        n_docs = 0
+        with ColumnarWriter(
+            output_file, output_format, score_columns, self.config.text_in_output
+        ) as writer:
+            with WriterThread(writer.write_columns, self.PIPELINE_DEPTH) as background:
+                for columns in results:
+                    background.put(columns)
+                    n_docs += len(columns["doc_id"])
+        return n_docs
+
+    def filter_stream(
+        self,
+        fin: Iterable[str],
+        fout: TextIO,
+        min_score: float,
+        pool: Optional["ScoringPool"] = None,
+        source: str = "<stdin>",
+        band: Optional[float] = None,
+    ) -> Tuple[int, int]:
+        """Score a stream of jsonl records and write to `fout`, in input order, the ones
+        with a wds_score of at least `min_score`, with "wds_score" and the subscores
+        (see OUTPUT_COLUMNS) added as fields. Records are scored in chunks of CHUNK_SIZE
+        and `fout` is flushed after every chunk. With a `band`, only the records whose
+        approximate score is within `band` of `min_score` are fully scored (see
+        _filter_lines()). Returns the number of scored and of written records."""
+        run_stats = self._run_stats()
+        tasks = ((*chunk, min_score, band) for chunk in self._read_chunks(fin, source))
+        if pool is None:
+            results: Iterable[Tuple[List[str], int, int]] = (
+                self._filter_lines(*task) for task in tasks
+            )
+        else:
+            results = pool.imap("_filter_lines", tasks)
+        n_scored = 0
+        n_passed = 0
+        n_full = 0
+        for records, n_documents, n_full_documents in results:
+            fout.writelines(records)
+            fout.flush()
+            n_scored += n_documents
+            n_passed += len(records)
+            n_full += n_full_documents
+        if band is not None:
+            logging.info(
+                f"{n_full} of {n_scored} documents fully scored, the rest by their "
+                "approximate score"
+            )
+        self._log_run_stats(run_stats)
+        return n_scored, n_passed
+
+    def _run_stats(self) -> Dict[str, Any]:
+        """Documents collapsed as duplicates of another one of their batch, and the
+        stats of the enabled caches: "score" (ScoreCache) and "segment"
+        (SegmentFeatureCache)."""
+        stats: Dict[str, Any] = {"duplicates": self._duplicates}
+        if self.score_cache is not None:
+            stats["score"] = self.score_cache.stats()
+        if isinstance(self.char_counter, SegmentFeatureCache):
+            stats["segment"] = self.char_counter.stats()
+        return stats
+
+    def _take_worker_counts(self) -> Dict[str, Any]:
+        """The counts of _run_stats() of this process since the last call, which are
+        reset. The workers of a ScoringPool send them with every result, for the parent
+        to add them up (see _add_worker_counts()).
+        """
+        counts: Dict[str, Any] = {"duplicates": self._duplicates}
+        self._duplicates = 0
+        if isinstance(self.char_counter, SegmentFeatureCache):
+            counts["segment"] = self.char_counter.take_counts()
+        if self.score_cache is not None:
+            counts["score"] = self.score_cache.take_counts()
+        return counts
+
+    def _add_worker_counts(self, counts: Dict[str, Any]) -> None:
+        self._duplicates += counts["duplicates"]
+        if isinstance(self.char_counter, SegmentFeatureCache):
+            self.char_counter.add_counts(counts["segment"])
+        if self.score_cache is not None:
+            self.score_cache.add_counts(counts["score"])
+
+    def _log_run_stats(self, before: Dict[str, Any]) -> None:
+        """Log the duplicates and cache lookups since the `before` _run_stats() (of all
+        the processes)."""
+        stats = self._run_stats()
+        logging.info(
+            f"{stats['duplicates'] - before['duplicates']} duplicate documents scored "
+            "once in their batch"
+        )
+        for name, unit in (("score", "documents"), ("segment", "segments")):
+            if name in stats:
+                hits = stats[name]["hits"] - before[name]["hits"]
+                lookups = hits + stats[name]["misses"] - before[name]["misses"]
+                hit_rate = hits / max(lookups, 1)
+                logging.info(
+                    f"{name.capitalize()} cache: {hits} hits of {lookups} {unit} "
+                    f"({hit_rate:.1%})"
+                )
+        if "score" in stats:
+            evictions = stats["score"]["evictions"] - before["score"]["evictions"]
+            logging.info(
+                f"Score cache: {evictions} evicted, {stats['score']['entries']} "
+                f"entries, {stats['score']['size'] / (1 << 20):.1f} MB"
+            )
+
+    def score_directory(
+        self,
+        input_path: Path,
+        output_path: Path,
+        workers: int = 1,
+        compress_output: bool = False,
+        output_format: str = "csv",
+        resume: bool = False,
+        shard: Tuple[int, int] = (0, 1),
+        split_size: int = SPLIT_SIZE,
+    ) -> None:
+        """Score every .jsonl (or .jsonl.zst/.gz/.xz) file in `input_path` (or
+        `input_path` itself if it is a file), writing one `<name>.csv` (`<name>.csv.zst`
+        if `compress_output`) per input file into `output_path`, or `<name>.parquet` /
+        `<name>.arrow` with the "parquet" and "arrow" `output_format`. With `workers` >
+        1, documents are scored by a pool of forked processes that share this scorer.
+        The progress is saved to a RunManifest in `output_path`. With `resume`, a run
+        interrupted with the same settings continues from it: finished files are skipped
+        and the others continue from their last checkpoint. With a `shard` (index,
+        count), only the work units of that shard are scored (see shard_units()): whole
+        files, and byte ranges of the plain files larger than `split_size`, written to
+        `<name>.part-<n>.csv` files. merge_shards() checks and merges the outputs of all
+        the shards.
+        """
+        input_path = Path(input_path)
+        output_path = Path(output_path)
+        input_files = list_inputs(input_path)
+        if not input_files:
+            logging.warning(f"No .jsonl files found in {input_path}")
+            return
+        if output_format == "csv":
+            extension = ".csv" + ZSTD_EXTENSION if compress_output else ".csv"
+        elif output_format in COLUMNAR_FORMATS:
+            extension = COLUMNAR_FORMATS[output_format]
+        else:
+            raise ValueError(
+                f"Unknown output format '{output_format}', choose one of: csv, "
+                f"{', '.join(COLUMNAR_FORMATS)}"
+            )
+        settings = {
+            "extension": extension,
+            "only_final_score": self.config.only_final_score,
+            "text_in_output": self.config.text_in_output,
+            "early_exit": self.config.early_exit,
+            "sketch": self.config.sketch
+            and [str(self.config.sketch), self.config.min_repeated_documents],
+            "configuration": self.config.snapshot_key,
+            "shard": list(shard),
+            "split_size": split_size if shard[1] > 1 else None,
+        }
+        if resume:
+            manifest = RunManifest.load(output_path, settings, shard)
+        else:
+            manifest = RunManifest.create(output_path, settings, shard)
+        units = shard_units(input_files, shard, split_size)
+
+        run_stats = self._run_stats()
+        if workers > 1:
+            from docscorer.parallel import (
+                ScoringPool,
+            )  # multiprocessing only when needed
+        with ScoringPool(self, workers) if workers > 1 else nullcontext() as pool:
+            for unit in units:
+                if manifest.is_done(unit.name):
+                    logging.info(f"{unit.name}: already scored, skipped")
+                    continue
+                output_file = output_path / unit.output_name(extension)
+                logging.info(f"Scoring {unit.input_file} -> {output_file}")
+                n_docs = self.score_file(
+                    unit.input_file, output_file, pool, manifest, unit.byte_range
+                )
+                logging.info(f"{unit.name}: {n_docs} documents scored")
+        self._log_run_stats(run_stats)
+
+    def _sketch_lines(
+        self, lines: List[str], source: str = "", first_line: int = 1
+    ) -> np.ndarray:
+        """The segment hashes to add to the sketch of a chunk of jsonl lines (see
+        document_hashes())."""
+        documents = self._parse_lines(lines, source, first_line)[0]
+        hashes, lengths, offsets = self._segment_hashes(
+            [document[3] for document in documents]
+        )
+        return document_hashes(
+            hashes, lengths, offsets, CorpusRepeatedScorer.MIN_SEGMENT_LENGTH
+        )
+
+    def sketch_directory(
+        self,
+        input_path: Path,
+        output_file: Path,
+        workers: int = 1,
+        shard: Tuple[int, int] = (0, 1),
+        split_size: int = SPLIT_SIZE,
+        size: int = DEFAULT_SIZE,
+    ) -> CountMinSketch:
+        """Count in how many documents of the input files (as in score_directory())
+        every segment occurs, in a CountMinSketch of `size` bytes saved to
+        `output_file`, for the corpus_repeated_score. With a `shard`, only its work
+        units are counted: the sketches of all the shards are merged with
+        CountMinSketch.merge()."""
+        input_files = list_inputs(Path(input_path))
+        if not input_files:
+            logging.warning(f"No .jsonl files found in {input_path}")
+        sketch = CountMinSketch.with_size(size)
+        if workers > 1:
+            from docscorer.parallel import (
+                ScoringPool,
+            )  # multiprocessing only when needed
+        with ScoringPool(self, workers) if workers > 1 else nullcontext() as pool:
+            for unit in shard_units(input_files, shard, split_size):
+                source = str(unit.input_file.parent / unit.name)
+                with ExitStack() as stack:
+                    if (
+                        pool is not None
+                        and unit.input_file.suffix not in COMPRESSION_EXTENSIONS
+                    ):
+                        # As in score_file(), the workers read their chunks from the
+                        # memory-mapped file
+                        index = LineIndex.load(unit.input_file, self.config.cache_dir)
+                        first, last = index.line_range(unit.byte_range)
+                        results: Iterable[np.ndarray] = pool.imap(
+                            "_score_range",
+                            self._index_chunks(
+                                index, "_sketch_lines", source, first, first, last
+                            ),
+                        )
+                    else:
+                        fin = stack.enter_context(
+                            open_input(unit.input_file, unit.byte_range)
+                        )
+                        chunks = self._read_chunks(fin, source)
+                        if pool is None:
+                            results = (self._sketch_lines(*chunk) for chunk in chunks)
+                        else:
+                            results = pool.imap("_sketch_lines", chunks)
+                    for hashes in results:
+                        sketch.add(hashes)
+                logging.info(f"{unit.name}: sketched")
+        sketch.save(output_file)
+        logging.info(
+            f"Sketch of {sketch.total} document segments saved to {output_file}"
+        )
+        return sketch
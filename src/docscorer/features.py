@@ -0,0 +1,389 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from docscorer.utils import parse_utf_block
+
+
+class CharClassifier:
+    """Classifies every character of a document in a single pass.
+    Built from the same char patterns as `join_utf_blocks`: each code point gets a bit
+    mask telling which of the PUNCTUATION_CHARS, SINGULAR_CHARS, NUMBERS and SPACES
+    blocks it belongs to (blocks may overlap), and word chars are those that belong to
+    none of them.
+    """
+
+    PUNCTUATION = 1
+    SINGULAR = 2
+    NUMBERS = 4
+    SPACES = 8
+    CATEGORIES = {
+        "PUNCTUATION_CHARS": PUNCTUATION,
+        "SINGULAR_CHARS": SINGULAR,
+        "NUMBERS": NUMBERS,
+        "SPACES": SPACES,
+    }
+    NEWLINE = ord("\n")
+    MAX_CODE_POINT = 0x10FFFF
+
+    def __init__(self, char_patterns: Dict[str, List[str]]):
+        self.lookup = np.zeros(self.MAX_CODE_POINT + 1, dtype=np.uint8)
+        for category, bit in self.CATEGORIES.items():
+            for block in char_patterns[category]:
+                start, end = parse_utf_block(block)
+                self.lookup[start : end + 1] |= bit
+
+        # Maps each of the 16 possible masks to its contribution to
+        # (word_chars, punctuation_chars, singular_chars, numbers)
+        masks = np.arange(16)
+        self.mask_counts = np.stack(
+            [
+                masks == 0,
+                (masks & self.PUNCTUATION) != 0,
+                (masks & self.SINGULAR) != 0,
+                (masks & self.NUMBERS) != 0,
+            ],
+            axis=1,
+        ).astype(np.int64)
+
+    def code_points(self, text: str) -> np.ndarray:
+        # surrogatepass: json allows lone surrogates in strings
+        return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+    def count(self, text: str) -> np.ndarray:
+        """Return a (n_segments, 4) array with the word, punctuation, singular and
+        number chars of every `\\n` separated segment of `text`."""
+        return self._count_codes(self.code_points(text))
+
+    def _count_codes(self, codes: np.ndarray) -> np.ndarray:
+        segment_ids = np.cumsum(codes == self.NEWLINE)
+        n_segments = int(segment_ids[-1]) + 1 if len(codes) else 1
+        mask_counts = np.bincount(
+            segment_ids * 16 + self.lookup[codes], minlength=n_segments * 16
+        ).reshape(n_segments, 16)
+        return mask_counts @ self.mask_counts
+
+    def hash_segments(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the 64-bit hashes and the lengths (in chars) of every `\\n` separated
+        segment of `text`. Unlike hash(), they are the same in every process and run
+        (see CountMinSketch). The text is encoded a block at a time, so huge documents
+        are never held as code points.
+        """
+        if len(text) <= HASH_BLOCK:
+            return segment_hashes(self.code_points(text), self.NEWLINE)
+        blocks = (
+            self.code_points(text[start : start + HASH_BLOCK])
+            for start in range(0, len(text), HASH_BLOCK)
+        )
+        return _finish_hashes(*_block_segment_hashes(blocks, self.NEWLINE))
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """count() and hash_segments() of `text`, in a single walk over its code
+        points."""
+        codes = self.code_points(text)
+        return (self._count_codes(codes), *segment_hashes(codes, self.NEWLINE))
+
+
+# Segments are hashed as polynomials of their code points modulo 2^64 (HASH_BASE is odd,
+# so invertible), plus their length times HASH_LENGTH_FACTOR, and mixed by the
+# splitmix64 finalizer. The code points are hashed in blocks of HASH_BLOCK, so memory
+# does not grow with the size of the documents, the segments of a block all at once
+HASH_BASE = 0x100000001B3
+# To be increased with any change of the hashes, saved with the sketches (see
+# CountMinSketch)
+HASH_VERSION = 2
+HASH_LENGTH_FACTOR = np.uint64(0x9E3779B97F4A7C15)
+HASH_BLOCK = 1 << 16
+_HASH_POWERS = np.ones(HASH_BLOCK + 1, dtype=np.uint64)  # HASH_BASE^i
+np.cumprod(np.full(HASH_BLOCK, HASH_BASE, dtype=np.uint64), out=_HASH_POWERS[1:])
+_HASH_INVERSE_POWERS = np.ones(HASH_BLOCK + 1, dtype=np.uint64)  # HASH_BASE^-i
+np.cumprod(
+    np.full(HASH_BLOCK, pow(HASH_BASE, -1, 1 << 64), dtype=np.uint64),
+    out=_HASH_INVERSE_POWERS[1:],
+)
+_MASK = (1 << 64) - 1
+
+
+_MIX_SHIFTS = np.uint64(30), np.uint64(27), np.uint64(31)
+_MIX_MULTIPLIERS = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, in place."""
+    values ^= values >> _MIX_SHIFTS[0]
+    values *= _MIX_MULTIPLIERS[0]
+    values ^= values >> _MIX_SHIFTS[1]
+    values *= _MIX_MULTIPLIERS[1]
+    values ^= values >> _MIX_SHIFTS[2]
+    return values
+
+
+def _piece_hashes(block: np.ndarray, separator: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes (before _mix()) and lengths of the `separator` separated pieces of a block
+    of code points."""
+    separators = np.flatnonzero(block == separator)
+    # Prefix sums of code * HASH_BASE^position: the hash of a piece is their difference
+    # at its ends, shifted to position 0
+    prefix_sums = np.zeros(len(block) + 1, dtype=np.uint64)
+    np.cumsum(block * _HASH_POWERS[: len(block)], out=prefix_sums[1:])
+    starts = np.empty(len(separators) + 1, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = separators + 1
+    ends = np.empty(len(separators) + 1, dtype=np.int64)
+    ends[:-1] = separators
+    ends[-1] = len(block)
+    return (prefix_sums[ends] - prefix_sums[starts]) * _HASH_INVERSE_POWERS[
+        starts
+    ], ends - starts
+
+
+def segment_hashes(codes: np.ndarray, separator: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes and lengths of the `separator` separated segments of the code points
+    `codes`."""
+    if len(codes) <= HASH_BLOCK:
+        return _finish_hashes(*_piece_hashes(codes, separator))
+    blocks = (
+        codes[start : start + HASH_BLOCK] for start in range(0, len(codes), HASH_BLOCK)
+    )
+    return _finish_hashes(*_block_segment_hashes(blocks, separator))
+
+
+def _finish_hashes(
+    hashes: np.ndarray, lengths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    hashes += lengths.astype(np.uint64) * HASH_LENGTH_FACTOR
+    return _mix(hashes), lengths
+
+
+def _block_segment_hashes(
+    blocks: Iterable[np.ndarray], separator: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """_piece_hashes() of consecutive blocks of code points, of at most HASH_BLOCK
+    each."""
+    hashes = []
+    lengths = []
+    # The segment still open at the end of the previous block: its hash and length
+    open_hash = 0
+    open_length = 0
+    for block in blocks:
+        piece_hashes, piece_lengths = _piece_hashes(block, separator)
+        # The first piece continues the open segment, the last one is open until a
+        # separator
+        first_hash = (
+            open_hash + pow(HASH_BASE, open_length, 1 << 64) * int(piece_hashes[0])
+        ) & _MASK
+        first_length = open_length + int(piece_lengths[0])
+        if len(piece_hashes) > 1:
+            piece_hashes[0] = first_hash
+            piece_lengths[0] = first_length
+            hashes.append(piece_hashes[:-1])
+            lengths.append(piece_lengths[:-1])
+            open_hash = int(piece_hashes[-1])
+            open_length = int(piece_lengths[-1])
+        else:
+            open_hash = first_hash
+            open_length = first_length
+    hashes.append(np.array([open_hash], dtype=np.uint64))
+    lengths.append(np.array([open_length], dtype=np.int64))
+    return np.concatenate(hashes), np.concatenate(lengths)
+
+
+class SegmentFeatureCache:
+    """Bounded LRU cache of the char counts of segments (see CharClassifier.count()),
+    shared by all the documents scored by a process: navigation menus, cookie banners
+    and footers repeat word for word across documents. Segments are found by their
+    hashes (see CharClassifier.hash_segments()), so an entry takes the same memory
+    whatever the length of its segment, and only the segments missing in the cache are
+    sliced from the text and counted.
+    The hits and misses are counted by each process, the workers of a ScoringPool send
+    theirs to the parent (see take_counts())."""
+
+    def __init__(self, classifier: CharClassifier, max_size: int):
+        self.classifier = classifier
+        self.max_size = max_size
+        # Segment hash -> word, punctuation, singular and number chars
+        self._features: OrderedDict[int, Tuple[int, int, int, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> np.ndarray:
+        """Same as CharClassifier.count()."""
+        return self.features(text)[0]
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Same as CharClassifier.features(), only counting the segments not in the
+        cache."""
+        hashes, lengths = self.classifier.hash_segments(text)
+        keys = hashes.tolist()
+        features = self._features
+        rows: List[Any] = []
+        missing = []
+        # Segments missing in the cache, by their first occurrence in `text` (a batch of
+        # documents): the repeats are only counted once, and found as hits
+        first_missing: Dict[int, int] = {}
+        repeats = []
+        for i, key in enumerate(keys):
+            row = features.get(key)
+            if row is None:
+                if first_missing.setdefault(key, i) == i:
+                    missing.append(i)
+                else:
+                    repeats.append(i)
+            else:
+                features.move_to_end(key)
+            rows.append(row)
+        if missing:
+            # Segments are separated by a single char
+            starts = (np.cumsum(lengths + 1) - lengths - 1).tolist()
+            segment_lengths = lengths.tolist()
+            counts = self.classifier.count(
+                "\n".join(
+                    [text[starts[i] : starts[i] + segment_lengths[i]] for i in missing]
+                )
+            )
+            for i, row in zip(missing, map(tuple, counts.tolist()), strict=True):
+                rows[i] = row
+                features[keys[i]] = row
+            for i in repeats:
+                rows[i] = rows[first_missing[keys[i]]]
+            while len(features) > self.max_size:
+                features.popitem(last=False)
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return np.array(rows, dtype=np.int64).reshape(len(keys), 4), hashes, lengths
+
+    def take_counts(self) -> Dict[str, int]:
+        """The hits and misses since the last call, which are reset (see
+        add_counts())."""
+        counts = {"hits": self.hits, "misses": self.misses}
+        self.hits = self.misses = 0
+        return counts
+
+    def add_counts(self, counts: Dict[str, int]) -> None:
+        self.hits += counts["hits"]
+        self.misses += counts["misses"]
+
+    def stats(self) -> Dict[str, int]:
+        """Segment lookups (of this process and the counts added to it), and segments in
+        the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._features),
+        }
+
+
+@dataclass
+class FeatureBatch:
+    """Segment features of a batch of documents as flat arrays, one item per segment.
+    The segments of document i are at [offsets[i], offsets[i + 1])."""
+
+    word_chars: np.ndarray
+    punctuation_chars: np.ndarray
+    singular_chars: np.ndarray
+    numbers: np.ndarray
+    # Segment language is the document language. Documents whose lang_segments don't
+    # match their segments are treated as fully in the document language (see
+    # LongTextScorer)
+    ref_lang_segments: np.ndarray
+    # Per document: one language per segment, and all of them are the document language
+    lang_segments_match: np.ndarray
+    all_ref_lang: np.ndarray
+    offsets: np.ndarray
+    # Hash and length of every segment (see CharClassifier.hash_segments())
+    segment_hashes: np.ndarray
+    segment_lengths: np.ndarray
+
+    @classmethod
+    def from_documents(
+        cls,
+        classifier: Union[CharClassifier, SegmentFeatureCache],
+        ref_languages: List[str],
+        lang_segments: List[List[str]],
+        texts: List[str],
+    ) -> "FeatureBatch":
+        n_segments = []
+        ref_lang_segments: List[bool] = []
+        lang_segments_match = []
+        all_ref_lang = []
+        for ref_language, langs, text in zip(
+            ref_languages, lang_segments, texts, strict=True
+        ):
+            n = text.count("\n") + 1
+            is_ref = [lang == ref_language for lang in langs]
+            match = len(langs) == n
+            n_segments.append(n)
+            ref_lang_segments.extend(is_ref if match else [True] * n)
+            lang_segments_match.append(match)
+            all_ref_lang.append(all(is_ref))
+
+        # Joined with the segment separator, the segments of the batch are counted and
+        # hashed in one pass
+        counts, hashes, lengths = classifier.features("\n".join(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(n_segments, out=offsets[1:])
+        return cls(
+            word_chars=counts[:, 0],
+            punctuation_chars=counts[:, 1],
+            singular_chars=counts[:, 2],
+            numbers=counts[:, 3],
+            ref_lang_segments=np.array(ref_lang_segments, dtype=bool),
+            lang_segments_match=np.array(lang_segments_match, dtype=bool),
+            all_ref_lang=np.array(all_ref_lang, dtype=bool),
+            offsets=offsets,
+            segment_hashes=hashes,
+            segment_lengths=lengths,
+        )
+
+    def select(self, documents: np.ndarray) -> "FeatureBatch":
+        """Features of some of the documents of the batch, given as increasing
+        indices."""
+        selected = np.zeros(self.n_documents, dtype=bool)
+        selected[documents] = True
+        segments = np.repeat(selected, self.n_segments)
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum(self.n_segments[documents], out=offsets[1:])
+        return FeatureBatch(
+            word_chars=self.word_chars[segments],
+            punctuation_chars=self.punctuation_chars[segments],
+            singular_chars=self.singular_chars[segments],
+            numbers=self.numbers[segments],
+            ref_lang_segments=self.ref_lang_segments[segments],
+            lang_segments_match=self.lang_segments_match[documents],
+            all_ref_lang=self.all_ref_lang[documents],
+            offsets=offsets,
+            segment_hashes=self.segment_hashes[segments],
+            segment_lengths=self.segment_lengths[segments],
+        )
+
+    @property
+    def n_documents(self) -> int:
+        return len(self.offsets) - 1
+
+    @cached_property
+    def n_segments(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @cached_property
+    def segment_document(self) -> np.ndarray:
+        """Index of the document of every segment."""
+        return np.repeat(np.arange(self.n_documents), self.n_segments)
+
+    def per_segment(self, values: np.ndarray) -> np.ndarray:
+        """Broadcast per document values to their segments."""
+        return values[self.segment_document]
+
+    def document_sum(self, values: np.ndarray) -> np.ndarray:
+        """Per document sum. Float values are added in segment order, as a Python loop
+        would."""
+        if values.dtype.kind == "f":
+            return np.bincount(
+                self.segment_document, weights=values, minlength=self.n_documents
+            )
+        return np.add.reduceat(values.astype(np.int64, copy=False), self.offsets[:-1])
+
+    def document_any(self, values: np.ndarray) -> np.ndarray:
+        return np.logical_or.reduceat(values, self.offsets[:-1])
@@ -0,0 +1,106 @@
+"""
+Converts the joblib pickled interpolation functions of the informativeness score
+into flat lookup tables (.npy) that InformativenessScorer memory-maps.
+
+Every function is evaluated at each raw weight in [0, OUTSIDERS_FIX], the only values
+the scorer queries, so the tables give exactly the same predictions as the functions.
+The pickled functions the packaged tables come from are kept in the repository, out of
+the package, in interpolation_functions/: --check rebuilds the tables and compares them
+with the ones in --output instead of writing them.
+
+Usage:
+  interpolation.py --input=<dir> --output=<dir> [--info_score_config=<path>] [--check]
+
+Options:
+  --input=<dir>                 Directory with the pickled functions
+  --output=<dir>                Directory to save the .npy tables
+  --check                       Compare the tables with those in --output, without
+                                writing them
+  --info_score_config=<path>    Informativeness config with FUNCTION_FILES and
+                                OUTSIDERS_FIX
+                                [default: configurations/informativeness_config.json]
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+TABLE_SUFFIX = ".npy"
+PICKLE_SUFFIX = ".pkl"
+
+
+def tabulate(function: Callable[[np.ndarray], Any], outsiders_fix: int) -> np.ndarray:
+    """Evaluate an interpolation function at every raw weight in [0, outsiders_fix]."""
+    return np.asarray(function(np.arange(outsiders_fix + 1)), dtype=np.float64)
+
+
+def load_table(path: Path, outsiders_fix: int) -> np.ndarray:
+    """Load the lookup table of a group: .npy tables are memory-mapped, so the processes
+    that use them share a single page-cached copy. Pickled functions (which need joblib
+    and scipy) are tabulated on load."""
+    if path.suffix == TABLE_SUFFIX:
+        table = np.load(path, mmap_mode="r")
+    else:
+        try:
+            import joblib
+        except ImportError:
+            raise ImportError(
+                f"joblib and scipy are required to load the pickled function {path}, "
+                "convert it to a lookup table with docscorer.interpolation"
+            ) from None
+        table = tabulate(joblib.load(path), outsiders_fix)
+    if table.ndim != 1 or len(table) != outsiders_fix + 1:
+        raise ValueError(
+            f"{path} must hold {outsiders_fix + 1} values (raw weights "
+            f"0-{outsiders_fix}), "
+            f"found shape {table.shape}"
+        )
+    return table
+
+
+def main() -> None:
+    import docopt
+
+    args = docopt.docopt(__doc__)
+    input_path = Path(args["--input"])
+    output_path = Path(args["--output"])
+    if not output_path.is_dir():
+        print(f"Directory {output_path} not found", file=sys.stderr)
+        sys.exit(-1)
+    config_path = Path(args["--info_score_config"])
+    if not config_path.is_absolute() and not config_path.exists():
+        config_path = Path(__file__).resolve().parent / config_path
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    function_files = {}
+    mismatches = []
+    for group, file in config["FUNCTION_FILES"].items():
+        # A config already converted names the tables: their functions have the same
+        # name
+        source = input_path / f"{Path(file).stem}{PICKLE_SUFFIX}"
+        table = load_table(source, config["OUTSIDERS_FIX"][group])
+        function_files[group] = f"{Path(file).stem}{TABLE_SUFFIX}"
+        output_file = output_path / function_files[group]
+        if args["--check"]:
+            same = output_file.exists() and np.array_equal(np.load(output_file), table)
+            if not same:
+                mismatches.append(group)
+            print(
+                f"{group}: {source} {'matches' if same else 'does not match'} "
+                f"{output_file}",
+                file=sys.stderr,
+            )
+            continue
+        np.save(output_file, table)
+        print(f"{group}: {source} -> {output_file}", file=sys.stderr)
+    if args["--check"]:
+        sys.exit(1 if mismatches else 0)
+    print(json.dumps({"FUNCTION_FILES": function_files}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from docscorer.configuration import ScorerConfiguration
+
+INDEX_SUFFIX = ".idx.npy"
+BLOCK_SIZE = 1 << 26  # bytes scanned at a time when building an index
+
+# The file last mapped by read_lines() in this process
+_mapped: Optional[Tuple[str, Any, mmap.mmap]] = None
+
+
+def build_offsets(path: Path) -> np.ndarray:
+    """Start offsets of the lines of a plain file, followed by the size of the file, so
+    line i is [offsets[i], offsets[i + 1]). Lines are split at "\\n", as LineRange
+    does."""
+    size = Path(path).stat().st_size
+    parts = [np.zeros(1, dtype=np.int64)]
+    if size:
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        ):
+            for start in range(0, size, BLOCK_SIZE):
+                block = np.frombuffer(
+                    mapped,
+                    dtype=np.uint8,
+                    count=min(BLOCK_SIZE, size - start),
+                    offset=start,
+                )
+                parts.append(
+                    np.flatnonzero(block == ord("\n")).astype(np.int64) + (start + 1)
+                )
+                del block  # the map cannot be closed while a view of it exists
+    offsets = np.concatenate(parts)
+    if offsets[-1] != size:  # last line without "\n"
+        offsets = np.append(offsets, size)
+    return offsets
+
+
+def index_path(path: Path, cache_dir: Path) -> Path:
+    """Cached index of a file, in the cache directory (not next to the file, whose
+    directory may be shared or read-only): line_indexes/<file>.<path hash>.idx.npy"""
+    path = Path(path).resolve()
+    digest = hashlib.sha256(str(path).encode("utf-8", "surrogateescape")).hexdigest()
+    return Path(cache_dir) / "line_indexes" / f"{path.name}.{digest[:16]}{INDEX_SUFFIX}"
+
+
+def read_lines(path: str, start: int, end: int) -> List[str]:
+    """Lines of the bytes [start, end) of a file, which must start and end at line
+    boundaries. The file is memory-mapped once per process, so workers read their ranges
+    directly from the page cache.
+    """
+    global _mapped
+    if _mapped is None or _mapped[0] != path:
+        if _mapped is not None:
+            _mapped[2].close()
+            _mapped[1].close()
+        f = open(path, "rb")
+        _mapped = (path, f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    lines = _mapped[2][start:end].decode("utf-8").split("\n")
+    if lines and not lines[-1]:
+        lines.pop()  # after the last "\n"
+    return lines
+
+
+class LineIndex:
+    """Line start offsets of a plain .jsonl file (see build_offsets()), to split it into
+    line ranges and to read any of its lines directly."""
+
+    def __init__(self, path: Path, offsets: np.ndarray):
+        self.path = Path(path)
+        self.offsets = offsets
+
+    @classmethod
+    def load(
+        cls, path: Path, cache_dir: Optional[Path] = None, cache: bool = True
+    ) -> "LineIndex":
+        """Index of a file, loaded from its cached .idx.npy in `cache_dir` (by default
+        that of the configuration snapshots, see ScorerConfiguration.cache_directory())
+        if it is up to date, or built (and cached, if `cache` and the directory is
+        writable)."""
+        path = Path(path)
+        if cache_dir is None:
+            cache_dir = ScorerConfiguration.cache_directory()[0]
+        cached = index_path(path, cache_dir)
+        stat = path.stat()
+        if cached.exists() and cached.stat().st_mtime_ns >= stat.st_mtime_ns:
+            offsets = np.load(cached, mmap_mode="r")
+            if len(offsets) and offsets[-1] == stat.st_size:
+                return cls(path, offsets)
+        offsets = build_offsets(path)
+        if cache:
+            try:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=cached.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, offsets)
+                os.replace(tmp_path, cached)
+            except OSError as e:
+                logging.debug(f"Line index not saved to {cached}: {e!r}")
+        return cls(path, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def line_range(
+        self, byte_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[int, int]:
+        """[first, last) lines that start in a byte range (as LineRange), all of them
+        without a range."""
+        if byte_range is None:
+            return 0, len(self)
+        starts = self.offsets[:-1]
+        first, last = np.searchsorted(starts, byte_range, side="left")
+        return int(first), int(last)
+
+    def byte_range(self, first: int, last: int) -> Tuple[int, int]:
+        """Bytes of the [first, last) lines."""
+        return int(self.offsets[first]), int(self.offsets[last])
+
+    def __getitem__(self, line: int) -> str:
+        """Line number `line` (from 0), without its "\\n"."""
+        if not 0 <= line < len(self):
+            raise IndexError(
+                f"{self.path} has {len(self)} lines, there is no line {line}"
+            )
+        return read_lines(str(self.path), *self.byte_range(line, line + 1))[0]
@@ -0,0 +1,83 @@
+import collections
+import multiprocessing
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    from docscorer.docscorer import DocumentScorer
+
+# Scorer shared with the worker processes. It is set in the parent before forking,
+# so every worker inherits the already loaded configuration and interpolation functions
+# (copy-on-write) instead of building or unpickling its own.
+_SCORER: Optional["DocumentScorer"] = None
+
+
+def _start_worker() -> None:
+    assert (
+        _SCORER is not None
+    ), "ScoringPool workers must be forked from the parent scorer"
+    # The counts copied from the parent are already counted there
+    _SCORER._take_worker_counts()
+
+
+def _call_scorer(method: str, args: tuple[Any, ...]) -> Tuple[Any, Dict[str, Any]]:
+    assert (
+        _SCORER is not None
+    ), "ScoringPool workers must be forked from the parent scorer"
+    return getattr(_SCORER, method)(*args), _SCORER._take_worker_counts()
+
+
+class ScoringPool:
+    """Pool of forked worker processes sharing the DocumentScorer of the parent process.
+    Tasks are DocumentScorer method calls, results are returned in submission order, and
+    at most `max_pending` tasks are in flight, so memory stays bounded whatever the size
+    of the input. The counts of the workers (duplicates and cache lookups) come with
+    their results and are added to the parent scorer, so its run stats cover all the
+    processes.
+    """
+
+    def __init__(
+        self, scorer: "DocumentScorer", workers: int, max_pending: Optional[int] = None
+    ):
+        global _SCORER
+        if workers < 1:
+            raise ValueError(f"The number of workers must be positive, got {workers}")
+        _SCORER = scorer
+        self.scorer = scorer
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self._pool = multiprocessing.get_context("fork").Pool(
+            workers, initializer=_start_worker
+        )
+
+    def imap(self, method: str, tasks: Iterable[tuple[Any, ...]]) -> Iterator[Any]:
+        """Call `scorer.<method>(*args)` in the workers for every args tuple in `tasks`,
+        yielding results in input order."""
+        pending: collections.deque[Any] = collections.deque()
+        for args in tasks:
+            pending.append(self._pool.apply_async(_call_scorer, (method, args)))
+            if len(pending) >= self.max_pending:
+                yield self._result(pending.popleft().get())
+        while pending:
+            yield self._result(pending.popleft().get())
+
+    def _result(self, result_counts: Tuple[Any, Dict[str, Any]]) -> Any:
+        result, counts = result_counts
+        self.scorer._add_worker_counts(counts)
+        return result
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self) -> "ScoringPool":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,110 @@
+import queue
+import threading
+from typing import Any, Callable, Generic, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class ReaderThread(Generic[T]):
+    """Iterates `items` in a background thread, at most `maxsize` items ahead of the
+    consumer. Decompression and file reads release the GIL, so they overlap with the
+    work of the consumer. Exceptions of the reader are raised by the consumer."""
+
+    def __init__(self, items: Iterable[T], maxsize: int):
+        self._items = items
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="docscorer-reader", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        try:
+            for item in self._items:
+                if not self._put(item):
+                    return
+        except BaseException as e:  # raised in the consumer
+            self._put(e)
+            return
+        self._put(_END)
+
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        """Stop reading (if the consumer stops early) and wait for the thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self) -> "ReaderThread[T]":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class WriterThread(Generic[T]):
+    """Calls `write(item)` for every item put, in order, in a background thread, with at
+    most `maxsize` items waiting. put() blocks when the queue is full (backpressure) and
+    raises the exceptions of `write`. Leaving the context waits until everything is
+    written."""
+
+    def __init__(self, write: Callable[[T], None], maxsize: int):
+        self._write = write
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(
+            target=self._run, name="docscorer-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self._error is None:
+                try:
+                    self._write(item)
+                except BaseException as e:
+                    self._error = e  # the rest of the items are dropped
+
+    def put(self, item: T) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self) -> None:
+        self._queue.put(_END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> "WriterThread[T]":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:  # finish the thread, the exception of the producer is the one raised
+            self._error = self._error or exc_info[0]
+            self._queue.put(_END)
+            self._thread.join()
@@ -0,0 +1,265 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ScoreResult fields, as stored: long_segments is two values (see ScoreResult.values())
+RESULT_VALUES = 10
+RESULT_FORMAT = struct.Struct(f"<{RESULT_VALUES}d")
+DEFAULT_MAX_SIZE = 1 << 30
+EVICT_FRACTION = (
+    0.1  # of the entries, least recently used first, when the cache is full
+)
+STATS = ("hits", "misses", "evictions", "entries")
+FLUSH_ENTRIES = 10000  # lookups kept in memory before they are written to the file
+FLUSH_INTERVAL = 5.0  # seconds
+
+
+def document_key(
+    fingerprint: bytes,
+    ref_lang: str,
+    ref_script: str,
+    lang_segments: Sequence[str],
+    text: str,
+) -> bytes:
+    """Cache key of a document: a hash of its scored content and of the configuration
+    fingerprint."""
+    digest = hashlib.blake2b(fingerprint, digest_size=16)
+    for field in (ref_lang, ref_script, "\x1f".join(lang_segments), text):
+        data = field.encode("utf-8", "surrogatepass")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class ScoreCache:
+    """Subscores (ScoreResult) of already scored documents, in a SQLite file shared by
+    runs and processes. Documents are found by document_key(), so identical documents of
+    successive crawls are only scored once, and a change of the configuration (see
+    ScorerConfiguration.score_fingerprint) makes old entries unreachable. When the file
+    takes more than `max_size` bytes, the least recently used entries are deleted.
+    Lookups only read the file: their hit and miss counts and the times the entries were
+    used are kept in memory and written in batches, with the new entries, every
+    FLUSH_ENTRIES lookups or FLUSH_INTERVAL seconds, so concurrent readers do not wait
+    for each other. The workers of a ScoringPool send them to the parent instead (see
+    take_counts())."""
+
+    def __init__(
+        self, path: Path, fingerprint: bytes, max_size: int = DEFAULT_MAX_SIZE
+    ):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._inherited: List[sqlite3.Connection] = []
+        self._lookups: Counter[str] = Counter()  # hits and misses not written yet
+        self._used: Dict[bytes, int] = {}  # key -> last use (ns), not written yet
+        self._last_flush = time.monotonic()
+        self._vacuum = False  # free pages to remove from the file (see _fit())
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # A connection per process: forked workers cannot use the one of their parent
+        if self._connection is None or self._pid != os.getpid():
+            if self._connection is not None:
+                # Never closed here: closing it could remove the WAL files the parent
+                # process still uses
+                self._inherited.append(self._connection)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            # Pages freed by evictions are given back to the file system (see _fit()).
+            # Only applies to new files, before their tables are created
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, result BLOB "
+                "NOT NULL, "
+                "last_used INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)"
+            )
+            # Counted in the file, so the lookups of all the processes (and runs) add up
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value "
+                "INTEGER NOT NULL)"
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO stats (name, value) VALUES (?, 0)",
+                [(name,) for name in STATS],
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def key(
+        self, ref_lang: str, ref_script: str, lang_segments: Sequence[str], text: str
+    ) -> bytes:
+        return document_key(self.fingerprint, ref_lang, ref_script, lang_segments, text)
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, Tuple[float, ...]]:
+        """Stored results (see put_many()) of the keys found, marked as recently
+        used."""
+        found: Dict[bytes, Tuple[float, ...]] = {}
+        unique_keys = list(set(keys))
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "BEGIN DEFERRED"
+            )  # a read transaction, never waits for the writers
+            for start in range(
+                0, len(unique_keys), 500
+            ):  # SQLite limits the parameters of a query
+                batch = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, result in connection.execute(
+                    f"SELECT key, result FROM scores WHERE key IN ({placeholders})",
+                    batch,
+                ):
+                    found[key] = RESULT_FORMAT.unpack(result)
+        hits = sum(key in found for key in keys)
+        self._lookups["hits"] += hits
+        self._lookups["misses"] += len(keys) - hits
+        now = time.time_ns()
+        for key in found:
+            self._used[key] = now
+        if (
+            len(self._used) >= FLUSH_ENTRIES
+            or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, Sequence[float]]]) -> None:
+        """Store the results of some keys (see ScoreResult.values())."""
+        rows = [(key, RESULT_FORMAT.pack(*result)) for key, result in items]
+        if rows:
+            self.flush(rows)
+
+    def flush(self, rows: Sequence[Tuple[bytes, bytes]] = ()) -> None:
+        """Write the lookups kept in memory, and the new `rows` (key, packed result), in
+        a single transaction."""
+        if not rows and not self._used and not self._lookups:
+            return
+        connection = self.connection
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "UPDATE scores SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in self._used.items()],
+            )
+            self._count(**self._lookups)
+            if rows:
+                changes = connection.total_changes
+                now = time.time_ns()
+                # Keys already stored (by another process) are left as they are
+                connection.executemany(
+                    "INSERT OR IGNORE INTO scores (key, result, last_used) VALUES (?, "
+                    "?, ?)",
+                    [(key, result, now) for key, result in rows],
+                )
+                self._count(entries=connection.total_changes - changes)
+                self._fit()
+        if self._vacuum:
+            # executescript() runs the pragma to the end, execute() would only free one
+            # page. It commits first, so it runs outside the transaction
+            connection.executescript("PRAGMA incremental_vacuum")
+            self._vacuum = False
+        self._used.clear()
+        self._lookups.clear()
+        self._last_flush = time.monotonic()
+
+    def take_counts(self) -> Dict[str, Any]:
+        """The lookups kept in memory, which are reset: the workers of a ScoringPool
+        send them with their results, for the parent to write them (see
+        add_counts())."""
+        counts = {"lookups": dict(self._lookups), "used": self._used}
+        self._lookups = Counter()
+        self._used = {}
+        return counts
+
+    def add_counts(self, counts: Dict[str, Any]) -> None:
+        self._lookups.update(counts["lookups"])
+        for key, used in counts["used"].items():
+            self._used[key] = max(used, self._used.get(key, 0))
+        if (
+            len(self._used) >= FLUSH_ENTRIES
+            or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def size(self) -> int:
+        """Bytes used in the file (free pages are reused)."""
+        connection = self.connection
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        return int((page_count - free_pages) * page_size)
+
+    def _fit(self) -> None:
+        """Evict the least recently used entries while the file takes more than
+        `max_size` bytes, down to (1 - EVICT_FRACTION) of the entries that fit, so
+        evictions do not run on every flush. Deleted entries can leave their pages
+        partly empty, so the size is measured again after every eviction. The free pages
+        are then removed from the file, after the transaction (see flush()), also those
+        freed by the updates of the last use times."""
+        size = self.size()
+        if size > self.max_size:
+            entries = self.connection.execute(
+                "SELECT value FROM stats WHERE name = 'entries'"
+            ).fetchone()[0]
+            while size > self.max_size and entries > 0:
+                kept = int(entries * self.max_size / size * (1 - EVICT_FRACTION))
+                self._evict(entries - kept)
+                entries = kept
+                size = self.size()
+        free_pages = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+        self._vacuum = free_pages > 0
+
+    def _evict(self, n_evicted: int) -> None:
+        self.connection.execute(
+            "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY "
+            "last_used LIMIT ?)",
+            (n_evicted,),
+        )
+        self._count(evictions=n_evicted, entries=-n_evicted)
+        logging.debug(
+            f"Score cache {self.path}: {n_evicted} least recently used entries evicted"
+        )
+
+    def _count(self, **counts: int) -> None:
+        self.connection.executemany(
+            "UPDATE stats SET value = value + ? WHERE name = ?",
+            [(value, name) for name, value in counts.items()],
+        )
+
+    def stats(self, flush: bool = True) -> Dict[str, Any]:
+        """Lookups (hits and misses) and evictions since the cache was created, and its
+        entries and size. Without `flush`, the lookups kept in memory are added to the
+        counts instead of being written first."""
+        if flush:
+            self.flush()
+        connection = self.connection
+        stats: Dict[str, Any] = {
+            name: value
+            for name, value in connection.execute("SELECT name, value FROM stats")
+            if name in STATS
+        }
+        if not flush:
+            for name, value in self._lookups.items():
+                stats[name] += value
+        stats["size"] = self.size()
+        return stats
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self.flush()
+            self._connection.close()
+        self._connection = None
@@ -0,0 +1,41 @@
+import numpy as np
+
+from docscorer.configuration import ScorerConfiguration
+from docscorer.sketch import CountMinSketch
+
+
+class CorpusRepeatedScorer:
+    """Repetition across the documents of a corpus, unlike RepeatedScorer: the share of
+    the segments of a document (longer than 4 chars) found in at least
+    `config.min_repeated_documents` documents, according to the CountMinSketch of the
+    corpus (see DocumentScorer.sketch_directory()).
+    """
+
+    MAX_SCORE = 1.0
+    MIN_SEGMENT_LENGTH = 5  # as RepeatedScorer
+
+    def __init__(self, config: ScorerConfiguration):
+        self.config = config
+        self.sketch = CountMinSketch.load(config.sketch)
+        self.min_documents = config.min_repeated_documents
+
+    def score(self, hashes: np.ndarray, lengths: np.ndarray) -> float:
+        """Score of a document given the hashes and lengths of its segments (see
+        CharClassifier.hash_segments())."""
+        return float(self.score_batch(hashes, lengths, np.array([0, len(hashes)]))[0])
+
+    def score_batch(
+        self, hashes: np.ndarray, lengths: np.ndarray, offsets: np.ndarray
+    ) -> np.ndarray:
+        """Scores of a batch of documents, whose segments are at [offsets[i], offsets[i
+        + 1])."""
+        documents = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        kept = lengths >= self.MIN_SEGMENT_LENGTH
+        repeated = np.zeros(len(hashes), dtype=bool)
+        repeated[kept] = self.sketch.estimate(hashes[kept]) >= self.min_documents
+        n_segments = np.bincount(documents[kept], minlength=len(offsets) - 1)
+        n_repeated = np.bincount(documents[repeated], minlength=len(offsets) - 1)
+        scores = np.full(len(offsets) - 1, self.MAX_SCORE)
+        has_segments = n_segments > 0
+        scores[has_segments] = 1 - n_repeated[has_segments] / n_segments[has_segments]
+        return scores
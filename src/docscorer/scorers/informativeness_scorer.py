@@ -1,12 +1,13 @@
 import json
 import re
 from pathlib import Path
-from typing import Any
+from typing import Any, List, Tuple
 
-import joblib
+import numpy as np
 import zstandard
 
-from docscorer.scorers.utils import scale_value
+from docscorer.interpolation import load_table
+from docscorer.scorers.utils import scale_value, scale_values
 
 
 class InformativenessScorer:
@@ -28,8 +29,11 @@ class InformativenessScorer:
         }
         self.FUNCTION_FILES = config["FUNCTION_FILES"]
         self.OUTSIDERS_FIX = config["OUTSIDERS_FIX"]
-        self.functions = {
-            group: joblib.load(interpolation_functions_dir / file)
+        # Predicted compression for every raw weight in [0, OUTSIDERS_FIX] of each group
+        self.tables = {
+            group: load_table(
+                interpolation_functions_dir / file, self.OUTSIDERS_FIX[group]
+            )
             for group, file in self.FUNCTION_FILES.items()
         }
 
@@ -43,7 +47,7 @@ class InformativenessScorer:
         group = self._get_group(script_code)
         raw_weight = min(raw_weight, self.OUTSIDERS_FIX[group])
 
-        y_pred = float(self.functions[group](raw_weight))
+        y_pred = float(self.tables[group][raw_weight])
         diff = compression - y_pred
 
         if abs(diff) <= self.TOLERANCE_GOOD:
@@ -86,9 +90,96 @@ class InformativenessScorer:
             0.0,
         )
 
-    def score(self, text: str, script_code: str) -> float:
-        text = re.sub(r"\d", "1", text.lower())
-        compressed_weight = len(self.cctx.compress(text.encode("utf-8")))
-        raw_weight = max(1, len(text.encode("utf-8")))
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Text as compressed: lowercased, with every digit as 1."""
+        return re.sub(r"\d", "1", text.lower())
+
+    @staticmethod
+    def _compression_ratio(
+        raw_weight: int, compressed_weight: int
+    ) -> Tuple[int, float]:
+        """Raw weight (at least 1) and compression ratio of a text of `raw_weight`
+        bytes."""
+        raw_weight = max(1, raw_weight)
         compression = round((1 - compressed_weight / raw_weight) * 100, 1)
+        return raw_weight, compression
+
+    def _compression(self, text: str) -> Tuple[int, float]:
+        """Raw weight (in bytes) and compression ratio of a text."""
+        data = self.normalize(text).encode("utf-8", "surrogatepass")
+        return self._compression_ratio(len(data), len(self.cctx.compress(data)))
+
+    def score(self, text: str, script_code: str) -> float:
+        raw_weight, compression = self._compression(text)
+        return self._calculate_information_score(raw_weight, compression, script_code)
+
+    def score_compressed(
+        self, raw_weight: int, compressed_weight: int, script_code: str
+    ) -> float:
+        """`score()` of a normalized text (see normalize()) of `raw_weight` bytes
+        compressed to `compressed_weight`."""
+        raw_weight, compression = self._compression_ratio(raw_weight, compressed_weight)
         return self._calculate_information_score(raw_weight, compression, script_code)
+
+    def score_batch(self, texts: List[str], script_codes: List[str]) -> np.ndarray:
+        """`score()` for a batch of texts, with the interpolation and scoring done as
+        array operations."""
+        raw_weights, compressions = zip(
+            *[self._compression(text) for text in texts], strict=True
+        )
+        raw_weights = np.array(raw_weights, dtype=np.int64)
+        compression = np.array(compressions, dtype=np.float64)
+
+        groups = np.array(
+            [self._get_group(script_code) for script_code in script_codes]
+        )
+        y_pred = np.empty(len(texts), dtype=np.float64)
+        for group in np.unique(groups):
+            in_group = groups == group
+            y_pred[in_group] = self.tables[group][
+                np.minimum(raw_weights[in_group], self.OUTSIDERS_FIX[group])
+            ]
+
+        diff = compression - y_pred
+        return np.select(
+            [
+                np.abs(diff) <= self.TOLERANCE_GOOD,
+                np.abs(diff) >= self.TOLERANCE_BAD,
+                (diff < 0) & (np.abs(diff) <= self.TOLERANCE_SEMIBAD),
+                diff < 0,
+                diff <= self.TOLERANCE_SEMIBAD,
+            ],
+            [
+                1.0,
+                0.0,
+                scale_values(
+                    compression,
+                    y_pred - self.TOLERANCE_GOOD,
+                    y_pred - self.TOLERANCE_SEMIBAD,
+                    1.0,
+                    0.7,
+                ),
+                scale_values(
+                    compression,
+                    y_pred - self.TOLERANCE_SEMIBAD,
+                    y_pred - self.TOLERANCE_BAD,
+                    0.7,
+                    0.0,
+                ),
+                scale_values(
+                    compression,
+                    y_pred + self.TOLERANCE_GOOD,
+                    y_pred + self.TOLERANCE_SEMIBAD,
+                    1.0,
+                    0.7,
+                ),
+            ],
+            scale_values(
+                compression,
+                y_pred + self.TOLERANCE_SEMIBAD,
+                y_pred + self.TOLERANCE_BAD,
+                0.7,
+                0.0,
+            ),
+        )
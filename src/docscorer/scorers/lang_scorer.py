@@ -1,9 +1,10 @@
-import sys
+from typing import List
 
-from typing import List, Optional
+import numpy as np
 
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import profile_thresholds
 
 
 class LangScorer:
@@ -12,7 +13,7 @@ class LangScorer:
 
     def score(
         self,
-        ref_language: str,
+        profile: LanguageProfile,
         lang_segments: List[str],
         word_chars: List[int],
         id: str,
@@ -20,8 +21,8 @@ class LangScorer:
         if len(lang_segments) != len(
             word_chars
         ):
-            return 0  # Errors from unmatched scores
-        menu_length = get_threshold(self.config.MENUS_AVERAGE_LENGTH, ref_language)
+            return 0.0  # Errors from unmatched scores
+        menu_length = profile.menus_average_length
         correct_lang_chars = 0
         wrong_lang_chars = 0
         available_chars = False
@@ -29,7 +30,7 @@ class LangScorer:
             if word_chars[n] <= menu_length:
                 available_chars = True
                 continue
-            elif lang_segments[n] == ref_language:
+            elif lang_segments[n] == profile.language:
                 correct_lang_chars += word_chars[n]
             else:
                 wrong_lang_chars += word_chars[n]
@@ -38,13 +39,13 @@ class LangScorer:
                 # print(
                 #     f"Doc_name: '{id}' - No available segments have been found on "
                 #     "the target language\n"
-                #     f"- Language: '{ref_language}' - Segment_languages: "
+                #     f"- Language: '{profile.language}' - Segment_languages: "
                 #     f"{set(lang_segments)}", file=sys.stderr
                 # )
                 return 0.0
 
             else:
-                if all([x == ref_language for x in lang_segments]):
+                if all([x == profile.language for x in lang_segments]):
                     return 1.0
                 # print(
                 #     f"Doc_name: '{id}' - "
@@ -54,3 +55,28 @@ class LangScorer:
                 return 0.0
         results = correct_lang_chars / (correct_lang_chars + wrong_lang_chars)
         return min(results, 1.0)
+
+    def score_batch(
+        self, profiles: List[LanguageProfile], features: FeatureBatch
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        menu_length = profile_thresholds(profiles, "menus_average_length")
+        word_chars = features.word_chars
+        short_segments = word_chars <= features.per_segment(menu_length)
+        available_chars = features.document_any(short_segments)
+        correct_lang_chars = features.document_sum(
+            np.where(~short_segments & features.ref_lang_segments, word_chars, 0)
+        )
+        wrong_lang_chars = features.document_sum(
+            np.where(~short_segments & ~features.ref_lang_segments, word_chars, 0)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            results = np.minimum(
+                correct_lang_chars / (correct_lang_chars + wrong_lang_chars), 1.0
+            )
+        results = np.where(
+            correct_lang_chars == 0,
+            np.where(available_chars & features.all_ref_lang, 1.0, 0.0),
+            results,
+        )
+        return np.where(features.lang_segments_match, results, 0.0)
@@ -1,7 +1,10 @@
 from typing import List, Tuple
 
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold
+import numpy as np
+
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import profile_thresholds
 
 
 class LongTextScorer:
@@ -9,32 +12,73 @@ class LongTextScorer:
         self.config = config
 
     def score(
-        self, ref_language: str, lang_segments: List[str], word_chars: List[int]
+        self, profile: LanguageProfile, lang_segments: List[str], word_chars: List[int]
     ) -> Tuple[float, float]:
         if len(word_chars) != len(lang_segments):
-            lang_segments = [ref_language] * len(word_chars)
+            lang_segments = [profile.language] * len(word_chars)
             # return (-1000, -1000)
 
-        long_text_min = get_threshold(self.config.LONG_TEXT_MIN, ref_language)
-        long_text_max = get_threshold(self.config.LONG_TEXT_MAX, ref_language)
+        long_text_min = profile.long_text_min
+        long_text_max = profile.long_text_max
 
-        long_segments = []
+        n_long_segments = 0
+        # Scores of very long segments are accumulated in segment order, as in
+        # score_batch()
+        very_long_total = 0.0
+        n_very_long = 0
         for n in range(len(word_chars)):
-            if lang_segments[n] == ref_language and word_chars[n] > long_text_min:
+            if lang_segments[n] == profile.language and word_chars[n] > long_text_min:
                 useful_chars = long_text_max if word_chars[n] > long_text_max else word_chars[n]
                 score = (useful_chars - long_text_min) / (long_text_max - long_text_min)
-                long_segments.append(score)
+                n_long_segments += 1
+                if score > 0.5:
+                    very_long_total += score
+                    n_very_long += 1
 
-        n_segments = len(long_segments) if len(long_segments) <= 10 else 10
-        highter_segments = [x for x in long_segments if x > 0.5]
+        n_segments = n_long_segments if n_long_segments <= 10 else 10
         score_very_long_segments = 0.0
-        if highter_segments:
+        if n_very_long:
             score_very_long_segments = (
-                sum(highter_segments) + 0.1 * (len(highter_segments))
-            ) / len(highter_segments)
+                very_long_total + 0.1 * n_very_long
+            ) / n_very_long
 
         score_n_segments = n_segments / self.config.DESIRED_LONG_TEXTS
         return (
             min(score_n_segments, 1.0),
             min(score_very_long_segments, 1.0),
         )
+
+    def score_batch(
+        self, profiles: List[LanguageProfile], features: FeatureBatch
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """`score()` for every document of a batch."""
+        long_text_min = features.per_segment(
+            profile_thresholds(profiles, "long_text_min")
+        )
+        long_text_max = features.per_segment(
+            profile_thresholds(profiles, "long_text_max")
+        )
+        word_chars = features.word_chars
+
+        long_segments = features.ref_lang_segments & (word_chars > long_text_min)
+        useful_chars = np.where(word_chars > long_text_max, long_text_max, word_chars)
+        scores = (useful_chars - long_text_min) / (long_text_max - long_text_min)
+        very_long_segments = long_segments & (scores > 0.5)
+
+        n_segments = np.minimum(features.document_sum(long_segments), 10)
+        n_very_long = features.document_sum(very_long_segments)
+        very_long_total = features.document_sum(
+            np.where(very_long_segments, scores, 0.0)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score_very_long_segments = np.where(
+                n_very_long > 0,
+                (very_long_total + 0.1 * n_very_long) / n_very_long,
+                0.0,
+            )
+
+        score_n_segments = n_segments / self.config.DESIRED_LONG_TEXTS
+        return (
+            np.minimum(score_n_segments, 1.0),
+            np.minimum(score_very_long_segments, 1.0),
+        )
@@ -1,25 +1,43 @@
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold, scale_value, penalize_accumulation
+from typing import List
+
+import numpy as np
+
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import (
+    penalize_accumulation,
+    penalize_accumulation_batch,
+    profile_thresholds,
+    round_values,
+    scale_value,
+    scale_values,
+)
 
 
 class NumsScorer:
     def __init__(self, config: ScorerConfiguration):
         self.config = config
 
-    def score(self, ref_language: str, num_numbers: int, num_word_chars: int,
-              number_chars: list, word_chars: list) -> float:
+    def score(
+        self,
+        profile: LanguageProfile,
+        num_numbers: int,
+        num_word_chars: int,
+        number_chars: list,
+        word_chars: list,
+    ) -> float:
         if num_word_chars == 0:
             return 0.0
 
-        percent_max = get_threshold(self.config.NUMBERS_PERCENT_MAX, ref_language)
-        percent_desired = get_threshold(self.config.NUMBERS_PERCENT_DESIRED, ref_language)
+        percent_max = profile.numbers_percent_max
+        percent_desired = profile.numbers_percent_desired
 
         ratio = round((num_numbers / num_word_chars) * 100, 1)
 
-        
+
         if ratio >= percent_max:
             return 0.0
-        
+
         accumulation = penalize_accumulation(analyzed_chars=number_chars, word_chars=word_chars,
                                             not_penalized=self.config.ACCUM_NUMBERS_NOT_PENALIZED,
                                             hard_penalized=self.config.ACCUM_NUMBERS_HARD_PENALIZED)
@@ -28,5 +46,29 @@ class NumsScorer:
             return 1.0 * accumulation
         return scale_value(ratio, percent_desired, percent_max, 1.0, 0.0) * accumulation
 
-    
-    
+    def score_batch(
+        self,
+        profiles: List[LanguageProfile],
+        features: FeatureBatch,
+        num_numbers: np.ndarray,
+        num_word_chars: np.ndarray,
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        percent_max = profile_thresholds(profiles, "numbers_percent_max")
+        percent_desired = profile_thresholds(profiles, "numbers_percent_desired")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = round_values((num_numbers / num_word_chars) * 100, 1)
+
+        accumulation = penalize_accumulation_batch(
+            features.numbers,
+            features.word_chars,
+            features.offsets,
+            not_penalized=self.config.ACCUM_NUMBERS_NOT_PENALIZED,
+            hard_penalized=self.config.ACCUM_NUMBERS_HARD_PENALIZED,
+        )
+        return np.select(
+            [num_word_chars == 0, ratio >= percent_max, ratio <= percent_desired],
+            [0.0, 0.0, 1.0 * accumulation],
+            scale_values(ratio, percent_desired, percent_max, 1.0, 0.0) * accumulation,
+        )
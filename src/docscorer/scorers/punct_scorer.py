@@ -1,5 +1,15 @@
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold, scale_value
+from typing import List
+
+import numpy as np
+
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import (
+    profile_thresholds,
+    round_values,
+    scale_value,
+    scale_values,
+)
 
 
 class PunctScorer:
@@ -18,36 +28,35 @@ class PunctScorer:
                 bad_segm += n_word_seg
         proportion_bad = bad_segm/num_word_chars
         if proportion_bad < 0.05:
-            return 1
+            return 1.0
         elif proportion_bad > 0.4:
-            return 0
+            return 0.0
         elif proportion_bad > 0.05 and proportion_bad < 0.2:
             return scale_value(proportion_bad, 0.2, 0.05, 0.6, 1.0)
         else:
             return scale_value(proportion_bad, 0.4, 0.2, 0, 0.6)
 
     def score(
-        self, ref_language: str, num_punctuation_chars: int, num_word_chars: int, punct_chars: list, 
-        word_chars: list) -> float:
+        self,
+        profile: LanguageProfile,
+        num_punctuation_chars: int,
+        num_word_chars: int,
+        punct_chars: list,
+        word_chars: list,
+    ) -> float:
         if not num_word_chars or len(punct_chars) != len(word_chars):
             return 0.0
 
-        percent_bad = get_threshold(self.config.PUNCTUATION_PERCENT_BAD, ref_language)
-        percent_semibad = get_threshold(
-            self.config.PUNCTUATION_PERCENT_SEMIBAD, ref_language
-        )
-        percent_desired_max = get_threshold(
-            self.config.PUNCTUATION_PERCENT_DESIRED_MAX, ref_language
-        )
-        percent_desired_min = get_threshold(
-            self.config.PUNCTUATION_PERCENT_DESIRED_MIN, ref_language
-        )
+        percent_bad = profile.punctuation_percent_bad
+        percent_semibad = profile.punctuation_percent_semibad
+        percent_desired_max = profile.punctuation_percent_desired_max
+        percent_desired_min = profile.punctuation_percent_desired_min
 
         ratio = round((num_punctuation_chars / num_word_chars) * 100, 1)
-        if ref_language in self.config.no_punctuation_exception_list and ratio <= percent_desired_min:
+        if profile.no_punctuation and ratio <= percent_desired_min:
             #Exception for languages with no mandatory punctuation
             return 1.0
-        
+
         score = 0.0
         if ratio >= percent_bad[0] or ratio <= percent_bad[1]:
             return 0.0
@@ -65,7 +74,89 @@ class PunctScorer:
             )
         if score < 0.3:
             return score
-        
-        menu_length = get_threshold(self.config.MENUS_AVERAGE_LENGTH, ref_language)
+
+        menu_length = profile.menus_average_length
         penalize_lack_punct_segm = self.penalize_lack_punct_segm(punct_chars=punct_chars, word_chars=word_chars, num_word_chars=num_word_chars, not_penalized=menu_length*3, percent_bad=percent_semibad)
         return min(score, penalize_lack_punct_segm)
+
+    def penalize_lack_punct_segm_batch(
+        self,
+        features: FeatureBatch,
+        num_word_chars: np.ndarray,
+        not_penalized: np.ndarray,
+        percent_bad: np.ndarray,
+    ) -> np.ndarray:
+        word_chars = features.word_chars
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = round_values((features.punctuation_chars / word_chars) * 100, 1)
+        bad_segm = (
+            (word_chars != 0)
+            & (word_chars > features.per_segment(not_penalized))
+            & (ratio < features.per_segment(percent_bad))
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            proportion_bad = (
+                features.document_sum(np.where(bad_segm, word_chars, 0))
+                / num_word_chars
+            )
+        return np.select(
+            [
+                proportion_bad < 0.05,
+                proportion_bad > 0.4,
+                (proportion_bad > 0.05) & (proportion_bad < 0.2),
+            ],
+            [1.0, 0.0, scale_values(proportion_bad, 0.2, 0.05, 0.6, 1.0)],
+            scale_values(proportion_bad, 0.4, 0.2, 0, 0.6),
+        )
+
+    def score_batch(
+        self,
+        profiles: List[LanguageProfile],
+        features: FeatureBatch,
+        num_punctuation_chars: np.ndarray,
+        num_word_chars: np.ndarray,
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        percent_bad = profile_thresholds(profiles, "punctuation_percent_bad")
+        percent_semibad = profile_thresholds(profiles, "punctuation_percent_semibad")
+        percent_desired_max = profile_thresholds(
+            profiles, "punctuation_percent_desired_max"
+        )
+        percent_desired_min = profile_thresholds(
+            profiles, "punctuation_percent_desired_min"
+        )
+        menu_length = profile_thresholds(profiles, "menus_average_length")
+        no_punctuation = profile_thresholds(profiles, "no_punctuation").astype(bool)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = round_values((num_punctuation_chars / num_word_chars) * 100, 1)
+        bad_max, bad_min = percent_bad[:, 0], percent_bad[:, 1]
+        score = np.select(
+            [
+                (ratio >= bad_max) | (ratio <= bad_min),
+                (percent_desired_min <= ratio) & (ratio <= percent_desired_max),
+                ratio <= percent_semibad,
+                ratio <= percent_desired_min,
+                ratio >= percent_desired_max,
+            ],
+            [
+                0.0,
+                1.0,
+                scale_values(ratio, bad_min, percent_semibad, 0.0, 0.5),
+                scale_values(ratio, percent_semibad, percent_desired_min, 0.5, 1.0),
+                scale_values(ratio, percent_desired_max, bad_max, 1.0, 0.0),
+            ],
+            0.0,
+        )
+        penalize_lack_punct_segm = self.penalize_lack_punct_segm_batch(
+            features,
+            num_word_chars,
+            not_penalized=menu_length * 3,
+            percent_bad=percent_semibad,
+        )
+        score = np.where(
+            score < 0.3, score, np.minimum(score, penalize_lack_punct_segm)
+        )
+        # Exception for languages with no mandatory punctuation
+        score = np.where(no_punctuation & (ratio <= percent_desired_min), 1.0, score)
+        return np.where(num_word_chars == 0, 0.0, score)
@@ -1,20 +1,79 @@
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold
 from collections import Counter
+from typing import Iterable
+
+import numpy as np
+
+from docscorer.configuration import ScorerConfiguration
+from docscorer.features import FeatureBatch
+
 
 class RepeatedScorer:
+    """Repetition within a document: the share of its segments longer than 4 chars that
+    occur more than once. Segments are compared by their 64-bit hashes (see
+    CharClassifier.hash_segments()), so they are never split into strings."""
     MAX_SCORE = 1.0
+    MIN_SEGMENT_LENGTH = 5
+    MAX_COUNTED_SEGMENTS = (
+        1000  # documents with more segments are scored by sorting their hashes
+    )
 
     def __init__(self, config: ScorerConfiguration):
         self.config = config
 
     def score(self, document: str) -> float:
-        segments = document.split("\n")
-        segments = [seg for seg in segments if len(seg) > 4]
-        if not segments:
+        return self.score_hashes(*self.config.char_classifier.hash_segments(document))
+
+    def score_hashes(self, hashes: np.ndarray, lengths: np.ndarray) -> float:
+        """`score()` given the hashes and lengths of the segments of the document."""
+        if len(hashes) > self.MAX_COUNTED_SEGMENTS:
+            return float(
+                self._score_segments(hashes, lengths, np.array([0, len(hashes)]))[0]
+            )
+        kept = hashes[lengths >= self.MIN_SEGMENT_LENGTH]
+        return self.score_occurrences(Counter(kept.tolist()).values())
+
+    def score_batch(self, features: FeatureBatch) -> np.ndarray:
+        return self._score_segments(
+            features.segment_hashes, features.segment_lengths, features.offsets
+        )
+
+    def _score_segments(
+        self, hashes: np.ndarray, lengths: np.ndarray, offsets: np.ndarray
+    ) -> np.ndarray:
+        """Scores of the documents whose segments are at [offsets[i], offsets[i +
+        1])."""
+        n_documents = len(offsets) - 1
+        documents = np.repeat(np.arange(n_documents), np.diff(offsets))
+        kept = lengths >= self.MIN_SEGMENT_LENGTH
+        hashes = hashes[kept]
+        documents = documents[kept]
+        # Runs of equal (document, hash) pairs are the occurrences of a distinct segment
+        order = np.lexsort((hashes, documents))
+        hashes = hashes[order]
+        documents = documents[order]
+        first = np.ones(len(hashes), dtype=bool)
+        first[1:] = (hashes[1:] != hashes[:-1]) | (documents[1:] != documents[:-1])
+        starts = np.flatnonzero(first)
+        occurrences = np.diff(np.append(starts, len(hashes)))
+        is_repeated = occurrences > 1
+        repeated = np.bincount(
+            documents[starts][is_repeated],
+            weights=occurrences[is_repeated],
+            minlength=n_documents,
+        )
+        total = np.bincount(documents, minlength=n_documents)
+        scores = np.full(n_documents, self.MAX_SCORE)
+        has_segments = total > 0
+        scores[has_segments] = 1 - repeated[has_segments] / total[has_segments]
+        return np.maximum(scores, 0.0)
+
+    def score_occurrences(self, occurr_per_seg: Iterable[int]) -> float:
+        """`score()` given how many times each distinct segment longer than 4 chars
+        occurs."""
+        occurr_per_seg = list(occurr_per_seg)
+        if not occurr_per_seg:
             return self.MAX_SCORE
-        occurr_per_seg = Counter(segments)
-        repeated = sum(ocur for ocur in occurr_per_seg.values() if ocur > 1)
-        repetition_ratio = repeated / len(segments)
+        repeated = sum(ocur for ocur in occurr_per_seg if ocur > 1)
+        repetition_ratio = repeated / sum(occurr_per_seg)
         score = (1 - repetition_ratio)
         return score if score >= 0 else 0.0
@@ -1,23 +1,59 @@
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold, scale_value
+import math
+from typing import List
+
 import numpy as np
 
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import profile_thresholds, scale_value, scale_values
+
+
 class ShortSegmentsScore:
     def __init__(self, config: ScorerConfiguration):
         self.config = config
 
-    def score(self, ref_language: str, word_chars: list) -> float:
+    def score(self, profile: LanguageProfile, word_chars: list) -> float:
         # Almost 5 segments
         if len(word_chars) < 5:
             return 1.0
-        long_text_length = get_threshold(self.config.LONG_TEXT_MIN, ref_language)
+        long_text_length = profile.long_text_min
         word_chars = [long_text_length if x>long_text_length else x for x in word_chars] #long texts are capped to long_text_length because we need to on the fluctuation of short segments
-        word_chars = np.array(word_chars)
-        cv = np.std(word_chars) / np.mean(word_chars) # coefficient of variation
-        score = 1 / (1 + cv.item())
+        # coefficient of variation, accumulated in segment order as in score_batch()
+        total = 0.0
+        for x in word_chars:
+            total += x
+        mean = total / len(word_chars)
+        squares = 0.0
+        for x in word_chars:
+            squares += (x - mean) * (x - mean)
+        cv = math.sqrt(squares / len(word_chars)) / mean if mean else math.nan
+        score = 1 / (1 + cv)
         if score > 0.6:
             #low fluctuation in segments are not penalized
             return 1.0
         return scale_value(score, 0.0, 0.6, 0.5, 1.0) #is scaled between 0.5 and 1.0 to minimize the impact of this scorer
 
-        
+    def score_batch(
+        self, profiles: List[LanguageProfile], features: FeatureBatch
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        long_text_length = features.per_segment(
+            profile_thresholds(profiles, "long_text_min")
+        )
+        word_chars = np.where(
+            features.word_chars > long_text_length,
+            long_text_length,
+            features.word_chars,
+        ).astype(np.float64)
+        n_segments = features.n_segments
+        mean = features.document_sum(word_chars) / n_segments
+        deviation = word_chars - features.per_segment(mean)
+        squares = features.document_sum(deviation * deviation)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.where(mean != 0, np.sqrt(squares / n_segments) / mean, np.nan)
+            score = 1 / (1 + cv)
+        return np.select(
+            [n_segments < 5, score > 0.6],
+            [1.0, 1.0],
+            scale_values(score, 0.0, 0.6, 0.5, 1.0),
+        )
@@ -1,28 +1,38 @@
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold, scale_value, penalize_accumulation
+from typing import List
+
+import numpy as np
+
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import (
+    penalize_accumulation,
+    penalize_accumulation_batch,
+    profile_thresholds,
+    round_values,
+    scale_value,
+    scale_values,
+)
 
 
 class SingularCharsScorer:
     def __init__(self, config: ScorerConfiguration):
         self.config = config
 
-    def score(self, ref_language: str, num_singular_chars: int, num_word_chars: int,
-              singular_chars: list, word_chars: list) -> float:
+    def score(
+        self,
+        profile: LanguageProfile,
+        num_singular_chars: int,
+        num_word_chars: int,
+        singular_chars: list,
+        word_chars: list,
+    ) -> float:
         if num_word_chars == 0:
-            return 0
+            return 0.0
 
-        percent_max = get_threshold(
-            self.config.SINGULAR_CHARS_PERCENT_MAX, ref_language
-        )
-        percent_bad = get_threshold(
-            self.config.SINGULAR_CHARS_PERCENT_BAD, ref_language
-        )
-        percent_semibad = get_threshold(
-            self.config.SINGULAR_CHARS_PERCENT_SEMIBAD, ref_language
-        )
-        percent_desired = get_threshold(
-            self.config.SINGULAR_CHARS_PERCENT_DESIRED, ref_language
-        )
+        percent_max = profile.singular_chars_percent_max
+        percent_bad = profile.singular_chars_percent_bad
+        percent_semibad = profile.singular_chars_percent_semibad
+        percent_desired = profile.singular_chars_percent_desired
 
         ratio = round((num_singular_chars / num_word_chars) * 100, 1)
 
@@ -39,3 +49,47 @@ class SingularCharsScorer:
             return scale_value(ratio, percent_bad, percent_semibad, 0.5, 0.7) * accumulation
         else:
             return scale_value(ratio, percent_semibad, percent_desired, 0.7, 1.0) * accumulation
+
+    def score_batch(
+        self,
+        profiles: List[LanguageProfile],
+        features: FeatureBatch,
+        num_singular_chars: np.ndarray,
+        num_word_chars: np.ndarray,
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        percent_max = profile_thresholds(profiles, "singular_chars_percent_max")
+        percent_bad = profile_thresholds(profiles, "singular_chars_percent_bad")
+        percent_semibad = profile_thresholds(profiles, "singular_chars_percent_semibad")
+        percent_desired = profile_thresholds(profiles, "singular_chars_percent_desired")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = round_values((num_singular_chars / num_word_chars) * 100, 1)
+
+        accumulation = penalize_accumulation_batch(
+            features.singular_chars,
+            features.word_chars,
+            features.offsets,
+            not_penalized=self.config.ACCUM_SINGULAR_NOT_PENALIZED,
+            hard_penalized=self.config.ACCUM_SINGULAR_HARD_PENALIZED,
+        )
+        return np.select(
+            [
+                num_word_chars == 0,
+                ratio <= percent_desired,
+                ratio >= percent_bad,
+                ratio >= percent_semibad,
+            ],
+            [
+                0.0,
+                1.0 * accumulation,
+                scale_values(
+                    np.minimum(ratio, percent_max), percent_max, percent_bad, 0.0, 0.5
+                )
+                * accumulation,
+                scale_values(ratio, percent_bad, percent_semibad, 0.5, 0.7)
+                * accumulation,
+            ],
+            scale_values(ratio, percent_semibad, percent_desired, 0.7, 1.0)
+            * accumulation,
+        )
@@ -1,8 +1,11 @@
 from enum import Enum
 from typing import List
 
-from docscorer.configuration import ScorerConfiguration
-from docscorer.scorers.utils import get_threshold, scale_value
+import numpy as np
+
+from docscorer.configuration import LanguageProfile, ScorerConfiguration
+from docscorer.features import FeatureBatch
+from docscorer.scorers.utils import profile_thresholds, scale_value, scale_values
 
 
 class URLThreshold(Enum):
@@ -18,8 +21,20 @@ class URLScorer:
     def __init__(self, config: ScorerConfiguration):
         self.config = config
 
-    def score(self, ref_language: str, document: str, word_chars: List[int]) -> float:
-        menu_length = get_threshold(self.config.MENUS_AVERAGE_LENGTH, ref_language)
+    @staticmethod
+    def url_count(text: str) -> int:
+        return max(text.count("www"), text.count("http"))
+
+    def score(
+        self, profile: LanguageProfile, document: str, word_chars: List[int]
+    ) -> float:
+        return self.score_count(profile, self.url_count(document), word_chars)
+
+    def score_count(
+        self, profile: LanguageProfile, url_count: int, word_chars: List[int]
+    ) -> float:
+        """`score()` of a document with `url_count` urls (see url_count())."""
+        menu_length = profile.menus_average_length
 
         # Only consider segments longer than menu_length
         long_segments = [x for x in word_chars if x > menu_length]
@@ -30,7 +45,6 @@ class URLScorer:
         reference_text_length = menu_length * 80
         ratio_respect_reference = sum(word_chars) / reference_text_length or 0.1
 
-        url_count = max(document.count("www"), document.count("http"))
         url_quantity = url_count / ratio_respect_reference
 
         if url_quantity <= URLThreshold.LOW.value:
@@ -38,3 +52,42 @@ class URLScorer:
         if url_quantity >= URLThreshold.HIGH.value:
             return self.MIN_SCORE
         return scale_value(url_quantity, URLThreshold.LOW.value, URLThreshold.HIGH.value, self.MAX_SCORE, self.MIN_SCORE)
+
+    def score_batch(
+        self,
+        profiles: List[LanguageProfile],
+        documents: List[str],
+        features: FeatureBatch,
+        num_word_chars: np.ndarray,
+    ) -> np.ndarray:
+        """`score()` for every document of a batch."""
+        menu_length = profile_thresholds(profiles, "menus_average_length")
+        long_segments = features.document_any(
+            features.word_chars > features.per_segment(menu_length)
+        )
+
+        reference_text_length = menu_length * 80
+        ratio_respect_reference = num_word_chars / reference_text_length
+        ratio_respect_reference[ratio_respect_reference == 0] = 0.1
+
+        url_count = np.array(
+            [self.url_count(document) for document in documents],
+            dtype=np.int64,
+        )
+        url_quantity = url_count / ratio_respect_reference
+
+        return np.select(
+            [
+                ~long_segments,
+                url_quantity <= URLThreshold.LOW.value,
+                url_quantity >= URLThreshold.HIGH.value,
+            ],
+            [self.MAX_SCORE, self.MAX_SCORE, self.MIN_SCORE],
+            scale_values(
+                url_quantity,
+                URLThreshold.LOW.value,
+                URLThreshold.HIGH.value,
+                self.MAX_SCORE,
+                self.MIN_SCORE,
+            ),
+        )
@@ -1,4 +1,9 @@
-from typing import Any
+from typing import TYPE_CHECKING, Any, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from docscorer.configuration import LanguageProfile
 
 
 def get_threshold(
@@ -51,4 +56,58 @@ def penalize_accumulation(analyzed_chars: list, word_chars: list, not_penalized:
     elif problem_chars > hard_penalized:
         return 0.0
     return scale_value(problem_chars, not_penalized, hard_penalized, 1.0, 0.0)
-        
+
+
+def profile_thresholds(profiles: List["LanguageProfile"], name: str) -> np.ndarray:
+    """Array of a LanguageProfile threshold for a list of profiles (one row per
+    profile)."""
+    return np.array([getattr(profile, name) for profile in profiles], dtype=np.float64)
+
+
+def scale_values(
+    value: np.ndarray,
+    min_value: Any,
+    max_value: Any,
+    min_score: float,
+    max_score: float,
+) -> np.ndarray:
+    """Array version of `scale_value()`, with the same operations in the same order."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (value - min_value) / (max_value - min_value)
+        score = ratio * (max_score - min_score) + min_score
+    return np.where(np.equal(min_value, max_value), 0.0, score)
+
+
+def round_values(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """Round like Python's round(), which rounds the exact decimal value of the float.
+    np.round() scales before rounding, so it can only disagree on near halfway values,
+    which are rounded again with round()."""
+    with np.errstate(invalid="ignore"):
+        rounded = np.round(values, ndigits)
+        scaled = values * 10**ndigits
+        near_halfway = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_halfway):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def penalize_accumulation_batch(
+    analyzed_chars: np.ndarray,
+    word_chars: np.ndarray,
+    offsets: np.ndarray,
+    not_penalized: int,
+    hard_penalized: int,
+) -> np.ndarray:
+    """`penalize_accumulation()` for every document of a batch of flat segment arrays,
+    where the segments of document i are at [offsets[i], offsets[i + 1])."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accumulated = (analyzed_chars >= 10) & (
+            (word_chars == 0) | (analyzed_chars / word_chars > 0.1)
+        )
+    candidate_num = np.where(accumulated, analyzed_chars - word_chars, 0)
+    problem_chars = np.maximum(np.maximum.reduceat(candidate_num, offsets[:-1]), 0)
+    return np.select(
+        [problem_chars <= not_penalized, problem_chars > hard_penalized],
+        [1.0, 0.0],
+        scale_values(problem_chars, not_penalized, hard_penalized, 1.0, 0.0),
+    )
@@ -0,0 +1,306 @@
+import collections
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from docscorer.features import SegmentFeatureCache
+
+if TYPE_CHECKING:
+    from docscorer.docscorer import Document, DocumentScorer
+
+LATENCY_WINDOW = 10000  # requests kept for the latency percentiles
+PERCENTILES = (50, 90, 99)
+
+
+class DocumentError(Exception):
+    """A document that could not be scored, even on its own: the record is at fault, not
+    the server."""
+
+
+class MicroBatcher:
+    """Scores the documents submitted by concurrent threads in batches, with a single
+    scoring thread. A batch is scored when it has `max_batch` documents, or `max_wait`
+    seconds after its first document arrived, so a lone request waits at most `max_wait`
+    and a busy server scores large batches. When a batch fails, its documents are scored
+    again one by one, so a document that cannot be scored only fails its own future
+    (with a DocumentError). Futures cancelled before their batch is scored (see
+    ScoringRequestHandler) are left out of it."""
+
+    def __init__(
+        self, scorer: "DocumentScorer", max_batch: int = 256, max_wait: float = 0.005
+    ):
+        if max_batch < 1 or max_wait < 0:
+            raise ValueError(
+                "max_batch must be positive and max_wait not negative, got "
+                f"{max_batch} and {max_wait}"
+            )
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[Document, Future[Dict[str, Any]]]]" = (
+            queue.Queue()
+        )
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"requests": 0, "documents": 0, "batches": 0, "errors": 0}
+        self._batched = 0  # documents scored by the batches
+        # ScoreCache.stats(), read by the scoring thread after every batch: the cache
+        # connection can only be used by the thread that opened it
+        self._score_cache_stats: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="docscorer-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, documents: List["Document"]) -> List["Future[Dict[str, Any]]"]:
+        """Queue documents, given as (ref_lang, ref_script, lang_segments,
+        document_text, doc_id) tuples. The futures give their scores (see
+        score_fields())."""
+        futures: List["Future[Dict[str, Any]]"] = []
+        for document in documents:
+            future: "Future[Dict[str, Any]]" = Future()
+            self._queue.put((document, future))
+            futures.append(future)
+        return futures
+
+    def _next_batch(self) -> List[Tuple["Document", "Future[Dict[str, Any]]"]]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        self._update_score_cache_stats()
+        while not self._stop.is_set():
+            # Once running, a future can no longer be cancelled by its request
+            batch = [
+                item
+                for item in self._next_batch()
+                if item[1].set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            documents = [document for document, _ in batch]
+            try:
+                results = self._score(documents)
+            except Exception:
+                logging.exception(
+                    "Scoring a batch failed, its documents are scored one by one"
+                )
+                for document, future in batch:
+                    try:
+                        future.set_result(
+                            self.score_fields(document, self._score([document])[0])
+                        )
+                    # Reported to the request of the document, the server goes on
+                    except Exception as e:
+                        error = DocumentError(
+                            f"Document {document[4]!r} could not be scored: {e!r}"
+                        )
+                        error.__cause__ = e
+                        future.set_exception(error)
+                self._update_score_cache_stats()
+                continue
+            with self._lock:
+                self._counts["batches"] += 1
+                self._batched += len(batch)
+            for (document, future), scores in zip(batch, results, strict=True):
+                future.set_result(self.score_fields(document, scores))
+            self._update_score_cache_stats()
+        if self.scorer.score_cache is not None:
+            self.scorer.score_cache.flush()
+
+    def _update_score_cache_stats(self) -> None:
+        if self.scorer.score_cache is not None:
+            stats = self.scorer.score_cache.stats(flush=False)
+            with self._lock:
+                self._score_cache_stats = stats
+
+    def _score(self, documents: List["Document"]) -> List[Any]:
+        return self.scorer.score_batch(
+            documents, raw_score=self.scorer.config.only_final_score
+        )
+
+    def score_fields(self, document: "Document", scores: Any) -> Dict[str, Any]:
+        """JSON response of a scored document: doc_id and the score columns of the
+        output files."""
+        return {"doc_id": document[4], **self.scorer._score_fields(scores)}
+
+    def record(self, latency: float, documents: int, error: bool = False) -> None:
+        """Account for a finished request."""
+        with self._lock:
+            self._latencies.append(latency)
+            self._counts["requests"] += 1
+            self._counts["documents"] += documents
+            self._counts["errors"] += int(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counts, documents waiting to be scored, mean batch size, the latency
+        percentiles (ms) of the last LATENCY_WINDOW requests, the documents scored once
+        as duplicates of another one of their batch, and the SegmentFeatureCache and
+        ScoreCache lookups, if enabled (those of the ScoreCache as of the last batch).
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats: Dict[str, Any] = dict(self._counts)
+            batched = self._batched
+            score_cache_stats = self._score_cache_stats
+        stats["queue_depth"] = self._queue.qsize()
+        stats["duplicates"] = self.scorer._duplicates
+        if isinstance(self.scorer.char_counter, SegmentFeatureCache):
+            stats["segment_cache"] = self.scorer.char_counter.stats()
+        if score_cache_stats is not None:
+            stats["score_cache"] = score_cache_stats
+        stats["mean_batch_size"] = (
+            round(batched / stats["batches"], 2) if stats["batches"] else 0.0
+        )
+        for percentile in PERCENTILES:
+            if latencies:
+                value = latencies[
+                    min(len(latencies) - 1, len(latencies) * percentile // 100)
+                ]
+                stats[f"latency_p{percentile}_ms"] = round(value * 1000, 3)
+            else:
+                stats[f"latency_p{percentile}_ms"] = None
+        return stats
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """POST /score with a JSON record (or a list of records) as in the .jsonl files
+    returns its scores (or a list of them), or 400 if a record is malformed or cannot be
+    scored, and 503 if the scores are not ready after the `timeout` of the server. GET
+    /stats returns MicroBatcher.stats() and GET /health "ok".
+    """
+
+    server: "ScoringServer"
+    protocol_version = "HTTP/1.1"  # keep-alive connections for the crawler
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self._send_json(200, self.server.batcher.stats())
+        elif self.path == "/health":
+            self._send_json(200, "ok")
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        start = time.monotonic()
+        if self.path != "/score":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        batcher = self.server.batcher
+        try:
+            body = json.loads(
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            )
+            records = body if isinstance(body, list) else [body]
+            documents = [batcher.scorer._parse_record(record) for record in records]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            batcher.record(time.monotonic() - start, 0, error=True)
+            self._send_json(400, {"error": f"Malformed record: {e!r}"})
+            return
+        futures = batcher.submit(documents)
+        deadline = start + self.server.request_timeout
+        try:
+            results = [
+                future.result(timeout=max(deadline - time.monotonic(), 0))
+                for future in futures
+            ]
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()  # not scored if still waiting in the queue
+            batcher.record(time.monotonic() - start, len(documents), error=True)
+            self._send_json(
+                503, {"error": f"Not scored in {self.server.request_timeout} seconds"}
+            )
+            return
+        except DocumentError as e:
+            batcher.record(time.monotonic() - start, len(documents), error=True)
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logging.exception("Scoring failed")
+            batcher.record(time.monotonic() - start, len(documents), error=True)
+            self._send_json(500, {"error": repr(e)})
+            return
+        batcher.record(time.monotonic() - start, len(documents))
+        self._send_json(200, results if isinstance(body, list) else results[0])
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """HTTP server with one long-lived DocumentScorer. Every connection is handled by a
+    thread, and the documents of concurrent requests are scored together by a
+    MicroBatcher. A request waits at most `timeout` seconds for its scores."""
+
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog, for bursts of concurrent connections
+
+    def __init__(
+        self,
+        scorer: "DocumentScorer",
+        address: Tuple[str, int],
+        max_batch: int = 256,
+        max_wait: float = 0.005,
+        timeout: float = 30.0,
+    ):
+        self.batcher = MicroBatcher(scorer, max_batch, max_wait)
+        super().__init__(address, ScoringRequestHandler)
+        self.request_timeout = timeout
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+
+
+def serve(
+    scorer: "DocumentScorer",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_batch: int = 256,
+    max_wait: float = 0.005,
+    timeout: float = 30.0,
+) -> None:
+    """Run a ScoringServer until interrupted."""
+    with ScoringServer(scorer, (host, port), max_batch, max_wait, timeout) as server:
+        logging.info(
+            f"Scoring on http://{host}:{server.server_address[1]} (POST /score, GET "
+            "/stats)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Stopped")
@@ -0,0 +1,275 @@
+import csv
+import hashlib
+import io
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from docscorer.checkpoint import RunManifest
+from docscorer.columnar import columnar_format
+from docscorer.line_index import LineIndex
+from docscorer.streams import (
+    COMPRESSION_EXTENSIONS,
+    input_stem,
+    list_inputs,
+    open_binary_input,
+    open_binary_output,
+    open_input,
+)
+
+SPLIT_SIZE = (
+    1 << 30
+)  # plain files larger than this are split into byte ranges between shards
+
+
+@dataclass
+class WorkUnit:
+    """A whole input file, or the lines of a plain input file that start in [start, end)
+    (see LineRange)."""
+
+    input_file: Path
+    byte_range: Optional[Tuple[int, int]] = None
+    part: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        """Key of the unit in the run manifests and in the shard assignment."""
+        return unit_name(self.input_file, self.byte_range)
+
+    def output_name(self, extension: str) -> str:
+        stem = input_stem(self.input_file) or self.input_file.stem
+        if self.part is None:
+            return f"{stem}{extension}"
+        return f"{stem}.part-{self.part:05d}{extension}"
+
+
+def unit_name(input_file: Path, byte_range: Optional[Tuple[int, int]] = None) -> str:
+    if byte_range is None:
+        return Path(input_file).name
+    return f"{Path(input_file).name}[{byte_range[0]}:{byte_range[1]}]"
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """(index, count) of a "i/N" shard, with 0 <= i < N."""
+    try:
+        index, count = (int(value) for value in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Shards must be given as i/N, got {shard}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, N), got {shard}")
+    return index, count
+
+
+def shard_of(name: str, count: int) -> int:
+    """Shard of a work unit. A stable hash of its name, so every node computes the same
+    assignment."""
+    return (
+        int.from_bytes(hashlib.sha1(name.encode("utf-8")).digest()[:8], "big") % count
+    )
+
+
+def plan_units(
+    input_files: List[Path], split_size: Optional[int] = None
+) -> List[WorkUnit]:
+    """Work units of a run, in input order: whole files, and with a `split_size`, plain
+    files larger than it split into byte ranges of `split_size` bytes."""
+    units = []
+    for input_file in input_files:
+        size = input_file.stat().st_size
+        if (
+            split_size is None
+            or size <= split_size
+            or input_file.suffix in COMPRESSION_EXTENSIONS
+        ):
+            units.append(WorkUnit(input_file))
+            continue
+        for part, start in enumerate(range(0, size, split_size)):
+            units.append(
+                WorkUnit(input_file, (start, min(start + split_size, size)), part)
+            )
+    return units
+
+
+def shard_units(
+    input_files: List[Path], shard: Tuple[int, int], split_size: int = SPLIT_SIZE
+) -> List[WorkUnit]:
+    """Work units of shard (index, count). Files are only split when there are several
+    shards."""
+    index, count = shard
+    units = plan_units(input_files, split_size if count > 1 else None)
+    return [unit for unit in units if shard_of(unit.name, count) == index]
+
+
+def count_lines(unit: WorkUnit) -> int:
+    """Number of input lines of a work unit, read as score_file() reads them (from the
+    line index of plain files)."""
+    if unit.input_file.suffix not in COMPRESSION_EXTENSIONS:
+        first, last = LineIndex.load(unit.input_file).line_range(unit.byte_range)
+        return last - first
+    with open_input(unit.input_file, unit.byte_range) as f:
+        return sum(1 for _ in f)
+
+
+def count_rows(output_file: Path) -> int:
+    """Number of documents in an output file."""
+    output_format = columnar_format(output_file)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(output_file).metadata.num_rows
+    if output_format == "arrow":
+        import pyarrow as pa
+
+        with pa.memory_map(str(output_file)) as source:
+            return pa.ipc.open_file(source).read_all().num_rows
+    with io.TextIOWrapper(
+        open_binary_input(output_file), encoding="utf-8", newline=""
+    ) as f:
+        return sum(1 for _ in csv.reader(f)) - 1  # header
+
+
+def _merge_parts(parts: List[Path], output_file: Path) -> None:
+    """Concatenate the output files of the parts of a split file, in order."""
+    output_format = columnar_format(output_file)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(
+            output_file, pq.read_schema(parts[0]), compression="zstd"
+        ) as writer:
+            for part in parts:
+                writer.write_table(pq.read_table(part))
+    elif output_format == "arrow":
+        import pyarrow as pa
+
+        tables = [
+            pa.ipc.open_file(pa.memory_map(str(part))).read_all() for part in parts
+        ]
+        # A single dictionary for the whole file, as the file format cannot replace them
+        table = pa.concat_tables(tables).unify_dictionaries()
+        with pa.ipc.new_file(str(output_file), table.schema) as writer:
+            writer.write_table(table)
+    else:
+        with open_binary_output(output_file) as fout:
+            for n, part in enumerate(parts):
+                with open_binary_input(part) as fin:
+                    header = fin.readline()
+                    if n == 0:
+                        fout.write(header)
+                    shutil.copyfileobj(fin, fout)
+
+
+def merge_shards(
+    input_path: Path, output_path: Path, check_only: bool = False
+) -> List[str]:
+    """Verify the outputs of a sharded run (all the `--shard i/N` runs writing to
+    `output_path`) and merge the parts of the split files, so that `output_path` holds
+    what a single run would have written. Every input line must have been read by
+    exactly one finished work unit, and every output file must have as many rows as
+    documents its unit scored. Returns the problems found; nothing is merged if there is
+    any, or with `check_only`."""
+    output_path = Path(output_path)
+    manifests = [
+        RunManifest.read(path)
+        for path in sorted(output_path.glob(RunManifest.FILE_PATTERN))
+    ]
+    if not manifests:
+        return [f"No run manifests found in {output_path}"]
+    settings = {
+        key: value for key, value in manifests[0].settings.items() if key != "shard"
+    }
+    count = manifests[0].settings["shard"][1]
+    problems = []
+    by_shard: Dict[int, RunManifest] = {}
+    for manifest in manifests:
+        index, manifest_count = manifest.settings["shard"]
+        if {
+            key: value for key, value in manifest.settings.items() if key != "shard"
+        } != settings:
+            problems.append(
+                f"{manifest.path.name}: run with other settings than "
+                f"{manifests[0].path.name}"
+            )
+        elif manifest_count != count or index in by_shard:
+            problems.append(
+                f"{manifest.path.name}: unexpected shard {index}/{manifest_count}"
+            )
+        else:
+            by_shard[index] = manifest
+    problems.extend(
+        f"Shard {index}/{count}: no manifest"
+        for index in range(count)
+        if index not in by_shard
+    )
+    if problems:
+        return problems
+
+    extension = settings["extension"]
+    units = plan_units(
+        list_inputs(input_path), settings["split_size"] if count > 1 else None
+    )
+    expected = {unit.name for unit in units}
+    for index, manifest in by_shard.items():
+        problems.extend(
+            f"Shard {index}/{count}: {name} is not an input of this run"
+            for name in manifest.files
+            if name not in expected
+        )
+    for unit in units:
+        state = by_shard[shard_of(unit.name, count)].files.get(unit.name)
+        if state is None or not state["done"]:
+            problems.append(f"{unit.name}: not scored")
+            continue
+        n_lines = count_lines(unit)
+        if state["lines"] != n_lines:
+            problems.append(
+                f"{unit.name}: {state['lines']} lines scored, the input has {n_lines}"
+            )
+        output_file = output_path / unit.output_name(extension)
+        if not output_file.exists():
+            problems.append(f"{unit.name}: {output_file} not found")
+        elif count_rows(output_file) != state["documents"]:
+            problems.append(
+                f"{unit.name}: {output_file} does not have {state['documents']} rows"
+            )
+    if problems or check_only:
+        return problems
+
+    merged = RunManifest(
+        output_path / RunManifest.FILE_NAME,
+        {**settings, "shard": [0, 1], "split_size": None},
+    )
+    parts: Dict[Path, List[WorkUnit]] = {}
+    for unit in units:
+        if unit.part is None:
+            state = by_shard[shard_of(unit.name, count)].files[unit.name]
+            merged.files[unit.name] = state
+        else:
+            parts.setdefault(unit.input_file, []).append(unit)
+    for input_file, file_units in parts.items():
+        output_file = output_path / WorkUnit(input_file).output_name(extension)
+        logging.info(f"Merging {len(file_units)} parts into {output_file}")
+        _merge_parts(
+            [output_path / unit.output_name(extension) for unit in file_units],
+            output_file,
+        )
+        states = [
+            by_shard[shard_of(unit.name, count)].files[unit.name] for unit in file_units
+        ]
+        merged.files[input_file.name] = {
+            "lines": sum(state["lines"] for state in states),
+            "output_size": output_file.stat().st_size,
+            "documents": sum(state["documents"] for state in states),
+            "done": True,
+        }
+        for unit in file_units:
+            (output_path / unit.output_name(extension)).unlink()
+    # The merged outputs are those of a single run, which can also be checked (or
+    # resumed) later
+    merged.save()
+    for manifest in manifests:
+        if manifest.path != merged.path:
+            manifest.path.unlink()
+    return []
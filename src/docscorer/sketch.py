@@ -0,0 +1,159 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from docscorer.features import HASH_VERSION
+
+DEFAULT_SIZE = 64 << 20  # bytes of the table
+DEPTH = 4
+MAX_COUNT = np.iinfo(np.uint32).max  # counts saturate there instead of wrapping around
+
+
+class CountMinSketch:
+    """Fixed size count-min sketch of 64-bit hashes (see
+    CharClassifier.hash_segments()). estimate() never underestimates a count, and
+    overestimates it by more than e / width of the total count with a probability of at
+    most e^-depth, whatever the number of distinct hashes. Sketches with the same width,
+    depth and seed are merged by adding their tables, so the sketches of the shards (or
+    workers) of a corpus add up to the sketch of the whole corpus. Counts saturate at
+    MAX_COUNT. Sketches are saved with the HASH_VERSION of the hashes they count, and
+    sketches of other versions cannot be loaded: their hashes would not match those of
+    the segments.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        depth: int = DEPTH,
+        seed: int = 0,
+        table: Optional[np.ndarray] = None,
+    ):
+        if width < 2 or width & (width - 1) or depth < 1:
+            raise ValueError(
+                "The width must be a power of two (at least 2) and the depth "
+                f"positive: {width} {depth}"
+            )
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.bits = width.bit_length() - 1
+        # One odd multiplier per row: row i maps a hash h to the top bits of h *
+        # multipliers[i] (mod 2^64)
+        random = np.random.default_rng(seed)
+        self.multipliers = random.integers(
+            0, 1 << 63, size=depth, dtype=np.uint64
+        ) * np.uint64(2) + np.uint64(1)
+        self.table = (
+            np.zeros((depth, width), dtype=np.uint32) if table is None else table
+        )
+
+    @classmethod
+    def with_size(
+        cls, size: int = DEFAULT_SIZE, depth: int = DEPTH, seed: int = 0
+    ) -> "CountMinSketch":
+        """The widest sketch whose table takes at most `size` bytes."""
+        width = max(size // (4 * depth), 2)
+        return cls(1 << (width.bit_length() - 1), depth, seed)
+
+    @property
+    def total(self) -> int:
+        """Number of hashes added."""
+        return int(self.table[0].sum(dtype=np.uint64))
+
+    def _cells(self, hashes: np.ndarray) -> np.ndarray:
+        """Flat table index of every hash in every row, as a (depth, hashes) array."""
+        rows = (
+            hashes.astype(np.uint64)[None, :] * self.multipliers[:, None]
+        ) >> np.uint64(64 - self.bits)
+        return (
+            rows.astype(np.int64)
+            + np.arange(self.depth, dtype=np.int64)[:, None] * self.width
+        )
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Count every hash once (repeated hashes are counted as many times as they
+        appear)."""
+        if len(hashes) == 0:
+            return
+        cells, counts = np.unique(self._cells(hashes), return_counts=True)
+        flat = self.table.reshape(-1)
+        flat[cells] = np.minimum(
+            flat[cells].astype(np.uint64) + counts.astype(np.uint64), MAX_COUNT
+        )
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        """Estimated count of every hash."""
+        return self.table.reshape(-1)[self._cells(hashes)].min(axis=0)
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """Add the counts of `other`, a sketch with the same width, depth and seed."""
+        if (other.width, other.depth, other.seed) != (
+            self.width,
+            self.depth,
+            self.seed,
+        ):
+            raise ValueError(
+                f"Cannot merge a {other.depth}x{other.width} sketch (seed "
+                f"{other.seed}) "
+                f"into a {self.depth}x{self.width} one (seed {self.seed})"
+            )
+        # Added by rows, so the uint64 sums take the memory of a row only
+        for row, other_row in zip(self.table, other.table, strict=True):
+            np.minimum(
+                row.astype(np.uint64) + other_row, MAX_COUNT, out=row, casting="unsafe"
+            )
+
+    def save(self, path: Path) -> None:
+        """Save to a .npz file, written to a temporary file and renamed so it is never
+        read half written."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    table=self.table,
+                    seed=np.int64(self.seed),
+                    hash_version=np.int64(HASH_VERSION),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> "CountMinSketch":
+        with np.load(path) as data:
+            # Sketches saved before the version was recorded are of version 1
+            hash_version = int(data["hash_version"]) if "hash_version" in data else 1
+            if hash_version != HASH_VERSION:
+                raise ValueError(
+                    f"{path} counts segment hashes of version {hash_version}, but they "
+                    "are now of version "
+                    f"{HASH_VERSION}: build it again with the sketch command"
+                )
+            table = data["table"]
+            return cls(table.shape[1], table.shape[0], int(data["seed"]), table)
+
+
+def document_hashes(
+    hashes: np.ndarray, lengths: np.ndarray, offsets: np.ndarray, min_length: int
+) -> np.ndarray:
+    """The distinct hashes of every document (whose segments are at [offsets[i],
+    offsets[i + 1])), of the segments of at least `min_length` chars: added to a sketch,
+    it counts the documents of every segment.
+    """
+    documents = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    kept = lengths >= min_length
+    hashes = hashes[kept]
+    documents = documents[kept]
+    order = np.lexsort((hashes, documents))
+    hashes = hashes[order]
+    documents = documents[order]
+    first = np.ones(len(hashes), dtype=bool)
+    first[1:] = (hashes[1:] != hashes[:-1]) | (documents[1:] != documents[:-1])
+    return hashes[first]
@@ -0,0 +1,176 @@
+from collections import Counter
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+import zstandard
+
+from docscorer.utils import remove_delimitators
+
+if TYPE_CHECKING:
+    from docscorer.docscorer import DocumentScorer
+
+
+class StreamingDocumentScorer:
+    """Scores a document given one segment (a line of its text) at a time, without
+    keeping its text: only the feature counts of every segment, the occurrences of every
+    distinct segment (by hash), the url counts and a zstd compressor for the
+    informativeness score.
+    finish() returns the score_document() output of the document made of the segments
+    joined with "\\n", and their languages as `lang_segments` (without the text, with
+    text_in_output). zstd compresses small inputs with parameters that depend on their
+    size, so the (normalized) text is only buffered up to EXACT_COMPRESSION_SIZE bytes,
+    and compressed at once as InformativenessScorer does. Larger documents are
+    compressed as a stream: their compressed size can differ by a few bytes, far below
+    the rounding of the compression ratio (0.1%)."""
+
+    # Window size of the default zstd level: the parameters of larger inputs do not
+    # depend on their size
+    EXACT_COMPRESSION_SIZE = 1 << 21
+
+    def __init__(
+        self, scorer: "DocumentScorer", ref_lang: str, ref_script: str, doc_id: str = ""
+    ):
+        self.scorer = scorer
+        self.ref_script = ref_script.lower()
+        self.doc_id = doc_id
+        self.profile = scorer.config.get_profile(
+            f"{ref_lang.lower()}_{self.ref_script}"
+        )
+        self.lang_segments: List[str] = []
+        self.word_chars: List[int] = []
+        self.punctuation_chars: List[int] = []
+        self.singular_chars: List[int] = []
+        self.numbers: List[int] = []
+        self.occurrences: Counter[int] = (
+            Counter()
+        )  # segments longer than 4 chars, for RepeatedScorer
+        self.www = 0
+        self.http = 0
+        # With a sketch, for CorpusRepeatedScorer
+        self.segment_hashes: List[int] = []
+        self.segment_lengths: List[int] = []
+        self._buffer = bytearray()
+        self._compressor: Optional[zstandard.ZstdCompressionObj] = None
+        self.raw_weight = 0
+        self.compressed_weight = 0
+        self._finished = False
+
+    def add_segment(self, segment: str, lang: str) -> None:
+        """Add the next segment of the document and its language."""
+        if self._finished:
+            raise ValueError("The document is already finished")
+        if "\n" in segment:
+            raise ValueError("Segments cannot contain line breaks, add them one by one")
+        counts, hashes, _ = self.scorer.char_counter.features(segment)
+        word_chars, punctuation_chars, singular_chars, numbers = counts[0].tolist()
+        segment_hash = int(hashes[0])
+        self.word_chars.append(word_chars)
+        self.punctuation_chars.append(punctuation_chars)
+        self.singular_chars.append(singular_chars)
+        self.numbers.append(numbers)
+        self.lang_segments.append(lang.lower())
+
+        if len(segment) > 4:
+            self.occurrences[segment_hash] += 1
+        if self.scorer.corpus_repeated_scorer is not None:
+            self.segment_hashes.append(segment_hash)
+            self.segment_lengths.append(len(segment))
+        # "www" and "http" cannot span two segments
+        self.www += segment.count("www")
+        self.http += segment.count("http")
+        data = self.scorer.info_scorer.normalize(segment).encode(
+            "utf-8", "surrogatepass"
+        )
+        if len(self.word_chars) > 1:
+            data = b"\n" + data
+        self.raw_weight += len(data)
+        if self._compressor is not None:
+            self.compressed_weight += len(self._compressor.compress(data))
+            return
+        self._buffer += data
+        if len(self._buffer) > self.EXACT_COMPRESSION_SIZE:
+            # Each stream has its own compressor, a ZstdCompressor runs one operation at
+            # a time
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+            self.compressed_weight += len(
+                self._compressor.compress(bytes(self._buffer))
+            )
+            self._buffer = bytearray()
+
+    def finish(self, raw_score: bool = False) -> float | List[float | str]:
+        """Score the document (see score_document()). No segments can be added after
+        it."""
+        if not self._finished:
+            if not self.word_chars:
+                # As an empty text: one empty segment, without segment languages
+                self.add_segment("", "")
+                self.lang_segments = []
+            if self._compressor is None:
+                self.compressed_weight = len(
+                    zstandard.ZstdCompressor().compress(bytes(self._buffer))
+                )
+                self._buffer = bytearray()
+            else:
+                self.compressed_weight += len(self._compressor.flush())
+            self._finished = True
+
+        scorer = self.scorer
+        profile = self.profile
+        word_chars = self.word_chars
+        num_word_chars = sum(word_chars)
+        num_punctuation_chars = sum(
+            remove_delimitators(
+                punct_chars=self.punctuation_chars,
+                word_chars=word_chars,
+                number_chars=self.numbers,
+            )
+        )
+        subscores = {
+            "language": lambda: scorer.lang_scorer.score(
+                profile, self.lang_segments, word_chars, self.doc_id
+            ),
+            "punctuation": lambda: scorer.punct_scorer.score(
+                profile=profile,
+                num_punctuation_chars=num_punctuation_chars,
+                num_word_chars=num_word_chars,
+                punct_chars=self.punctuation_chars,
+                word_chars=word_chars,
+            ),
+            "singular_chars": lambda: scorer.singular_chars_scorer.score(
+                profile,
+                sum(self.singular_chars),
+                num_word_chars,
+                self.singular_chars,
+                word_chars,
+            ),
+            "numbers": lambda: scorer.numbers_scorer.score(
+                profile, sum(self.numbers), num_word_chars, self.numbers, word_chars
+            ),
+            "repeated": lambda: scorer.repeated_scorer.score_occurrences(
+                self.occurrences.values()
+            ),
+            "url": lambda: scorer.url_scorer.score_count(
+                profile, max(self.www, self.http), word_chars
+            ),
+            "long_segments": lambda: scorer.long_text_scorer.score(
+                profile, self.lang_segments, word_chars
+            ),
+            "informativeness": lambda: scorer.info_scorer.score_compressed(
+                self.raw_weight, self.compressed_weight, self.ref_script
+            ),
+            "short_segments": lambda: scorer.short_segments_scorer.score(
+                profile, word_chars
+            ),
+        }
+        # With early_exit, the subscores stop as in score_document() (the text is
+        # already compressed, so this only saves the cheaper subscores)
+        scores = scorer._run_subscores(subscores)
+        corpus_repeated = None
+        if scorer.corpus_repeated_scorer is not None:
+            corpus_repeated = scorer.corpus_repeated_scorer.score(
+                np.array(self.segment_hashes, dtype=np.uint64),
+                np.array(self.segment_lengths, dtype=np.int64),
+            )
+        return scorer._format_output(
+            scorer._overall_score(scores), scores, "", raw_score, corpus_repeated
+        )
@@ -0,0 +1,153 @@
+import gzip
+import io
+import lzma
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, List, Optional, TextIO, Tuple, Union
+
+INPUT_EXTENSION = ".jsonl"
+ZSTD_EXTENSION = ".zst"
+# Compressed inputs are decompressed on the fly, without temporary files
+COMPRESSION_EXTENSIONS = (ZSTD_EXTENSION, ".gz", ".xz")
+ZSTD_LEVEL = 3
+# zstd windows up to 2 GB (--long=31), used by some crawl dumps
+ZSTD_MAX_WINDOW_SIZE = 1 << 31
+
+
+def input_stem(path: Path) -> Optional[str]:
+    """Name of an input file without the .jsonl and compression extensions
+    ("a.jsonl.zst" -> "a"), None if it is not a (compressed) .jsonl file."""
+    name = path.name
+    for extension in COMPRESSION_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[: -len(extension)]
+            break
+    if not name.endswith(INPUT_EXTENSION):
+        return None
+    return name[: -len(INPUT_EXTENSION)]
+
+
+class LineRange:
+    """Lines (as text) of a plain file that start in the byte range [start, end). A line
+    that starts before `start` belongs to the previous range, so consecutive ranges
+    split a file at line boundaries and every line is read by exactly one of them."""
+
+    def __init__(self, path: Path, start: int, end: int):
+        self.start = start
+        self.end = end
+        self._file: BinaryIO = open(path, "rb")
+
+    def __iter__(self) -> Iterator[str]:
+        f = self._file
+        if self.start > 0:
+            f.seek(self.start - 1)
+            if f.read(1) != b"\n":
+                f.readline()  # rest of a line of the previous range
+        position = f.tell()
+        while position < self.end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode("utf-8")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "LineRange":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def list_inputs(input_path: Path) -> List[Path]:
+    """The (compressed) .jsonl files of a directory, sorted by name, or the file
+    itself."""
+    input_path = Path(input_path)
+    if input_path.is_file():
+        return [input_path]
+    return sorted(
+        path
+        for path in input_path.iterdir()
+        if path.is_file() and input_stem(path) is not None
+    )
+
+
+def open_binary_input(path: Path) -> BinaryIO:
+    """Open a file for reading as bytes, decompressing .zst, .gz and .xz files as a
+    stream."""
+    path = Path(path)
+    if path.suffix == ZSTD_EXTENSION:
+        import zstandard
+
+        decompressor = zstandard.ZstdDecompressor(max_window_size=ZSTD_MAX_WINDOW_SIZE)
+        # read_across_frames: files made of several concatenated frames are read to the
+        # end
+        reader = decompressor.stream_reader(
+            open(path, "rb"), read_across_frames=True, closefd=True
+        )
+        return io.BufferedReader(reader)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")  # type: ignore[return-value]
+    if path.suffix == ".xz":
+        return lzma.open(path, "rb")  # type: ignore[return-value]
+    return open(path, "rb")
+
+
+def open_input(
+    path: Path, byte_range: Optional[Tuple[int, int]] = None
+) -> Union[TextIO, LineRange]:
+    """Open a .jsonl file for reading as text, decompressing .zst, .gz and .xz files as
+    a stream. Lines end at "\n" only, as in LineRange and LineIndex, so every reader
+    splits a file into the same lines. With a `byte_range`, only the lines that start in
+    it are read (plain files only)."""
+    if byte_range is not None:
+        if Path(path).suffix in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Compressed files cannot be read by byte ranges: {path}")
+        return LineRange(path, *byte_range)
+    return io.TextIOWrapper(open_binary_input(path), encoding="utf-8", newline="\n")
+
+
+def open_binary_output(
+    path: Path, buffering: int = -1, append: bool = False
+) -> BinaryIO:
+    """Open a file for writing bytes, zstd-compressed as a stream if its name ends with
+    .zst. With `append`, the output is added at the end of the file (as new zstd
+    frames)."""
+    path = Path(path)
+    mode = "ab" if append else "wb"
+    if path.suffix == ZSTD_EXTENSION:
+        import zstandard
+
+        writer = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+            open(path, mode), closefd=True
+        )
+        return io.BufferedWriter(
+            writer, buffering if buffering > 0 else io.DEFAULT_BUFFER_SIZE
+        )
+    return open(path, mode, buffering=buffering)
+
+
+def open_output(path: Path, buffering: int = -1, append: bool = False) -> TextIO:
+    """Open a text file for writing (csv newlines), zstd-compressed as a stream if its
+    name ends with .zst. With `append`, the output is added at the end of the file (as
+    new zstd frames)."""
+    return io.TextIOWrapper(
+        open_binary_output(path, buffering, append), encoding="utf-8", newline=""
+    )
+
+
+def sync_output(stream: TextIO) -> int:
+    """Flush a stream opened with open_output() to the disk and return the size of the
+    file. zstd streams end the current frame, so the file is a complete zstd file up to
+    that size.
+    """
+    stream.flush()
+    raw = stream.buffer.raw  # type: ignore[attr-defined]
+    if not isinstance(raw, io.FileIO):  # zstd stream writer
+        import zstandard
+
+        raw.flush(zstandard.FLUSH_FRAME)
+    os.fsync(stream.fileno())
+    return os.fstat(stream.fileno()).st_size
@@ -1,5 +1,11 @@
 import re
-from typing import List
+from typing import List, Tuple
+
+
+def parse_utf_block(block: str) -> Tuple[int, int]:
+    """First and last code points of a "XXXX-YYYY" block of char_patterns.json."""
+    start, end = block.split("-")
+    return int(start, 16), int(end, 16)
 
 
 def join_utf_blocks(u_list: List[str], inverse: bool = False) -> re.Pattern[str]:
@@ -0,0 +1,133 @@
+import json
+import os
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from docscorer import DocumentScorer, ScorerConfiguration
+
+# Paragraphs of the test corpus, by document language
+PARAGRAPHS = {
+    "eng_Latn": [
+        "The city council met on Tuesday to discuss the new budget for public "
+        "transport, which includes more buses and longer opening hours for stations.",
+        "Researchers at the university found that students who sleep at least eight "
+        "hours a night remember more of what they learn during the day.",
+        "If you are planning a trip to the mountains this winter, check the weather "
+        "forecast before leaving and always tell someone where you are going.",
+        "The museum reopened after two years of renovation work, with new rooms for "
+        "its collection of medieval manuscripts and a larger library.",
+    ],
+    "spa_Latn": [
+        "El ayuntamiento aprobó ayer el nuevo plan de movilidad, que prevé más "
+        "carriles para bicicletas y una red de autobuses eléctricos en el centro.",
+        "Los investigadores han descubierto que el consumo de agua en las ciudades "
+        "ha bajado un diez por ciento durante la última década.",
+        "¿Quieres aprender a cocinar platos tradicionales? Nuestro curso empieza en "
+        "octubre y las plazas son limitadas, así que no esperes demasiado.",
+    ],
+    "rus_Cyrl": [
+        "Вчера в городе открылась новая библиотека, в которой собрано более ста "
+        "тысяч книг на разных языках, а также большой читальный зал.",
+        "Учёные считают, что изменение климата уже влияет на урожайность пшеницы "
+        "в южных регионах страны, и предлагают новые сорта.",
+    ],
+    "zho_Hans": [
+        "昨天市政府宣布了新的公共交通计划，包括增加公交线路和延长地铁运营时间。",
+        "研究人员发现，每天坚持阅读半小时的学生，在考试中的成绩明显更好。",
+    ],
+    "ell_Grek": [
+        "Το δημοτικό συμβούλιο ενέκρινε χθες το νέο σχέδιο για τις δημόσιες "
+        "συγκοινωνίες, με περισσότερα λεωφορεία και νέες στάσεις στο κέντρο.",
+    ],
+}
+# Segments found in any document: URLs, numbers, symbols, boilerplate, lines without
+# word characters, empty lines and a very long segment
+NOISE = [
+    ("www.example.com http://example.com/a/b?c=d", "eng_Latn"),
+    ("1234 5678 91011 2024-01-02 +34 600 000 000", "und_Zyyy"),
+    ("#### *** @@@ ~~~ ||| 😀😀😀 𝔘𝔫𝔦𝔠𝔬𝔡𝔢", "und_Zyyy"),
+    ("Home | About | Contact", "eng_Latn"),
+    ("Menu", "eng_Latn"),
+    ("---------", "und_Zyyy"),
+    ("", "eng_Latn"),
+    ("   ", "eng_Latn"),
+    (
+        "Cookie policy: we use cookies to improve your experience. Accept all.",
+        "eng_Latn",
+    ),
+    ("สวัสดีครับ ยินดีต้อนรับ", "tha_Thai"),
+    ("هذا نص باللغة العربية.", "arb_Arab"),
+    ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40, "lat_Latn"),
+]
+
+
+def make_records(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n` jsonl records of varied documents, in several languages and scripts. Some
+    are duplicates (with other ids) of earlier ones, some have an empty text or a
+    single segment, some repeat their segments or are mostly boilerplate."""
+    rng = random.Random(seed)
+    records: List[Dict[str, Any]] = []
+    for i in range(n):
+        if records and rng.random() < 0.1:
+            records.append(dict(rng.choice(records), id=i))
+            continue
+        lang = rng.choice(list(PARAGRAPHS))
+        # Paragraphs and pairs of them, so segments only repeat when they are meant to
+        paragraphs = PARAGRAPHS[lang]
+        pool = [*paragraphs, *(f"{a} {b}" for a in paragraphs for b in paragraphs)]
+        segments = [
+            (text, lang) for text in rng.sample(pool, min(rng.randint(0, 8), len(pool)))
+        ]
+        for _ in range(rng.choice([0, 0, 1, 2, 5, 20])):
+            segments.insert(rng.randint(0, len(segments)), rng.choice(NOISE))
+        if segments and rng.random() < 0.2:  # repeated within the document
+            segments += segments[: rng.randint(1, len(segments))]
+        if rng.random() < 0.1:  # an unknown language, or another one
+            lang = rng.choice(["xyz_Latn", "kor_Hang", *PARAGRAPHS])
+        records.append(
+            {
+                "id": i,
+                "lang": [lang, "eng_Latn"] if rng.random() < 0.5 else lang,
+                "seg_langs": [seg_lang for _, seg_lang in segments],
+                "text": "\n".join(text for text, _ in segments),
+            }
+        )
+    return records
+
+
+def write_jsonl(path: Path, records: List[Dict[str, Any]]) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+@pytest.fixture(scope="session", autouse=True)
+def config_cache(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    """Configuration snapshots go to a temporary directory, not to the user cache."""
+    directory = tmp_path_factory.mktemp("config_cache")
+    previous = os.environ.get(ScorerConfiguration.CACHE_DIR_ENV)
+    os.environ[ScorerConfiguration.CACHE_DIR_ENV] = str(directory)
+    yield directory
+    if previous is None:
+        del os.environ[ScorerConfiguration.CACHE_DIR_ENV]
+    else:
+        os.environ[ScorerConfiguration.CACHE_DIR_ENV] = previous
+
+
+@pytest.fixture(scope="session")
+def scorer() -> DocumentScorer:
+    return DocumentScorer()
+
+
+@pytest.fixture(scope="session")
+def records() -> List[Dict[str, Any]]:
+    return make_records(400)
+
+
+@pytest.fixture(scope="session")
+def documents(scorer: DocumentScorer, records: List[Dict[str, Any]]) -> List[Any]:
+    return [scorer._parse_record(record) for record in records]
@@ -0,0 +1,97 @@
+import itertools
+import math
+from typing import Any, List
+
+import numpy as np
+import pytest
+
+from docscorer import DocumentScorer
+from docscorer.scorers.utils import round_values
+
+
+def normalized(output: Any) -> Any:
+    """A score_document() output with NaN as None, so outputs compare equal."""
+    if isinstance(output, list):
+        return [normalized(value) for value in output]
+    if isinstance(output, float) and math.isnan(output):
+        return None
+    return output
+
+
+def score_in_batches(
+    scorer: DocumentScorer, documents: List[Any], raw_score: bool
+) -> List[Any]:
+    """score_batch() outputs of the documents, scored in batches of several sizes."""
+    outputs: List[Any] = []
+    sizes = itertools.cycle([1, 97, 3, 250, 2])
+    while len(outputs) < len(documents):
+        batch = documents[len(outputs) : len(outputs) + next(sizes)]
+        outputs += scorer.score_batch(batch, raw_score)
+    return outputs
+
+
+@pytest.mark.parametrize("raw_score", [False, True])
+def test_batch_matches_score_document(
+    scorer: DocumentScorer, documents: List[Any], raw_score: bool
+) -> None:
+    single = [scorer.score_document(*document, raw_score) for document in documents]
+    batch = score_in_batches(scorer, documents, raw_score)
+    assert normalized(batch) == normalized(single)
+
+
+def test_batch_edge_documents(scorer: DocumentScorer) -> None:
+    documents = [
+        ("eng", "Latn", [], "", "empty"),
+        ("eng", "Latn", ["eng_Latn"] * 5, "\n\n\n\n", "empty_lines"),
+        ("eng", "Latn", ["eng_Latn"], "A single segment.", "single"),
+        ("xxx", "Zzzz", ["und_Zyyy"], "-------", "no_word_chars"),
+        ("tha", "Thai", ["tha_Thai"], "สวัสดีครับ ยินดีต้อนรับ", "thai"),
+        (
+            "eng",
+            "Latn",
+            ["eng_Latn", "rus_Cyrl"],
+            "Mixed text.\nСмешанный текст.",
+            "mix",
+        ),
+        ("eng", "Latn", ["eng_Latn"], "😀 𝔘𝔫𝔦𝔠𝔬𝔡𝔢 \ud800", "non_bmp"),
+    ]
+    for raw_score in (False, True):
+        single = [scorer.score_document(*document, raw_score) for document in documents]
+        assert normalized(scorer.score_batch(documents, raw_score)) == normalized(
+            single
+        )
+    assert scorer.score_batch([]) == []
+
+
+def test_batch_output_types(scorer: DocumentScorer, documents: List[Any]) -> None:
+    # Python floats, as score_document() returns, not numpy scalars
+    for output in scorer.score_batch(documents[:20]):
+        assert all(type(value) is float for value in output)
+    assert all(
+        type(value) is float for value in scorer.score_batch(documents[:20], True)
+    )
+
+
+def test_halfway_subscores_round_like_python(scorer: DocumentScorer) -> None:
+    # 19 singular chars ("#") per 1000 word chars: a singular_chars subscore of 0.925,
+    # which is slightly above 0.925 as a float. The scores round it like round(), to
+    # 0.93, where numpy's rounding (of 92.5, to even) gave 0.92 before batch scoring.
+    words = []
+    for k in range(100):
+        words.append("abcdefghij")
+        if k % 5 == 0 and words.count("#") < 19:
+            words.append("#")
+    lines = [" ".join(words[i : i + 12]) for i in range(0, len(words), 12)]
+    document = ("xyz", "Latn", ["xyz_Latn"] * len(lines), "\n".join(lines), "halfway")
+    scores = scorer._compute_scores(
+        profile=scorer.config.get_profile("xyz_latn"),
+        lang_segments=["xyz_latn"] * len(lines),
+        document_text=document[3],
+        ref_script="latn",
+        doc_id="halfway",
+        features=scorer._extract_features(document[3]),
+    )
+    assert scores.singular_chars == 0.925
+    assert scorer.score_document(*document, False)[4] == 0.93
+    assert scorer.score_batch([document])[0][4] == 0.93
+    assert round_values(np.array([0.925]), 2).tolist() == [0.93]
@@ -0,0 +1,92 @@
+import csv
+import importlib.util
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from docscorer import DocumentScorer, ScorerConfiguration
+from docscorer.decoders import DECODERS, get_decoder
+
+INSTALLED_DECODERS = [
+    name
+    for name, package in [
+        ("json", "json"),
+        ("orjson", "orjson"),
+        ("msgspec", "msgspec"),
+        ("simdjson", "simdjson"),
+    ]
+    if importlib.util.find_spec(package) is not None
+]
+RECORD = '"lang": "eng_Latn", "seg_langs": ["eng_Latn"], "text": "Some text."'
+
+# (line, parsed document or None if the record is skipped)
+EDGE_RECORDS = [
+    (
+        '{"id": 1, ' + RECORD + ', "scores": [0.5], "url": "http://x"}',
+        ("eng", "Latn", ["eng_Latn"], "Some text.", "1"),
+    ),
+    ('{"id": null, ' + RECORD + "}", ("eng", "Latn", ["eng_Latn"], "Some text.", "")),
+    ('{"id": "a", ' + RECORD + "}", ("eng", "Latn", ["eng_Latn"], "Some text.", "a")),
+    (
+        '{"id": 2, "lang": ["spa_Latn", "eng_Latn"], "seg_langs": [], "text": ""}',
+        ("spa", "Latn", [], "", "2"),
+    ),
+    # A surrogate pair, an escaped backslash and non-BMP text are fine
+    (
+        '{"id": 3, "lang": "eng_Latn", "seg_langs": ["eng_Latn"], '
+        '"text": "\\ud83d\\ude00 \\\\ud800 \U0001d518"}',
+        ("eng", "Latn", ["eng_Latn"], "\U0001f600 \\ud800 \U0001d518", "3"),
+    ),
+    # Lone surrogates are malformed text, wherever they are
+    ('{"id": 4, "lang": "eng_Latn", "seg_langs": [], "text": "a\\ud800b"}', None),
+    ('{"id": 5, "lang": "eng_Latn", "seg_langs": [], "text": "a\\udc00"}', None),
+    ('{"id": 6, "lang": "eng_Latn", "seg_langs": [], "text": "\\ud800"}', None),
+    ('{"id": 7, ' + RECORD + ', "url": "\\uD800\\u0041"}', None),
+    # Fields of the wrong type or missing, and invalid JSON
+    ('{"id": 8, "lang": 3, "seg_langs": [], "text": "a"}', None),
+    ('{"id": 9, "lang": [], "seg_langs": [], "text": "a"}', None),
+    ('{"id": 10, "lang": [3], "seg_langs": [], "text": "a"}', None),
+    ('{"id": 11, "lang": "eng_Latn", "seg_langs": [3], "text": "a"}', None),
+    ('{"id": 12, "lang": "eng_Latn", "seg_langs": "eng_Latn", "text": "a"}', None),
+    ('{"id": 13, "lang": "eng_Latn", "seg_langs": [], "text": 3}', None),
+    ('{"id": 14, "lang": "eng_Latn", "seg_langs": []}', None),
+    ('{"lang": "eng_Latn", "seg_langs": [], "text": "a"}', None),
+    ('{"id": 15, "lang": "eng_Latn", "seg_langs": [], "text": "a"', None),
+    ("not json", None),
+]
+
+
+@pytest.mark.parametrize("name", INSTALLED_DECODERS)
+@pytest.mark.parametrize("line, expected", EDGE_RECORDS)
+def test_decoders_parse_records_alike(name: str, line: str, expected: Any) -> None:
+    decode = get_decoder(name)
+    for encoded in (line, line.encode("utf-8")):
+        try:
+            document = DocumentScorer._parse_record(decode(encoded))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            document = None
+        assert document == expected
+
+
+def test_decoders_write_the_same_rows(tmp_path: Path) -> None:
+    (tmp_path / "input").mkdir()
+    with open(tmp_path / "input" / "edge.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(f"{line}\n" for line, _ in EDGE_RECORDS)
+    outputs = {}
+    for name in INSTALLED_DECODERS:
+        scorer = DocumentScorer(ScorerConfiguration({"--json_decoder": name}))
+        scorer.score_directory(tmp_path / "input", tmp_path / name)
+        with open(tmp_path / name / "edge.csv", encoding="utf-8", newline="") as f:
+            outputs[name] = list(csv.reader(f))
+    # The records skipped by one decoder are skipped by all, and a null id is empty
+    expected_ids = [document[4] for _, document in EDGE_RECORDS if document]
+    assert [row[0] for row in outputs["json"][1:]] == expected_ids
+    for name in INSTALLED_DECODERS:
+        assert outputs[name] == outputs["json"], name
+
+
+def test_unknown_decoder() -> None:
+    with pytest.raises(ValueError, match="Unknown JSON decoder"):
+        get_decoder("yaml")
+    assert set(INSTALLED_DECODERS) <= set(DECODERS)
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from conftest import write_jsonl
+from test_batch import normalized
+
+from docscorer import DocumentScorer
+
+
+@pytest.fixture(scope="module")
+def duplicated_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The first records, and copies of them with other ids inserted at random
+    positions."""
+    rng = random.Random(1)
+    duplicated = [dict(record, id=f"r{i}") for i, record in enumerate(records[:60])]
+    for i in range(120):
+        original = rng.randrange(60)
+        duplicated.insert(
+            rng.randint(0, len(duplicated)),
+            dict(records[original], id=f"d{i}-{original}"),
+        )
+    return duplicated
+
+
+def original(record: Dict[str, Any]) -> str:
+    """Id of the record a duplicate was made from."""
+    return record["id"] if record["id"][0] == "r" else f"r{record['id'].split('-')[1]}"
+
+
+def test_batch_duplicates_keep_their_order_and_ids(
+    scorer: DocumentScorer, duplicated_records: List[Dict[str, Any]]
+) -> None:
+    documents = [scorer._parse_record(record) for record in duplicated_records]
+    before = scorer._duplicates
+    outputs = scorer.score_batch(documents)
+    assert scorer._duplicates - before == len(documents) - len(
+        {(doc[0], doc[1], tuple(doc[2]), doc[3]) for doc in documents}
+    )
+    single = [scorer.score_document(*document, False) for document in documents]
+    assert normalized(outputs) == normalized(single)
+    # The same scores as the record they duplicate
+    by_id = dict(zip([document[4] for document in documents], outputs, strict=True))
+    for record in duplicated_records:
+        assert normalized(by_id[record["id"]]) == normalized(by_id[original(record)])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_output_rows_keep_the_input_order_and_ids(
+    scorer: DocumentScorer,
+    duplicated_records: List[Dict[str, Any]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    workers: int,
+) -> None:
+    # Duplicates in the same chunk and in other chunks
+    monkeypatch.setattr(DocumentScorer, "CHUNK_SIZE", 32)
+    (tmp_path / "input").mkdir()
+    write_jsonl(tmp_path / "input" / "a.jsonl", duplicated_records)
+    scorer.score_directory(tmp_path / "input", tmp_path / "output", workers)
+    with open(tmp_path / "output" / "a.csv", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    assert [row[0] for row in rows] == [record["id"] for record in duplicated_records]
+    by_id = {row[0]: row[1:] for row in rows}
+    for record in duplicated_records:
+        assert by_id[record["id"]] == by_id[original(record)]
+
+
+def test_filter_keeps_the_input_order_and_ids(
+    scorer: DocumentScorer, duplicated_records: List[Dict[str, Any]]
+) -> None:
+    lines = [json.dumps(record, ensure_ascii=False) for record in duplicated_records]
+    fout = io.StringIO()
+    scorer.filter_stream(lines, fout, min_score=0.0)
+    written = [json.loads(line) for line in fout.getvalue().splitlines()]
+    assert [record["id"] for record in written] == [
+        record["id"] for record in duplicated_records
+    ]
+    by_id = {record["id"]: record for record in written}
+    for record in written:
+        assert record["wds_score"] == by_id[original(record)]["wds_score"]
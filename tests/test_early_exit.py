@@ -0,0 +1,69 @@
+from typing import Any, List
+
+import pytest
+from test_batch import normalized, score_in_batches
+
+from docscorer import DocumentScorer, ScorerConfiguration
+
+# Short segments subscore of NaN (no word characters in any segment), which must not
+# stop the scoring of the document
+NAN_DOCUMENT = (
+    "eng",
+    "Latn",
+    ["eng_Latn"] * 6,
+    "-----\n12345\n#####\n!!!\n...\n?!?!",
+    "nan_short_segments",
+)
+
+
+@pytest.fixture(scope="module")
+def early_scorer() -> DocumentScorer:
+    return DocumentScorer(ScorerConfiguration({"--early_exit": True}))
+
+
+@pytest.fixture(scope="module")
+def early_documents(documents: List[Any]) -> List[Any]:
+    return [*documents, NAN_DOCUMENT, ("eng", "Latn", [], "", "empty")]
+
+
+@pytest.mark.parametrize("raw_score", [False, True])
+def test_early_exit_batch_matches_score_document(
+    early_scorer: DocumentScorer, early_documents: List[Any], raw_score: bool
+) -> None:
+    single = [
+        early_scorer.score_document(*document, raw_score)
+        for document in early_documents
+    ]
+    batch = score_in_batches(early_scorer, early_documents, raw_score)
+    assert normalized(batch) == normalized(single)
+
+
+def test_early_exit_keeps_the_overall_score(
+    scorer: DocumentScorer, early_scorer: DocumentScorer, early_documents: List[Any]
+) -> None:
+    full = scorer.score_batch(early_documents)
+    early = early_scorer.score_batch(early_documents)
+    assert [output[0] for output in early] == [output[0] for output in full]
+    # Subscores are only missing from the documents that were stopped early
+    assert any(output[1:] != full[i][1:] for i, output in enumerate(early))
+    for output, full_output in zip(early, full, strict=True):
+        if full_output[0] > 0:
+            assert output == full_output
+    nan_document = normalized(early_scorer.score_document(*NAN_DOCUMENT, False))
+    assert nan_document[5] is not None  # numbers, computed after short segments
+
+
+def test_early_exit_stream_matches_score_document(
+    early_scorer: DocumentScorer, early_documents: List[Any]
+) -> None:
+    for ref_lang, ref_script, langs, text, doc_id in early_documents:
+        segments = text.split("\n") if text else []
+        if len(segments) != len(langs):
+            continue
+        stream = early_scorer.stream_document(ref_lang, ref_script, doc_id)
+        for segment, lang in zip(segments, langs, strict=True):
+            stream.add_segment(segment, lang)
+        expected = early_scorer.score_document(
+            ref_lang, ref_script, langs, text, doc_id, False
+        )
+        assert normalized(stream.finish()) == normalized(expected), doc_id
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Set
+
+import pytest
+
+from docscorer import DocumentScorer, ScorerConfiguration
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "joblib", "zstandard", "multiprocessing")
+
+# module -> heavy modules that importing it must not load
+FORBIDDEN_MODULES = {
+    "docscorer": HEAVY_MODULES,
+    "docscorer.cli": HEAVY_MODULES,
+    "docscorer.configuration": ("pandas", "scipy", "joblib", "multiprocessing"),
+    "docscorer.docscorer": ("pandas", "scipy", "joblib", "multiprocessing"),
+}
+
+
+def loaded_modules(code: str) -> Set[str]:
+    """Top-level names of the modules loaded by running `code` in a new interpreter."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SRC_PATH), env.get("PYTHONPATH")])
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {name.split(".")[0] for name in process.stdout.split()}
+
+
+@pytest.mark.parametrize("module", FORBIDDEN_MODULES)
+def test_import_does_not_load_heavy_modules(module: str) -> None:
+    loaded = loaded_modules(f"import {module}")
+    assert module.split(".")[0] in loaded
+    assert [name for name in FORBIDDEN_MODULES[module] if name in loaded] == []
+
+
+def test_configuration_snapshot_does_not_load_pandas(scorer: DocumentScorer) -> None:
+    # The session scorer saved the snapshot: later configurations load it instead of
+    # building the tables with pandas
+    loaded = loaded_modules(
+        "from docscorer import ScorerConfiguration\nScorerConfiguration()"
+    )
+    assert os.environ[ScorerConfiguration.CACHE_DIR_ENV]
+    assert [name for name in ("pandas", "scipy", "joblib") if name in loaded] == []
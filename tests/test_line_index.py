@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from conftest import write_jsonl
+
+from docscorer import DocumentScorer, ScorerConfiguration, cli
+from docscorer.line_index import LineIndex, index_path
+
+
+def test_index_is_saved_to_the_cache_dir(
+    records: List[Dict[str, Any]], tmp_path: Path
+) -> None:
+    path = write_jsonl(tmp_path / "a.jsonl", records[:50])
+    index = LineIndex.load(path, tmp_path / "cache")
+    assert index_path(path, tmp_path / "cache").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.jsonl", "cache"]
+    assert len(index) == 50
+    assert json.loads(index[49])["id"] == records[49]["id"]
+    # The default one is that of the configuration snapshots
+    LineIndex.load(path)
+    default = Path(os.environ[ScorerConfiguration.CACHE_DIR_ENV])
+    assert index_path(path, default).exists()
+
+    # An index out of date is built again
+    write_jsonl(path, records[:60])
+    assert len(LineIndex.load(path, tmp_path / "cache")) == 60
+
+
+def test_workers_do_not_write_to_the_input_dir(
+    scorer: DocumentScorer, records: List[Dict[str, Any]], tmp_path: Path
+) -> None:
+    (tmp_path / "input").mkdir()
+    write_jsonl(tmp_path / "input" / "a.jsonl", records[:100])
+    scorer.score_directory(tmp_path / "input", tmp_path / "output", workers=2)
+    assert [path.name for path in (tmp_path / "input").iterdir()] == ["a.jsonl"]
+
+
+def show(path: Path, line: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sys, "argv", ["cli.py", "show", f"--input={path}", line])
+    cli.main()
+
+
+@pytest.mark.parametrize("line", [0, -1, 11, 99999])
+def test_show_reports_the_line_out_of_range(
+    records: List[Dict[str, Any]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    line: int,
+) -> None:
+    path = write_jsonl(tmp_path / "a.jsonl", records[:10])
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit) as exit_info:
+        show(path, f"--line={line}", monkeypatch)
+    assert exit_info.value.code == 1
+    assert caplog.messages == [f"{path} has 10 lines, there is no line {line}"]
+
+
+def test_show_prints_the_scores_of_a_line(
+    scorer: DocumentScorer,
+    records: List[Dict[str, Any]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    path = write_jsonl(tmp_path / "a.jsonl", records[:10])
+    for line in (1, 10):
+        show(path, f"--line={line}", monkeypatch)
+        output = json.loads(capsys.readouterr().out)
+        document = scorer._parse_record(records[line - 1])
+        assert output["line"] == line
+        assert output["doc_id"] == document[4]
+        assert output["wds_score"] == scorer.score_document(*document, False)[0]
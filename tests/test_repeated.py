@@ -0,0 +1,93 @@
+import random
+from collections import Counter
+from typing import Any, List
+
+import numpy as np
+import pytest
+
+from docscorer import DocumentScorer
+from docscorer.features import HASH_BLOCK, FeatureBatch
+from docscorer.scorers.repeated_scorer import RepeatedScorer
+
+
+def counter_score(scorer: DocumentScorer, text: str) -> float:
+    """repeated_score counted on the segment strings, as before the hashes."""
+    segments = [segment for segment in text.split("\n") if len(segment) > 4]
+    return scorer.repeated_scorer.score_occurrences(Counter(segments).values())
+
+
+def long_text() -> str:
+    """More segments than RepeatedScorer.MAX_COUNTED_SEGMENTS, and more chars than a
+    hash block."""
+    rng = random.Random(2)
+    words = ["home", "about", "contact", "texto", "新闻", "😀", "𝔘𝔫𝔦", "\udc80"]
+    segments = [" ".join(rng.choices(words, k=rng.randint(0, 6))) for _ in range(8000)]
+    return "\n".join(segments)
+
+
+TEXTS = [
+    "",
+    "\n",
+    "\n\n\n",
+    # Only segments of up to 4 chars, which are not counted
+    "abcd\nabcd\nabcd\nab\n",
+    "😀😀😀😀\n😀😀😀😀\n𝔘𝔫𝔦𝔠",
+    # Only repeats
+    "abcde\nabcde",
+    "Home | About\nHome | About\nHome | About",
+    "abcd\nabcde\nabcde\nabcdef\nabcde ",
+    "😀😀😀😀😀\n😀😀😀😀😀\nx\n新闻新闻新闻\n新闻新闻新闻",
+    # A surrogate pair is two chars, and not the char it encodes
+    "😀😀😀😀😀😀\n😀😀😀\n😀😀😀😀😀😀",
+    "😀😀a\n😀😀a\n😀😀a",
+    "\udc80abcd\n\udc80abcd\nabcd\udc80\n\ud800\ud800\ud800\ud800\ud800",
+    long_text(),
+]
+
+
+def test_long_text_takes_the_long_document_paths() -> None:
+    assert TEXTS[-1].count("\n") + 1 > RepeatedScorer.MAX_COUNTED_SEGMENTS
+    assert len(TEXTS[-1]) > HASH_BLOCK
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_hashes_score_like_the_counter(scorer: DocumentScorer, text: str) -> None:
+    expected = counter_score(scorer, text)
+    repeated_scorer = scorer.repeated_scorer
+    classifier = scorer.config.char_classifier
+    assert repeated_scorer.score(text) == expected
+    hashes, lengths = classifier.hash_segments(text)
+    assert repeated_scorer.score_hashes(hashes, lengths) == expected
+    _, feature_hashes, feature_lengths = classifier.features(text)
+    assert feature_hashes.tolist() == hashes.tolist()
+    assert feature_lengths.tolist() == lengths.tolist()
+    # Sorted, as the documents with more than MAX_COUNTED_SEGMENTS segments
+    offsets = np.array([0, len(hashes)])
+    assert repeated_scorer._score_segments(hashes, lengths, offsets)[0] == expected
+
+
+def test_batch_scores_like_the_counter(
+    scorer: DocumentScorer, documents: List[Any]
+) -> None:
+    # The same segments in several documents are only repeated within each of them
+    texts = [*TEXTS, *TEXTS, *[document[3] for document in documents]]
+    expected = [counter_score(scorer, text) for text in texts]
+    features = FeatureBatch.from_documents(
+        scorer.config.char_classifier,
+        ["eng_Latn"] * len(texts),
+        [[] for _ in texts],
+        texts,
+    )
+    assert scorer.repeated_scorer.score_batch(features).tolist() == expected
+
+    edge_documents = [
+        ("eng", "Latn", [], text, f"edge{i}") for i, text in enumerate(TEXTS)
+    ]
+    batch = scorer.score_batch([*edge_documents, *documents])
+    single = [
+        scorer.score_document(*document, False)
+        for document in [*edge_documents, *documents]
+    ]
+    repeated = [round(score, 2) for score in expected[len(TEXTS) :]]
+    assert [output[6] for output in batch] == repeated
+    assert [output[6] for output in single] == repeated
@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+import zstandard
+from conftest import write_jsonl
+
+from docscorer import DocumentScorer
+from docscorer.checkpoint import RunManifest
+
+
+class Interrupted(Exception):
+    pass
+
+
+def read_output(path: Path) -> bytes:
+    if path.suffix == ".zst":
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                f, read_across_frames=True
+            )
+            return reader.read()
+    return path.read_bytes()
+
+
+def write_inputs(directory: Path, records: List[Dict[str, Any]], zstd: bool) -> None:
+    directory.mkdir()
+    for name, part in (("a", records[:150]), ("b", records[150:])):
+        path = write_jsonl(directory / f"{name}.jsonl", part)
+        if zstd:
+            with open(path, "rb") as fin, open(f"{path}.zst", "wb") as fout:
+                zstandard.ZstdCompressor().copy_stream(fin, fout)
+            path.unlink()
+
+
+@pytest.mark.parametrize(
+    "zstd, workers", [(False, 1), (True, 1), (False, 2)], ids=["plain", "zstd", "pool"]
+)
+def test_resume_matches_uninterrupted_run(
+    scorer: DocumentScorer,
+    records: List[Dict[str, Any]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    zstd: bool,
+    workers: int,
+) -> None:
+    # A checkpoint after every chunk of 16 documents
+    monkeypatch.setattr(DocumentScorer, "CHUNK_SIZE", 16)
+    monkeypatch.setattr(DocumentScorer, "CHECKPOINT_INTERVAL", 0.0)
+    write_inputs(tmp_path / "input", records, zstd)
+    scorer.score_directory(
+        tmp_path / "input", tmp_path / "clean", workers, compress_output=zstd
+    )
+
+    # The run crashes in the middle of the second file, with rows written after its
+    # last checkpoint
+    commit = RunManifest.commit
+    checkpoints = []
+
+    def crashing_commit(manifest: RunManifest, name: str, *args: Any, **kwargs: Any):
+        if name.startswith("b.") and not kwargs.get("done"):
+            checkpoints.append(args)
+            if len(checkpoints) == 3:
+                raise Interrupted
+        commit(manifest, name, *args, **kwargs)
+
+    monkeypatch.setattr(RunManifest, "commit", crashing_commit)
+    with pytest.raises(Interrupted):
+        scorer.score_directory(
+            tmp_path / "input", tmp_path / "resumed", workers, compress_output=zstd
+        )
+    monkeypatch.setattr(RunManifest, "commit", commit)
+    with open(tmp_path / "resumed" / RunManifest.FILE_NAME, encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    assert [state["done"] for state in files.values()] == [True, False]
+    assert 0 < list(files.values())[1]["lines"] < len(records) - 150
+
+    scorer.score_directory(
+        tmp_path / "input",
+        tmp_path / "resumed",
+        workers,
+        compress_output=zstd,
+        resume=True,
+    )
+    clean = sorted(path.name for path in (tmp_path / "clean").glob("*.csv*"))
+    assert clean == sorted(path.name for path in (tmp_path / "resumed").glob("*.csv*"))
+    for name in clean:
+        assert read_output(tmp_path / "resumed" / name) == read_output(
+            tmp_path / "clean" / name
+        ), name
+
+
+def test_resume_with_other_settings_fails(
+    scorer: DocumentScorer, records: List[Dict[str, Any]], tmp_path: Path
+) -> None:
+    write_inputs(tmp_path / "input", records[:200], False)
+    scorer.score_directory(tmp_path / "input", tmp_path / "output")
+    with pytest.raises(ValueError):
+        scorer.score_directory(
+            tmp_path / "input", tmp_path / "output", compress_output=True, resume=True
+        )
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from conftest import write_jsonl
+from test_batch import normalized
+
+from docscorer import DocumentScorer, ScorerConfiguration
+from docscorer.score_cache import RESULT_VALUES, ScoreCache
+from docscorer.server import ScoringServer
+
+
+def cached_scorer(path: Path, **args: Any) -> DocumentScorer:
+    return DocumentScorer(ScorerConfiguration({"--score_cache": str(path), **args}))
+
+
+def distinct(documents: List[Any]) -> int:
+    """Number of documents with distinct cache keys."""
+    return len(
+        {
+            (doc[0].lower(), doc[1].lower(), tuple(map(str.lower, doc[2])), doc[3])
+            for doc in documents
+        }
+    )
+
+
+def lookups(scorer: DocumentScorer) -> Tuple[int, int]:
+    """Hits and misses of the score cache of a scorer, in all the runs that used it."""
+    stats = scorer.score_cache.stats()
+    return stats["hits"], stats["misses"]
+
+
+def test_cache_hits_give_the_same_scores(
+    scorer: DocumentScorer, documents: List[Any], tmp_path: Path
+) -> None:
+    fresh = normalized(scorer.score_batch(documents))
+    cached = cached_scorer(tmp_path / "scores.sqlite")
+    assert normalized(cached.score_batch(documents)) == fresh
+    # Duplicates of the batch are only looked up once
+    assert lookups(cached) == (0, distinct(documents))
+    assert cached.score_cache.stats()["entries"] == distinct(documents)
+
+    # Another scorer (another run) reads the scores of the first one
+    again = cached_scorer(tmp_path / "scores.sqlite")
+    assert normalized(again.score_batch(documents)) == fresh
+    assert lookups(again) == (distinct(documents), distinct(documents))
+    single = [again.score_document(*document, False) for document in documents]
+    assert normalized(single) == fresh
+    assert lookups(again) == (distinct(documents) + len(documents), distinct(documents))
+
+
+def test_cache_is_shared_by_the_workers(
+    scorer: DocumentScorer,
+    records: List[Dict[str, Any]],
+    documents: List[Any],
+    tmp_path: Path,
+) -> None:
+    (tmp_path / "input").mkdir()
+    write_jsonl(tmp_path / "input" / "a.jsonl", records)
+    scorer.score_directory(tmp_path / "input", tmp_path / "fresh")
+    cached = cached_scorer(tmp_path / "scores.sqlite")
+    cached.score_directory(tmp_path / "input", tmp_path / "cold", workers=2)
+    cold = lookups(cached)
+    cached.score_directory(tmp_path / "input", tmp_path / "warm", workers=2)
+    hits, misses = lookups(cached)
+    assert misses == cold[1] and hits - cold[0] == sum(cold)
+    assert cached.score_cache.stats()["entries"] == distinct(documents)
+    for output in ("cold", "warm"):
+        assert (tmp_path / output / "a.csv").read_bytes() == (
+            tmp_path / "fresh" / "a.csv"
+        ).read_bytes()
+
+
+def test_configuration_change_misses_the_cache(
+    documents: List[Any], tmp_path: Path
+) -> None:
+    cached = cached_scorer(tmp_path / "scores.sqlite")
+    cached.score_batch(documents)
+    other = cached_scorer(tmp_path / "scores.sqlite", **{"--early_exit": True})
+    assert other.config.score_fingerprint != cached.config.score_fingerprint
+    other.score_batch(documents)
+    assert lookups(other) == (0, 2 * distinct(documents))
+    assert other.score_cache.stats()["entries"] == 2 * distinct(documents)
+
+
+def test_another_fingerprint_misses_the_cache(tmp_path: Path) -> None:
+    cache = ScoreCache(tmp_path / "scores.sqlite", b"configuration")
+    key = cache.key("eng", "Latn", ["eng_Latn"], "Some text.")
+    cache.put_many([(key, [0.5] * RESULT_VALUES)])
+    assert cache.get_many([key]) == {key: (0.5,) * RESULT_VALUES}
+    other = ScoreCache(tmp_path / "scores.sqlite", b"other configuration")
+    other_key = other.key("eng", "Latn", ["eng_Latn"], "Some text.")
+    assert other_key != key
+    assert other.get_many([other_key]) == {}
+    assert other.stats()["misses"] == 1
+
+
+def test_eviction_keeps_the_file_under_the_maximum_size(tmp_path: Path) -> None:
+    max_size = 256 << 10
+    cache = ScoreCache(tmp_path / "scores.sqlite", b"configuration", max_size)
+    keys: List[bytes] = []
+    for _ in range(100):
+        batch = [os.urandom(16) for _ in range(200)]
+        cache.put_many((key, [0.5] * RESULT_VALUES) for key in batch)
+        keys += batch
+        assert cache.size() <= max_size
+        # The free pages are removed from the file once the WAL is checkpointed
+        cache.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        assert os.path.getsize(tmp_path / "scores.sqlite") <= max_size
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["entries"] == len(keys) - stats["evictions"]
+    with sqlite3.connect(tmp_path / "scores.sqlite") as connection:
+        count = connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+    assert count == stats["entries"]
+    # The least recently used entries are evicted first
+    assert len(cache.get_many(keys[-500:])) == 500
+    assert cache.get_many(keys[:1000]) == {}
+
+
+def test_server_stats_report_the_score_cache(
+    records: List[Dict[str, Any]], documents: List[Any], tmp_path: Path
+) -> None:
+    server = ScoringServer(cached_scorer(tmp_path / "scores.sqlite"), ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for _ in range(2):
+            request = urllib.request.Request(
+                f"{url}/score", data=json.dumps(records[:50]).encode(), method="POST"
+            )
+            with urllib.request.urlopen(request) as response:
+                assert len(json.load(response)) == 50
+        with urllib.request.urlopen(f"{url}/stats") as response:
+            stats = json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Every distinct document misses once, and is found by the second request (or by a
+    # later batch of the first one)
+    assert stats["score_cache"]["misses"] == distinct(documents[:50])
+    assert stats["score_cache"]["entries"] == distinct(documents[:50])
+    assert stats["score_cache"]["evictions"] == 0
+    assert stats["score_cache"]["hits"] >= distinct(documents[:50])
@@ -0,0 +1,77 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from conftest import write_jsonl
+from test_batch import normalized, score_in_batches
+
+from docscorer import DocumentScorer, ScorerConfiguration
+from docscorer.features import SegmentFeatureCache
+
+
+def cached_scorer(size: int) -> DocumentScorer:
+    return DocumentScorer(ScorerConfiguration({"--segment_cache": str(size)}))
+
+
+# Smaller than the distinct segments of the corpus, so entries are evicted, and larger
+@pytest.mark.parametrize("size", [20, 100000])
+def test_segment_cache_gives_the_same_scores(
+    scorer: DocumentScorer, documents: List[Any], size: int
+) -> None:
+    cached = cached_scorer(size)
+    assert isinstance(cached.char_counter, SegmentFeatureCache)
+    for raw_score in (False, True):
+        expected = normalized(scorer.score_batch(documents, raw_score))
+        assert normalized(score_in_batches(cached, documents, raw_score)) == expected
+        single = [cached.score_document(*document, raw_score) for document in documents]
+        assert normalized(single) == expected
+    stats = cached.char_counter.stats()
+    assert stats["hits"] > 0 and stats["misses"] > 0
+    assert stats["entries"] <= size
+
+
+def test_segment_cache_gives_the_same_streamed_scores(
+    scorer: DocumentScorer, documents: List[Any]
+) -> None:
+    cached = cached_scorer(20)
+    for ref_lang, ref_script, langs, text, doc_id in documents:
+        segments = text.split("\n") if text else []
+        if len(segments) != len(langs):
+            continue
+        stream = cached.stream_document(ref_lang, ref_script, doc_id)
+        for segment, lang in zip(segments, langs, strict=True):
+            stream.add_segment(segment, lang)
+        expected = scorer.score_document(
+            ref_lang, ref_script, langs, text, doc_id, False
+        )
+        assert normalized(stream.finish()) == normalized(expected), doc_id
+    assert cached.char_counter.stats()["hits"] > 0
+
+
+def test_segment_cache_with_workers(
+    scorer: DocumentScorer, records: List[Dict[str, Any]], tmp_path: Path
+) -> None:
+    (tmp_path / "input").mkdir()
+    write_jsonl(tmp_path / "input" / "a.jsonl", records)
+    scorer.score_directory(tmp_path / "input", tmp_path / "plain")
+    cached = cached_scorer(100)
+    cached.score_directory(tmp_path / "input", tmp_path / "cached", workers=2)
+    assert (tmp_path / "cached" / "a.csv").read_bytes() == (
+        tmp_path / "plain" / "a.csv"
+    ).read_bytes()
+    # The lookups of the workers are added to those of the parent
+    stats = cached.char_counter.stats()
+    assert stats["hits"] > 0 and stats["misses"] > 0
+
+
+def test_repeated_segments_of_a_batch_are_counted_once(scorer: DocumentScorer) -> None:
+    classifier = scorer.config.char_classifier
+    cache = SegmentFeatureCache(classifier, 100)
+    text = "\n".join(["Home | About", "Some text, 123.", "Home | About", "", "", "x"])
+    for expected_hits, expected_misses in ((2, 4), (8, 4)):
+        counts, hashes, lengths = cache.features(text)
+        expected = classifier.features(text)
+        assert counts.tolist() == expected[0].tolist()
+        assert hashes.tolist() == expected[1].tolist()
+        assert lengths.tolist() == expected[2].tolist()
+        assert (cache.hits, cache.misses) == (expected_hits, expected_misses)
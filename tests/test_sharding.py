@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+import zstandard
+from conftest import write_jsonl
+
+from docscorer import DocumentScorer, cli
+from docscorer.checkpoint import RunManifest
+from docscorer.sharding import merge_shards
+
+SHARDS = 3
+SPLIT_SIZE = 8192  # a.jsonl is split into several parts
+
+
+@pytest.fixture
+def inputs(records: List[Dict[str, Any]], tmp_path: Path) -> Path:
+    directory = tmp_path / "input"
+    directory.mkdir()
+    write_jsonl(directory / "a.jsonl", records[:300])
+    write_jsonl(directory / "b.jsonl", records[300:310])
+    # Compressed files are never split
+    path = write_jsonl(directory / "c.jsonl", records[310:])
+    with open(path, "rb") as fin, open(f"{path}.zst", "wb") as fout:
+        zstandard.ZstdCompressor().copy_stream(fin, fout)
+    path.unlink()
+    assert (directory / "a.jsonl").stat().st_size > 4 * SPLIT_SIZE
+    return directory
+
+
+def score_shards(scorer: DocumentScorer, inputs: Path, output: Path) -> None:
+    for index in range(SHARDS):
+        scorer.score_directory(
+            inputs, output, shard=(index, SHARDS), split_size=SPLIT_SIZE
+        )
+
+
+def test_merged_shards_match_single_run(
+    scorer: DocumentScorer, inputs: Path, tmp_path: Path
+) -> None:
+    scorer.score_directory(inputs, tmp_path / "single")
+    score_shards(scorer, inputs, tmp_path / "sharded")
+    parts = sorted((tmp_path / "sharded").glob("a.part-*.csv"))
+    assert len(parts) > 4
+
+    assert merge_shards(inputs, tmp_path / "sharded", check_only=True) == []
+    assert sorted((tmp_path / "sharded").glob("a.part-*.csv")) == parts
+    assert merge_shards(inputs, tmp_path / "sharded") == []
+    single = sorted(path.name for path in (tmp_path / "single").iterdir())
+    assert sorted(path.name for path in (tmp_path / "sharded").iterdir()) == single
+    for name in single:
+        if name != RunManifest.FILE_NAME:
+            assert (tmp_path / "sharded" / name).read_bytes() == (
+                tmp_path / "single" / name
+            ).read_bytes(), name
+    # The merged run is checked as a single one
+    assert merge_shards(inputs, tmp_path / "sharded", check_only=True) == []
+
+
+def check_only(inputs: Path, output: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["cli.py", "merge", f"--input={inputs}", f"--output={output}", "--check_only"],
+    )
+    cli.main()
+
+
+@pytest.mark.parametrize("damage", ["missing", "truncated", "no_shard"])
+def test_check_only_rejects_damaged_outputs(
+    scorer: DocumentScorer,
+    inputs: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    damage: str,
+) -> None:
+    output = tmp_path / "sharded"
+    score_shards(scorer, inputs, output)
+    check_only(inputs, output, monkeypatch)
+
+    part = sorted(output.glob("a.part-*.csv"))[2]
+    if damage == "missing":
+        part.unlink()
+        expected = f"{part} not found"
+    elif damage == "truncated":
+        # The last rows are lost, the file still ends with a complete row
+        content = part.read_bytes()
+        part.write_bytes(content[: content.rindex(b"\n", 0, len(content) // 2) + 1])
+        expected = f"{part} does not have"
+    else:
+        (output / RunManifest.file_name((1, SHARDS))).unlink()
+        expected = f"Shard 1/{SHARDS}: no manifest"
+    problems = merge_shards(inputs, output, check_only=True)
+    assert len(problems) == 1 and expected in problems[0]
+    with pytest.raises(SystemExit) as exit_info:
+        check_only(inputs, output, monkeypatch)
+    assert exit_info.value.code == 1
+    # Nothing is merged when there are problems
+    saved = sorted(path.name for path in output.iterdir())
+    assert merge_shards(inputs, output) == problems
+    assert sorted(path.name for path in output.iterdir()) == saved
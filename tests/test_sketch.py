@@ -0,0 +1,92 @@
+import logging
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+from docscorer import cli
+from docscorer.features import HASH_VERSION
+from docscorer.sketch import MAX_COUNT, CountMinSketch
+
+HASHES = np.array([1, 2, 3, 2, 2, 1 << 63, (1 << 64) - 1], dtype=np.uint64)
+
+
+def test_counts_saturate_when_added(tmp_path: Path) -> None:
+    sketch = CountMinSketch(1 << 10, seed=3)
+    sketch.add(HASHES)
+    assert sketch.estimate(HASHES[:3]).tolist() == [1, 3, 1]
+    sketch.table[sketch.table > 0] = MAX_COUNT - 1
+    sketch.add(HASHES)
+    # 2^32 - 1, where a uint32 table would wrap around to a small count
+    assert sketch.estimate(HASHES).tolist() == [MAX_COUNT] * len(HASHES)
+    assert sketch.table.dtype == np.uint32
+    sketch.save(tmp_path / "sketch.npz")
+    loaded = CountMinSketch.load(tmp_path / "sketch.npz")
+    assert loaded.estimate(HASHES).tolist() == [MAX_COUNT] * len(HASHES)
+
+
+def test_counts_saturate_when_merged() -> None:
+    sketch = CountMinSketch(1 << 10, seed=3)
+    other = CountMinSketch(1 << 10, seed=3)
+    sketch.add(HASHES)
+    other.add(HASHES)
+    sketch.merge(other)
+    assert sketch.estimate(HASHES[:3]).tolist() == [2, 6, 2]
+    sketch.table[sketch.table > 0] = MAX_COUNT - 1
+    other.table[other.table > 0] = MAX_COUNT
+    sketch.merge(other)
+    assert sketch.estimate(HASHES).tolist() == [MAX_COUNT] * len(HASHES)
+    assert sketch.table.dtype == np.uint32
+    assert int(sketch.table.max()) == MAX_COUNT
+    with pytest.raises(ValueError, match="Cannot merge"):
+        sketch.merge(CountMinSketch(1 << 10, seed=4))
+
+
+def save_sketch(path: Path, hash_version: int = HASH_VERSION) -> Path:
+    """A sketch file of a hash version (0: saved before the versions were recorded)."""
+    sketch = CountMinSketch(1 << 10)
+    sketch.add(HASHES)
+    arrays = {"table": sketch.table, "seed": np.int64(sketch.seed)}
+    if hash_version:
+        arrays["hash_version"] = np.int64(hash_version)
+    np.savez(path, **arrays)
+    return path
+
+
+@pytest.mark.parametrize("hash_version", [0, 1, HASH_VERSION + 1])
+def test_other_hash_versions_are_refused(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    hash_version: int,
+) -> None:
+    current = save_sketch(tmp_path / "current.npz")
+    assert CountMinSketch.load(current).estimate(HASHES[:3]).tolist() == [1, 3, 1]
+    other = save_sketch(tmp_path / "other.npz", hash_version)
+    with pytest.raises(ValueError, match="build it again"):
+        CountMinSketch.load(other)
+
+    def run(argv: List[str]) -> None:
+        monkeypatch.setattr(sys, "argv", ["cli.py", *argv])
+        caplog.clear()
+        with caplog.at_level(logging.ERROR), pytest.raises(SystemExit) as exit_info:
+            cli.main()
+        assert exit_info.value.code == 1
+        assert len(caplog.messages) == 1 and "build it again" in caplog.messages[0]
+
+    merged = tmp_path / "merged.npz"
+    run(["merge_sketches", f"--output={merged}", str(current), str(other)])
+    run(["merge_sketches", f"--output={merged}", str(other), str(current)])
+    assert not merged.exists()
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "a.jsonl").write_text("")
+    run(
+        [
+            f"--input={tmp_path / 'input'}",
+            f"--output={tmp_path / 'output'}",
+            f"--sketch={other}",
+        ]
+    )
+    assert not (tmp_path / "output" / "a.csv").exists()